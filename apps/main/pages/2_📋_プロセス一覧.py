@@ -1,5 +1,5 @@
 import streamlit as st
-from shared import get_storage, save_process_data, render_process_selector
+from shared import READ_ONLY, profile_rerun, get_storage, manager, save_process_data, render_process_selector
 
 st.set_page_config(
     page_title="プロセス一覧",
@@ -8,47 +8,70 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Persist process data if available
-save_process_data()
-
-# Render process selector in sidebar
-available_processes = render_process_selector()
-
-# Get storage instance
-storage = get_storage()
-
-st.title("📋 プロセス一覧")
-st.markdown("---")
-
-if available_processes:
-    for process_name in available_processes:
-        col1, col2 = st.columns([3, 1])
-        
-        with col1:
-            process_info = storage.get_process_info(process_name)
-            if process_info:
-                st.write(f"**{process_name}**")
-                st.caption(f"作成: {process_info.get('created', 'N/A')}")
-                st.caption(f"最終更新: {process_info.get('last_updated', 'N/A')}")
-            else:
-                st.write(f"**{process_name}**")
-        
-        with col2:
-            # Don't allow deleting currently selected process
-            can_delete = process_name != st.session_state.get('selected_process')
-            
-            if st.button(
-                "削除", 
-                key=f"delete_{process_name}",
-                disabled=not can_delete,
-                help="選択中のプロセスは削除できません" if not can_delete else None
-            ):
-                if storage.delete_process(process_name):
-                    st.success(f"プロセス '{process_name}' を削除しました")
-                    st.rerun()
-        
-        st.divider()
-else:
-    st.info("プロセスがありません。")
-    if st.button("新規プロセスを作成"):
-        st.switch_page("pages/3_➕_新規プロセス.py")
\ No newline at end of file
+with profile_rerun("process_list"):
+    # Persist process data if available
+    save_process_data()
+
+    # Render process selector in sidebar
+    available_processes = render_process_selector()
+
+    # Get storage instance
+    storage = get_storage()
+
+    st.title("📋 プロセス一覧")
+    st.markdown("---")
+
+    if available_processes:
+        for process_name in available_processes:
+            col1, col2 = st.columns([3, 1])
+
+            with col1:
+                process_info = storage.get_process_info(process_name)
+                if process_info:
+                    st.write(f"**{process_name}**")
+                    st.caption(f"作成: {process_info.get('created', 'N/A')}")
+                    st.caption(f"最終更新: {process_info.get('last_updated', 'N/A')}")
+                else:
+                    st.write(f"**{process_name}**")
+
+            with col2:
+                # Don't allow deleting currently selected process (読み取り専用レプリカでは削除不可)
+                can_delete = process_name != st.session_state.get('selected_process') and not READ_ONLY
+
+                if st.button(
+                    "削除", 
+                    key=f"delete_{process_name}",
+                    disabled=not can_delete,
+                    help=None if can_delete else ("読み取り専用レプリカです" if READ_ONLY else "選択中のプロセスは削除できません")
+                ):
+                    # undo 履歴も一緒に消すためマネージャー経由で削除する
+                    if manager.delete_process(process_name):
+                        st.success(f"プロセス '{process_name}' を削除しました")
+                        st.rerun()
+
+            st.divider()
+    else:
+        st.info("プロセスがありません。")
+        if not READ_ONLY and st.button("新規プロセスを作成"):
+            st.switch_page("pages/3_➕_新規プロセス.py")
+
+    # Archived (cold) processes
+    archived_processes = manager.list_archived_processes()
+    if archived_processes:
+        st.markdown("---")
+        with st.expander(f"🗄️ アーカイブ済み ({len(archived_processes)})"):
+            st.caption("一定期間更新のないプロセスです。選択して読み込むか、復元ボタンで通常の一覧に戻せます。")
+            for process_name in archived_processes:
+                col1, col2 = st.columns([3, 1])
+
+                with col1:
+                    archived_info = manager.get_archived_info(process_name) or {}
+                    st.write(f"**{process_name}**")
+                    st.caption(f"最終更新: {archived_info.get('last_updated', 'N/A')}")
+                    st.caption(f"アーカイブ: {archived_info.get('archived_at', 'N/A')}")
+
+                with col2:
+                    if st.button("復元", key=f"restore_{process_name}", disabled=READ_ONLY):
+                        if manager.restore_process(process_name):
+                            st.success(f"プロセス '{process_name}' を復元しました")
+                            st.rerun()
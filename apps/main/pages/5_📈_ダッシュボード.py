@@ -0,0 +1,98 @@
+import pandas as pd
+import streamlit as st
+from shared import profile_rerun, save_process_data, render_process_selector, aggregates, tenant_usage
+
+st.set_page_config(
+    page_title="ダッシュボード",
+    page_icon="📈",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+TASK_LABELS = {
+    "persist_task1": "タスク1: 初期設定",
+    "persist_task2": "タスク2: データ収集",
+    "persist_task3": "タスク3: 分析実行",
+    "persist_task4": "タスク4: レポート作成",
+}
+
+with profile_rerun("dashboard"):
+    # Persist process data if available
+    save_process_data()
+
+    # Render process selector in sidebar (他インスタンスの変更もここで取り込まれる)
+    render_process_selector()
+
+    st.title("📈 ダッシュボード")
+    st.caption("全プロセス（アーカイブ済みを含む）の集計。保存・削除のたびに差分更新された値を表示しています。")
+    st.markdown("---")
+
+    usage = tenant_usage()
+    if usage is not None:
+        # テナントの使用量と上限 (上限なしの項目は値のみ)
+        quota = usage.quota
+        st.subheader(f"🏢 テナント: {usage.tenant}")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("プロセス数", usage.processes if quota.max_processes is None else f"{usage.processes} / {quota.max_processes}")
+        with col2:
+            used_mb = usage.bytes / 1024 / 1024
+            st.metric(
+                "保存容量",
+                f"{used_mb:.2f} MB" if quota.max_bytes is None else f"{used_mb:.2f} / {quota.max_bytes / 1024 / 1024:.1f} MB",
+            )
+        with col3:
+            st.metric("保存回数", usage.saves)
+        if usage.rejected or usage.throttled:
+            st.caption(f"上限による拒否 {usage.rejected} 回 / 保存頻度による待機 {usage.throttled} 回 (計 {usage.throttled_seconds:.1f} 秒)")
+        st.markdown("---")
+
+    if aggregates is None:
+        st.info("ストレージサーバー利用時はダッシュボードを表示できません。")
+        st.stop()
+
+    # プロセス数に関係なく集計済みの値を読むだけ
+    summary = aggregates.summary()
+
+    if summary.total == 0:
+        st.info("まだプロセスが作成されていません。")
+        st.stop()
+
+    average = summary.numeric_means.get("persist_進捗率")
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("プロセス数", summary.total)
+    with col2:
+        st.metric("完了", summary.status_counts.get("完了", 0))
+    with col3:
+        st.metric("平均進捗率", f"{average:.0f}%" if average is not None else "N/A")
+
+    st.markdown("---")
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("ステータス別")
+        if summary.status_counts:
+            status_df = pd.DataFrame(
+                {"プロセス数": list(summary.status_counts.values())},
+                index=list(summary.status_counts.keys()),
+            )
+            st.bar_chart(status_df)
+        else:
+            st.info("ステータスが設定されたプロセスがありません。")
+
+    with col2:
+        st.subheader("進捗率の分布")
+        histogram_df = pd.DataFrame(
+            {"プロセス数": [count for _, count in summary.histogram]},
+            index=[f"{label}%" for label, _ in summary.histogram],
+        )
+        st.bar_chart(histogram_df)
+
+    st.subheader("タスク完了率")
+    for key, label in TASK_LABELS.items():
+        rate = summary.flag_rates.get(key)
+        if rate is None:
+            st.caption(f"{label}: 未入力")
+        else:
+            st.progress(rate, text=f"{label}: {rate * 100:.0f}%")
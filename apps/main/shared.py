@@ -1,79 +1,430 @@
+import logging
+import os
 import streamlit as st
+from streamlit.runtime import Runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from collections.abc import MutableMapping
+from contextlib import contextmanager
+from datetime import timedelta
 from pathlib import Path
-from typing import cast, Dict, Any
-from persistence import StreamlitSessionManager
+from typing import cast, Dict, Any, Iterable, Iterator, Literal
+from persistence import (
+    AggregateView,
+    CachedStorage,
+    KeyRegistry,
+    MigrationRegistry,
+    PartitionedStorage,
+    Prefetcher,
+    QuotaExceededError,
+    ReadOnlyStorage,
+    RemoteStorage,
+    RerunProfiler,
+    RetentionEngine,
+    RetentionRule,
+    RetentionSweeper,
+    SaveRateLimitedError,
+    SchemaUpgrader,
+    SessionOffloader,
+    SimpleStorage,
+    SnapshotPublisher,
+    StreamlitSessionManager,
+    TenantQuota,
+    TenantRegistry,
+    TenantStorage,
+    TenantUsage,
+    UndoStore,
+    create_sink,
+    parse_address,
+)
+
+# ログレベルは環境変数で制御 (DEBUG / INFO / WARNING ...)
+LOG_LEVEL = os.environ.get("PERSISTENCE_LOG_LEVEL", "WARNING").upper()
+logging.basicConfig(format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+logging.getLogger("persistence").setLevel(LOG_LEVEL)
+logger = logging.getLogger(__name__)
+logger.setLevel(LOG_LEVEL)
 
 # Initialize session manager
 root_dir = Path(__file__).parent.parent.parent
-DATA_PATH = root_dir / "data" / "processes"
-manager = StreamlitSessionManager(DATA_PATH)
+# PERSISTENCE_DATA_PATH: 保存先ディレクトリ (ベンチマーク等で差し替える用)
+DATA_PATH = Path(os.environ.get("PERSISTENCE_DATA_PATH", root_dir / "data" / "processes"))
+LOG_PATH = root_dir / "data" / "logs"
+# サイドバーのプロセス選択肢の上限
+SELECTOR_LIMIT = 30
+# PERSISTENCE_METRICS: "memory" / "logging" / "prometheus:<path>" (未設定なら計測なし)
+metrics = create_sink(os.environ.get("PERSISTENCE_METRICS"))
+# PERSISTENCE_ARCHIVE_AFTER_DAYS: この日数更新のないプロセスをアーカイブへ移動 (未設定なら無効)
+ARCHIVE_AFTER_DAYS = os.environ.get("PERSISTENCE_ARCHIVE_AFTER_DAYS")
+# PERSISTENCE_SERVER: "host:port" / "unix:<path>" を指定するとストレージサーバーを共有する (複数レプリカ用)
+STORAGE_SERVER = os.environ.get("PERSISTENCE_SERVER")
+# PERSISTENCE_PARTITIONS: 2以上で DATA_PATH/partition-<i> にハッシュ分割して保存 (増やす場合は scripts/add_partition.py で再配置)
+PARTITIONS = int(os.environ.get("PERSISTENCE_PARTITIONS", "0"))
+archive_after = timedelta(days=float(ARCHIVE_AFTER_DAYS)) if ARCHIVE_AFTER_DAYS else None
+# PERSISTENCE_REPLICA_PATH: 書き込み側はこのディレクトリへスナップショットと増分を定期的に公開する
+REPLICA_PATH = os.environ.get("PERSISTENCE_REPLICA_PATH")
+# PERSISTENCE_READ_ONLY: 1 で PERSISTENCE_REPLICA_PATH のレプリカから読むだけの読み取り専用インスタンスになる
+# (一覧・詳細・ダッシュボード用。書き込みを伴う操作は無効)
+READ_ONLY = os.environ.get("PERSISTENCE_READ_ONLY", "0") not in ("", "0")
+if READ_ONLY and not REPLICA_PATH:
+    raise RuntimeError("PERSISTENCE_READ_ONLY requires PERSISTENCE_REPLICA_PATH")
+# PERSISTENCE_UNDO_KB: セッションごとの undo 履歴 (変更したキーの旧値/新値) の上限 KB (0 で undo 無効)
+UNDO_KB = float(os.environ.get("PERSISTENCE_UNDO_KB", "256"))
+# PERSISTENCE_UNDO_PERSIST: 1 で undo 履歴を DATA_PATH/undo に保存し、タブを閉じても残す
+UNDO_PERSIST = os.environ.get("PERSISTENCE_UNDO_PERSIST", "0") not in ("", "0")
+# PERSISTENCE_PREFETCH_MB: 選択中プロセスの前後と最近使ったプロセスをバックグラウンドで先読みする (先読み分の上限 MB、未設定なら無効)
+PREFETCH_MB = os.environ.get("PERSISTENCE_PREFETCH_MB")
+# 先読み対象にする「最近使ったプロセス」の数 (セッションごと)
+PREFETCH_RECENT = 5
+# PERSISTENCE_TENANT: このインスタンスが扱うテナント。DATA_PATH/tenants/<name> に他テナントと分けて保存する (未設定なら DATA_PATH 直下)
+TENANT = os.environ.get("PERSISTENCE_TENANT") or None
+if TENANT and (READ_ONLY or STORAGE_SERVER):
+    raise RuntimeError("PERSISTENCE_TENANT requires local storage (not PERSISTENCE_SERVER / PERSISTENCE_READ_ONLY)")
+# テナントの上限 (未設定なら無制限)
+# PERSISTENCE_TENANT_MAX_PROCESSES: プロセス数 / PERSISTENCE_TENANT_MAX_MB: 保存データの合計 MB
+# PERSISTENCE_TENANT_SAVES_PER_SECOND: 1秒あたりの保存回数 (超えた分は少し待ち、待ちきれなければ拒否)
+_max_processes = os.environ.get("PERSISTENCE_TENANT_MAX_PROCESSES")
+_max_mb = os.environ.get("PERSISTENCE_TENANT_MAX_MB")
+_saves_per_second = os.environ.get("PERSISTENCE_TENANT_SAVES_PER_SECOND")
+TENANT_QUOTA = TenantQuota(
+    max_processes=int(_max_processes) if _max_processes else None,
+    max_bytes=int(float(_max_mb) * 1024 * 1024) if _max_mb else None,
+    saves_per_second=float(_saves_per_second) if _saves_per_second else None,
+)
+# テナントごとのデータ (プロセス・undo 履歴) の置き場所
+STORE_PATH = DATA_PATH / "tenants" / TENANT if TENANT else DATA_PATH
+
+# 保存対象キーの宣言 (型と既定値)。保存時はここにあるキーだけを読み、読み込み時に既定値を補う
+persisted_keys = KeyRegistry()
+
+@persisted_keys.schema
+class ProcessKeys:
+    persist_current_step: int = 1
+    persist_担当者名: str = ""
+    persist_ステータス: Literal["準備中", "実行中", "完了", "保留"] = "準備中"
+    persist_進捗率: int = 0
+    persist_説明: str = ""
+    persist_優先度: Literal["低", "中", "高"] = "中"
+    persist_task1: bool = False
+    persist_task2: bool = False
+    persist_task3: bool = False
+    persist_task4: bool = False
+
+# 保存データのスキーマ移行。キー名や値の形を変えるときはここに1段ずつ登録する
+# (読み込み時に変換され、次の保存で書き戻される)
+#
+#   @schema_migrations.register(1)
+#   def rename_assignee(data):
+#       data["persist_担当者名"] = data.pop("persist_担当者", "")
+#       return data
+schema_migrations = MigrationRegistry()
+
+def _create_local_storage(path: Path):
+    if PARTITIONS > 1:
+        return PartitionedStorage.from_paths(
+            [path / f"partition-{i}" for i in range(PARTITIONS)],
+            metrics=metrics,
+            archive_after=archive_after,
+            migrations=schema_migrations,
+        )
+    return SimpleStorage(path, metrics=metrics, archive_after=archive_after, migrations=schema_migrations)
+
+def _create_storage():
+    if READ_ONLY:
+        return ReadOnlyStorage(Path(cast(str, REPLICA_PATH)), migrations=schema_migrations)
+    if STORAGE_SERVER:
+        # 移行はサーバー側のストレージで行う
+        return RemoteStorage(parse_address(STORAGE_SERVER))
+    if TENANT:
+        # テナントごとに別ディレクトリ (ロック・変更フィード・アーカイブも別) で、上限付きで保存する
+        registry = TenantRegistry(DATA_PATH, quota=TENANT_QUOTA, storage_factory=_create_local_storage)
+        return registry.storage(TENANT)
+    return _create_local_storage(DATA_PATH)
+
+_storage = _create_storage()
+cache = None
+prefetcher = None
+if PREFETCH_MB:
+    prefetch_bytes = int(float(PREFETCH_MB) * 1024 * 1024)
+    # 通常の読み込み分も同じだけ持てるよう、キャッシュ全体は先読み予算の2倍
+    cache = CachedStorage(_storage, max_bytes=2 * prefetch_bytes)
+    prefetcher = Prefetcher(cache, max_bytes=prefetch_bytes, recent=PREFETCH_RECENT)
+    prefetcher.start()
+manager = StreamlitSessionManager(
+    STORE_PATH,
+    metrics=metrics,
+    archive_after=archive_after,
+    storage=cache if cache is not None else _storage,
+    keys=persisted_keys,
+    undo_max_bytes=int(UNDO_KB * 1024) if UNDO_KB > 0 and not READ_ONLY else None,
+    undo_store=UndoStore(STORE_PATH / "undo") if UNDO_PERSIST else None,
+    namespace=TENANT,
+)
+if REPLICA_PATH and not READ_ONLY:
+    _local = _storage.backend if isinstance(_storage, TenantStorage) else _storage
+    if isinstance(_local, SimpleStorage):
+        SnapshotPublisher(_local, Path(REPLICA_PATH)).start()
+    else:
+        # サーバー / パーティション利用時はデータを持つ側で scripts/publish_snapshots.py を実行する
+        logger.warning("PERSISTENCE_REPLICA_PATH is only published for a local SimpleStorage")
+# 全プロセスの集計 (保存・削除ごとに差分更新し、ダッシュボードで使用)
+# サーバー利用時は変更通知を受け取れないため無効 (保持ルールもサーバー側で実行する)
+aggregates = None if STORAGE_SERVER else AggregateView(manager.get_storage(), migrations=schema_migrations)
+# PERSISTENCE_RETENTION_COMPLETED_DAYS: 完了済みプロセスを最終更新からこの日数で自動削除 (未設定なら無効)
+RETENTION_COMPLETED_DAYS = os.environ.get("PERSISTENCE_RETENTION_COMPLETED_DAYS")
+if RETENTION_COMPLETED_DAYS and not STORAGE_SERVER and not READ_ONLY:
+    retention = RetentionEngine(
+        manager.get_storage(),
+        [RetentionRule(max_age=timedelta(days=float(RETENTION_COMPLETED_DAYS)), statuses=frozenset({"完了"}))],
+    )
+    RetentionSweeper(retention).start()
+# 未移行のプロセスを少しずつバックグラウンドで書き換える
+if schema_migrations.current_version > 0 and not STORAGE_SERVER and not READ_ONLY:
+    SchemaUpgrader(manager.get_storage()).start()
+
+# PERSISTENCE_SESSION_IDLE_SECONDS: この秒数操作のないセッションの保存対象キーをメモリから外す (未設定なら無効)
+# PERSISTENCE_SESSION_MEMORY_MB: 全セッションが保持する保存対象キーの推定サイズの上限 (超えたら古いセッションから外す)
+SESSION_IDLE_SECONDS = os.environ.get("PERSISTENCE_SESSION_IDLE_SECONDS")
+SESSION_MEMORY_MB = os.environ.get("PERSISTENCE_SESSION_MEMORY_MB")
+offloader = None
+
+def _session_is_active(session_id: str) -> bool:
+    # タブを閉じたセッションは追跡から外す (ランタイムのない AppTest 等では常に有効とみなす)
+    return not Runtime.exists() or Runtime.instance().is_active_session(session_id)
+
+if (SESSION_IDLE_SECONDS or SESSION_MEMORY_MB) and not READ_ONLY:
+    offloader = SessionOffloader(
+        manager,
+        idle_after=float(SESSION_IDLE_SECONDS) if SESSION_IDLE_SECONDS else float("inf"),
+        max_resident_bytes=int(float(SESSION_MEMORY_MB) * 1024 * 1024) if SESSION_MEMORY_MB else None,
+        is_active=_session_is_active,
+    )
+
+
+class _SessionStateMapping(MutableMapping):
+    """別スレッドから他セッションの session_state を操作するための Mapping。
+
+    ``st.session_state`` は実行中スレッドのセッションを指すため、
+    スレッドセーフな ``SafeSessionState`` を直接包んで ``SessionOffloader`` に渡す。
+    """
+
+    def __init__(self, state: Any) -> None:
+        self._state = state
+
+    def __getitem__(self, key: str) -> Any:
+        return self._state[key]
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        self._state[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        del self._state[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._state.filtered_state))
+
+    def __len__(self) -> int:
+        return len(self._state.filtered_state)
+
+
+def _touch_session() -> None:
+    ctx = get_script_run_ctx()
+    if offloader is not None and ctx is not None:
+        offloader.touch(ctx.session_id, _SessionStateMapping(ctx.session_state))
+
+def _profiling_mode() -> str | None:
+    """プロファイルモードを返す。None / "cpu" / "mem"。
+
+    クエリパラメータ ``?profile=1`` (``?profile=mem`` で tracemalloc も有効) で
+    セッション単位に切り替え、``?profile=0`` で解除する。
+    環境変数 ``PERSISTENCE_PROFILE`` は全セッションのデフォルトになる。
+    """
+    requested = st.query_params.get("profile")
+    if requested is not None:
+        st.session_state['profile_mode'] = None if requested in ("", "0", "off") else requested
+    mode = st.session_state.get('profile_mode', os.environ.get("PERSISTENCE_PROFILE"))
+    if not mode or mode in ("0", "off"):
+        return None
+    return "mem" if mode == "mem" else "cpu"
+
+
+@contextmanager
+def profile_rerun(page_name: str) -> Iterator[None]:
+    """Profile one rerun of a page when profiling is enabled for this session."""
+    mode = _profiling_mode()
+    if mode is None:
+        yield
+        return
+    profiler = RerunProfiler(LOG_PATH, page_name, trace_memory=(mode == "mem"))
+    try:
+        with profiler:
+            yield
+    finally:
+        # st.stop() / st.rerun() も例外として抜けてくるので finally で表示する
+        if profiler.summary:
+            with st.sidebar.expander("⏱ プロファイル (この再実行)"):
+                st.caption(str(profiler.stats_path))
+                st.code(profiler.summary, language=None)
+
 
 def get_storage():
     """Get storage instance for backward compatibility."""
     return manager.get_storage()
 
+def tenant_usage() -> TenantUsage | None:
+    """このインスタンスのテナントの使用量 (テナント未設定なら None)。"""
+    return _storage.usage() if isinstance(_storage, TenantStorage) else None
+
+def quota_message(error: QuotaExceededError) -> str:
+    """容量制限で保存が拒否されたときの表示用メッセージ。"""
+    if isinstance(error, SaveRateLimitedError):
+        return f"保存が集中しています。{error.retry_after:.1f} 秒ほど待ってから操作してください。"
+    if error.quota == "max_processes":
+        return f"プロセス数の上限 ({error.limit} 件) に達しています。不要なプロセスを削除してください。"
+    return f"保存容量の上限 ({error.limit / 1024 / 1024:.1f} MB) に達しています。不要なプロセスを削除してください。"
+
+@contextmanager
+def quota_guard() -> Iterator[None]:
+    """テナントの上限で保存が拒否されたら通知して続行する (値は session_state に残り、次の保存で再試行される)。"""
+    try:
+        yield
+    except QuotaExceededError as e:
+        logger.info("save rejected: %s", e)
+        st.toast(f"⚠️ 保存できませんでした: {quota_message(e)}")
+
 def load_process_data():
-    """Load selected process data into session state."""
+    """Load selected process data into session state.
+
+    選択が変わったとき、または保存データの版が変わったときだけ読み込む。
+    """
     if selected_process := st.session_state.get('selected_process'):
-        process_data = manager.load_process_data(selected_process)
-        if process_data:
-            # Overwrite loaded data into session state
-            for key, value in process_data.items():
-                st.session_state[key] = value
-                print(f"\ton session_state, set {key}:{value}")
+        # 解放済み (アイドル) のセッションはここで保存データから読み込み直される
+        manager.sync_session(st.session_state, selected_process)
+        _touch_session()
 
 def save_process_data(process_name: str | None = None):
-    """Save current session state to selected process."""
-    if st.session_state.get('session_already_saved'):
-        # 値を上書きしてしまうので何もしない
-        print("pass saving process data")
-        # プロセスデータの保存をパスするマークをリセット
-        del st.session_state['session_already_saved'] 
-        return
+    """Save current session state to selected process.
+
+    session_state が保持しているのが別プロセスのデータの場合や、値が変わっていない場合は保存しない。
+    """
     selected_process = process_name or st.session_state.get('selected_process')
-    # process name が指定された場合は、session_state側を無視してそちらを利用する 
-    if selected_process:
-        # Convert SessionStateProxy to Dict[str, Any] to satisfy type checker
-        session_data = {str(k): v for k, v in st.session_state.items()}
-        manager.save_process_data(selected_process, session_data)
-
-def save_prev_selected_session():
-    """一つ前に選択されていたプロセス名し、セッションを保存。デフォルトのセッション保存をパスするようにsession_sateにマークをを指定。"""
-    prev_process_name = st.session_state.get('selected_process_prev', None)
-    if not prev_process_name:
-        pass
-    else:
-        # 過去のプロセス名でセッションを保存
-        save_process_data(process_name=prev_process_name)
-    new_process_name = st.session_state['selected_process']
-    # デフォルトで呼ばれるセッション保存をパスするようにマーク
-    st.session_state['session_already_saved'] = True
-    # 過去のプロセス名を更新
-    st.session_state["selected_process_prev"] = new_process_name
+    if selected_process and not READ_ONLY:
+        with quota_guard():
+            manager.save_session(st.session_state, selected_process)
+
+def save_fragment_keys(keys: Iterable[str]):
+    """フラグメント内のキーだけを保存する。
+
+    ``st.fragment`` の部分再実行ではページ先頭の ``save_process_data()`` が走らないため、
+    フラグメントの末尾で自分が持つキーだけを書き込む。
+    """
+    if READ_ONLY:
+        return
+    if selected_process := st.session_state.get('selected_process'):
+        with quota_guard():
+            manager.save_keys(st.session_state, selected_process, keys)
+        _touch_session()
+
+def undo_edit():
+    """Undo ボタンのコールバック: 直前の編集を取り消す。
+
+    ウィジェットの値を書き換えるため、ウィジェット描画前に走るコールバックで行う。
+    """
+    if selected_process := st.session_state.get('selected_process'):
+        with quota_guard():
+            if not manager.undo(st.session_state, selected_process):
+                st.toast("元に戻せる変更がありません。")
+
+def redo_edit():
+    """Redo ボタンのコールバック: 取り消した編集をやり直す。"""
+    if selected_process := st.session_state.get('selected_process'):
+        with quota_guard():
+            if not manager.redo(st.session_state, selected_process):
+                st.toast("やり直せる変更がありません。")
+
+def render_undo_controls():
+    """サイドバーに Undo / Redo ボタンを表示する (undo 無効時やプロセス未選択時は表示しない)。
+
+    フラグメントだけの再実行ではサイドバーが更新されないため、ボタンは常に押せるようにしておく。
+    """
+    if manager.undo_max_bytes is None or not st.session_state.get('selected_process'):
+        return
+    col1, col2 = st.sidebar.columns(2)
+    with col1:
+        st.button("↩️ 元に戻す", key="undo_edit", on_click=undo_edit, use_container_width=True)
+    with col2:
+        st.button("↪️ やり直す", key="redo_edit", on_click=redo_edit, use_container_width=True)
+
+def switch_selected_process():
+    """選択変更時のコールバック: 直前のプロセスを保存してから新しいプロセスを読み込む。"""
+    if selected_process := st.session_state.get('selected_process'):
+        if READ_ONLY:
+            manager.sync_session(st.session_state, selected_process)
+        else:
+            with quota_guard():
+                manager.switch_process(st.session_state, selected_process)
+
+def _prefetch_next(selected: str, options: list[str]):
+    """選択中プロセスの前後と最近使ったプロセスの先読みを依頼する (読み込み自体は別スレッド)。"""
+    recent = [selected] + [name for name in st.session_state.get('recent_processes', []) if name != selected]
+    st.session_state['recent_processes'] = recent[:PREFETCH_RECENT + 1]
+    if prefetcher is not None:
+        prefetcher.hint(selected, options, recent[1:])
 
 def render_process_selector():
-    """Render process selector in sidebar."""
+    """Render process selector in sidebar.
+
+    ブラウザへ送る選択肢は検索結果の上位 ``SELECTOR_LIMIT`` 件 (最近更新順) に限定する。
+    """
+    if cache is not None:
+        # 他の書き手 (保持ルール・別インスタンス等) が変更したプロセスをキャッシュから外す
+        cache.sync_changes()
     available_processes = manager.list_processes()
     
     st.sidebar.header("プロセス選択")
     
     if available_processes:
-        selected = st.sidebar.selectbox(
-            "現在のプロセス",
-            available_processes,
-            key='selected_process',
-            on_change=save_prev_selected_session,
+        query = st.sidebar.text_input(
+            "🔍 絞り込み",
+            key='process_filter',
+            placeholder="プロセス名の一部を入力",
         )
+        options = manager.search_processes(query, limit=SELECTOR_LIMIT)
+        # 選択中のプロセスは絞り込み結果に含まれなくても選択肢に残す
+        current = st.session_state.get('selected_process')
+        if current and current not in options and manager.process_exists(current):
+            options.insert(0, current)
+        
+        if options:
+            selected = st.sidebar.selectbox(
+                "現在のプロセス",
+                options,
+                key='selected_process',
+                on_change=switch_selected_process,
+            )
+            if len(options) >= SELECTOR_LIMIT:
+                st.sidebar.caption(f"最近更新された {SELECTOR_LIMIT} 件を表示中。名前で絞り込めます。")
+        else:
+            selected = None
+            st.sidebar.caption("一致するプロセスがありません。")
         
         if selected:
-            print(f"process is selected. {selected}")
+            logger.debug("process is selected: %s", selected)
             load_process_data()
             process_info = manager.get_process_info(selected)
             if process_info:
                 st.sidebar.info(f"最終更新: {process_info.get('last_updated', 'N/A')}")
+            _prefetch_next(selected, options)
         
         st.sidebar.divider()
     else:
         st.sidebar.warning("プロセスがありません。新規作成してください。")
     
+    if TENANT:
+        st.sidebar.caption(f"🏢 テナント: {TENANT}")
+    if READ_ONLY:
+        staleness = cast(ReadOnlyStorage, manager.get_storage()).staleness
+        st.sidebar.caption(
+            "🔒 読み取り専用レプリカ" + (f" ({staleness:.0f} 秒前に公開されたデータ)" if staleness is not None else " (未公開)")
+        )
+    
     return available_processes
@@ -0,0 +1,72 @@
+"""ワークスペースの各ステップ (フラグメント)
+
+ページと再実行時間の計測スクリプト (scripts/bench_workspace_rerun.py) の両方から使う。
+"""
+import streamlit as st
+from shared import save_fragment_keys
+
+# 各ステップ (フラグメント) が保存を担当するキー
+STEP_KEYS = {
+    1: ['persist_担当者名', 'persist_ステータス', 'persist_進捗率'],
+    2: ['persist_説明', 'persist_優先度'],
+    3: ['persist_task1', 'persist_task2', 'persist_task3', 'persist_task4'],
+}
+
+
+@st.fragment
+def render_step_1():
+    """Step.1: 基本情報"""
+    st.subheader("📝 Step.1: 基本情報")
+    st.markdown("プロセスの基本的な情報を入力してください。")
+    st.markdown("---")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        name = st.text_input("担当者名", key='persist_担当者名')
+        status = st.selectbox("ステータス", ["準備中", "実行中", "完了", "保留"], key='persist_ステータス')
+
+    with col2:
+        progress = st.slider("進捗率", 0, 100, key='persist_進捗率')
+
+    # 入力変更時はこのフラグメントだけが再実行されるので、ここで自分のキーを保存する
+    save_fragment_keys(STEP_KEYS[1])
+
+
+@st.fragment
+def render_step_2():
+    """Step.2: 詳細情報"""
+    st.subheader("📋 Step.2: 詳細情報")
+    st.markdown("プロセスの詳細な説明と優先度を設定してください。")
+    st.markdown("---")
+
+    description = st.text_area("説明", key='persist_説明', height=150)
+    priority = st.radio("優先度", ["低", "中", "高"], key='persist_優先度', horizontal=True)
+
+    save_fragment_keys(STEP_KEYS[2])
+
+
+@st.fragment
+def render_step_3():
+    """Step.3: チェックリスト"""
+    st.subheader("✅ Step.3: チェックリスト")
+    st.markdown("各タスクの完了状況をチェックしてください。")
+    st.markdown("---")
+
+    col1, col2 = st.columns(2)
+
+    with col1:
+        task1 = st.checkbox("タスク1: 初期設定", key='persist_task1')
+        task2 = st.checkbox("タスク2: データ収集", key='persist_task2')
+
+    with col2:
+        task3 = st.checkbox("タスク3: 分析実行", key='persist_task3')
+        task4 = st.checkbox("タスク4: レポート作成", key='persist_task4')
+
+    # 完了率表示
+    completed_tasks = sum([task1, task2, task3, task4])
+    completion_rate = (completed_tasks / 4) * 100
+    st.progress(completion_rate / 100)
+    st.caption(f"完了率: {completion_rate:.0f}% ({completed_tasks}/4 タスク完了)")
+
+    save_fragment_keys(STEP_KEYS[3])
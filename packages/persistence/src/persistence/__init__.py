@@ -1,18 +1,117 @@
-from .interface import StorageInterface
+from .interface import AsyncStorageInterface, StorageInterface, StorageListener
 from .simple_storage import SimpleStorage
-from .models import JsonSerializable, ProcessData
+from .compact import CompactRecord
+from .json_storage import JsonStorage
+from .models import AuditEntry, JsonSerializable, ProcessData, ProcessState, ProcessStatus
+from .metrics import (
+    MetricsSink,
+    InMemorySink,
+    LoggingSink,
+    PrometheusFileSink,
+    InstrumentedStorage,
+    create_sink,
+)
+from .profiling import RerunProfiler
+from .cached_storage import CachedStorage, CacheStats
+from .prefetch import Prefetcher, PrefetchStats
+from .change_feed import ChangeEvent, ChangeFeed, ChangeFeedGap
+from .archive import ArchiveStore
+from .name_index import NameIndex
+from .retention import RetentionEngine, RetentionReport, RetentionRule, RetentionSweeper
+from .aggregates import AggregateSummary, AggregateView
+from .codecs import CodecRegistry, SidecarStore, ValueCodec
+from .keys import KeyRegistry, PersistedKey
+from .migrations import MigrationRegistry, SchemaUpgrader
+from .migrator import MigrationReport, StorageMigrator
+from .async_storage import AsyncSimpleStorage, ExecutorAsyncStorage
+from .partitioned import HashRing, PartitionedStorage
+from .server import RemoteBatch, RemoteStorage, StorageServer, StorageServerError, parse_address
+from .replication import ReadOnlyStorage, ReadOnlyStorageError, SnapshotPublisher, StaleReplicaError
+from .backup import BackupStore, RestoreReport
+from .session_offload import SessionOffloader
+from .undo import UndoHistory, UndoStore
 from .streamlit_helpers import (
     StreamlitSessionManager,
     load_process_into_session_state,
     save_session_state_to_process,
 )
+from .tenants import (
+    QuotaExceededError,
+    SaveRateLimitedError,
+    TenantQuota,
+    TenantRegistry,
+    TenantStorage,
+    TenantUsage,
+)
 
 __all__ = [
     "StorageInterface",
+    "StorageListener",
+    "AsyncStorageInterface",
     "SimpleStorage",
+    "CompactRecord",
+    "JsonStorage",
     "JsonSerializable",
     "ProcessData",
+    "ProcessState",
+    "ProcessStatus",
+    "AuditEntry",
+    "MetricsSink",
+    "InMemorySink",
+    "LoggingSink",
+    "PrometheusFileSink",
+    "InstrumentedStorage",
+    "create_sink",
+    "RerunProfiler",
+    "CachedStorage",
+    "CacheStats",
+    "Prefetcher",
+    "PrefetchStats",
+    "ChangeEvent",
+    "ChangeFeed",
+    "ChangeFeedGap",
+    "ArchiveStore",
+    "NameIndex",
+    "RetentionEngine",
+    "RetentionReport",
+    "RetentionRule",
+    "RetentionSweeper",
+    "AggregateSummary",
+    "AggregateView",
+    "CodecRegistry",
+    "SidecarStore",
+    "ValueCodec",
+    "KeyRegistry",
+    "PersistedKey",
+    "MigrationRegistry",
+    "SchemaUpgrader",
+    "MigrationReport",
+    "StorageMigrator",
+    "AsyncSimpleStorage",
+    "ExecutorAsyncStorage",
+    "HashRing",
+    "PartitionedStorage",
+    "RemoteBatch",
+    "RemoteStorage",
+    "StorageServer",
+    "StorageServerError",
+    "parse_address",
+    "ReadOnlyStorage",
+    "ReadOnlyStorageError",
+    "SnapshotPublisher",
+    "StaleReplicaError",
+    "BackupStore",
+    "RestoreReport",
+    "SessionOffloader",
+    "UndoHistory",
+    "UndoStore",
     "StreamlitSessionManager",
     "load_process_into_session_state",
     "save_session_state_to_process",
+    "QuotaExceededError",
+    "SaveRateLimitedError",
+    "TenantQuota",
+    "TenantRegistry",
+    "TenantStorage",
+    "TenantUsage",
 ]
\ No newline at end of file
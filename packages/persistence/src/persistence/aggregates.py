@@ -0,0 +1,289 @@
+"""Incrementally maintained aggregates across all processes.
+
+Selected session-data fields are copied into array-backed columns (one row
+per process) and the totals derived from them - status counts, a histogram
+and per-column sums - are updated on every save/delete notification, so a
+dashboard can render without loading any payload.
+"""
+import math
+import threading
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .change_feed import ARCHIVE, DELETE
+from .migrations import SCHEMA_VERSION_KEY, MigrationRegistry
+from .retention import DEFAULT_STATUS_KEY
+
+DEFAULT_NUMERIC_KEYS = ("persist_進捗率",)
+DEFAULT_FLAG_KEYS = ("persist_task1", "persist_task2", "persist_task3", "persist_task4")
+
+_MISSING = float("nan")
+
+
+@dataclass
+class AggregateSummary:
+    """Point-in-time copy of the materialized aggregates."""
+    total: int
+    status_counts: Dict[str, int] = field(default_factory=dict)
+    histogram: List[Tuple[str, int]] = field(default_factory=list)
+    numeric_means: Dict[str, Optional[float]] = field(default_factory=dict)
+    flag_rates: Dict[str, Optional[float]] = field(default_factory=dict)
+
+
+def _as_number(value: Any) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return _MISSING
+    return float(value)
+
+
+def _as_flag(value: Any) -> int:
+    # -1: 未設定, 0: False, 1: True
+    if isinstance(value, bool):
+        return int(value)
+    return -1
+
+
+class AggregateView:
+    """Columnar copy of a few fields plus aggregates kept up to date from storage changes.
+
+    Columns are ``array.array`` instances (``"d"`` for numbers with NaN as
+    missing, ``"b"`` for flags with -1 as missing, ``"i"`` status codes), so
+    ad-hoc aggregations can run over them without per-process dicts, e.g.
+    ``numpy.frombuffer(view.column("persist_進捗率"))`` is a zero-copy view.
+
+    Archived processes are included; it implements ``StorageListener``.
+    Payloads stored with an older schema version are upgraded with the
+    storage's migrations before their fields are read.
+    """
+
+    def __init__(
+        self,
+        storage: Any,
+        status_key: str = DEFAULT_STATUS_KEY,
+        numeric_keys: Sequence[str] = DEFAULT_NUMERIC_KEYS,
+        flag_keys: Sequence[str] = DEFAULT_FLAG_KEYS,
+        histogram_key: Optional[str] = "persist_進捗率",
+        histogram_range: Tuple[float, float] = (0.0, 100.0),
+        histogram_bins: int = 10,
+        migrations: Optional[MigrationRegistry] = None,
+    ) -> None:
+        """Build the columns from the storage and subscribe to its changes.
+
+        Args:
+            storage: Storage providing ``data``, ``add_listener`` and the archive (e.g. SimpleStorage)
+            status_key: Categorical field counted per value
+            numeric_keys: Numeric fields kept as float columns
+            flag_keys: Boolean fields kept as flag columns
+            histogram_key: Numeric field to bucket (must be in ``numeric_keys``)
+            histogram_range: Lower and upper bound of the histogram (values outside are clamped)
+            histogram_bins: Number of equal-width buckets
+            migrations: Schema migrations (defaults to ``storage.migrations``)
+        """
+        if histogram_key is not None and histogram_key not in numeric_keys:
+            raise ValueError(f"histogram_key '{histogram_key}' must be one of numeric_keys")
+        self.status_key = status_key
+        self.numeric_keys = tuple(numeric_keys)
+        self.flag_keys = tuple(flag_keys)
+        self.histogram_key = histogram_key
+        self.histogram_range = histogram_range
+        self.histogram_bins = histogram_bins
+        self.migrations = migrations if migrations is not None else getattr(storage, "migrations", None)
+        self._lock = threading.RLock()
+
+        # 列 (1行 = 1プロセス)
+        self._names: List[str] = []
+        self._rows: Dict[str, int] = {}
+        self._status = array("i")
+        self._categories: List[str] = []
+        self._category_codes: Dict[str, int] = {}
+        self._numeric: Dict[str, array] = {key: array("d") for key in self.numeric_keys}
+        self._flags: Dict[str, array] = {key: array("b") for key in self.flag_keys}
+
+        # マテリアライズされた集計値
+        self._status_counts: List[int] = []
+        self._histogram = array("q", [0] * histogram_bins)
+        self._numeric_sums: Dict[str, float] = {key: 0.0 for key in self.numeric_keys}
+        self._numeric_counts: Dict[str, int] = {key: 0 for key in self.numeric_keys}
+        self._flag_true: Dict[str, int] = {key: 0 for key in self.flag_keys}
+        self._flag_set: Dict[str, int] = {key: 0 for key in self.flag_keys}
+
+        self.storage = storage
+        self.rebuild()
+        storage.add_listener(self)
+
+    def rebuild(self) -> None:
+        """Recompute everything from the hot records and the archive."""
+        with self._lock:
+            for name in list(self._names):
+                self._remove_row(name)
+            for name, record in self.storage.data.items():
+                self._add_row(name, self._session_data(record))
+            archive = getattr(self.storage, "archive", None)
+            if archive is not None:
+                for name, record in archive.records():
+                    if name not in self._rows:
+                        self._add_row(name, self._session_data(record))
+
+    def on_change(self, operation: str, process_name: str, record: Optional[Dict[str, Any]]) -> None:
+        """StorageListener hook: archiving keeps the row, deletion drops it."""
+        if operation == ARCHIVE:
+            return
+        with self._lock:
+            if process_name in self._rows:
+                self._remove_row(process_name)
+            if operation != DELETE and record is not None:
+                self._add_row(process_name, self._session_data(record))
+
+    def _session_data(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        # 集計する値はスカラーなので、配列ファイルは読まずに保存形式のまま移行する
+        session_data = record.get("session_data", {})
+        version = record.get(SCHEMA_VERSION_KEY, 0)
+        if self.migrations is not None and self.migrations.needs_upgrade(version):
+            session_data = self.migrations.upgrade(session_data, version)
+        return session_data
+
+    def _status_code(self, status: Any) -> int:
+        if not isinstance(status, str):
+            return -1
+        code = self._category_codes.get(status)
+        if code is None:
+            code = len(self._categories)
+            self._categories.append(status)
+            self._category_codes[status] = code
+            self._status_counts.append(0)
+        return code
+
+    def _bin(self, value: float) -> int:
+        low, high = self.histogram_range
+        position = int((value - low) / (high - low) * self.histogram_bins)
+        return min(max(position, 0), self.histogram_bins - 1)
+
+    def _add_row(self, process_name: str, session_data: Dict[str, Any]) -> None:
+        self._rows[process_name] = len(self._names)
+        self._names.append(process_name)
+
+        code = self._status_code(session_data.get(self.status_key))
+        self._status.append(code)
+        if code >= 0:
+            self._status_counts[code] += 1
+
+        for key, column in self._numeric.items():
+            value = _as_number(session_data.get(key))
+            column.append(value)
+            if not math.isnan(value):
+                self._numeric_sums[key] += value
+                self._numeric_counts[key] += 1
+                if key == self.histogram_key:
+                    self._histogram[self._bin(value)] += 1
+
+        for key, column in self._flags.items():
+            flag = _as_flag(session_data.get(key))
+            column.append(flag)
+            if flag >= 0:
+                self._flag_set[key] += 1
+                self._flag_true[key] += flag
+
+    def _remove_row(self, process_name: str) -> None:
+        row = self._rows.pop(process_name)
+
+        code = self._status[row]
+        if code >= 0:
+            self._status_counts[code] -= 1
+        for key, column in self._numeric.items():
+            value = column[row]
+            if not math.isnan(value):
+                self._numeric_sums[key] -= value
+                self._numeric_counts[key] -= 1
+                if key == self.histogram_key:
+                    self._histogram[self._bin(value)] -= 1
+        for key, column in self._flags.items():
+            flag = column[row]
+            if flag >= 0:
+                self._flag_set[key] -= 1
+                self._flag_true[key] -= flag
+
+        # 最終行を空いた行へ移して列を詰める (swap-remove)
+        last = len(self._names) - 1
+        columns: List[array] = [self._status, *self._numeric.values(), *self._flags.values()]
+        if row != last:
+            moved = self._names[last]
+            self._names[row] = moved
+            self._rows[moved] = row
+            for column in columns:
+                column[row] = column[last]
+        self._names.pop()
+        for column in columns:
+            column.pop()
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, process_name: object) -> bool:
+        return process_name in self._rows
+
+    def names(self) -> List[str]:
+        """Process names in row order (aligned with ``column()``)."""
+        with self._lock:
+            return list(self._names)
+
+    def column(self, key: str) -> array:
+        """Copy of a numeric (``"d"``) or flag (``"b"``) column, or the status codes for ``status_key``."""
+        with self._lock:
+            if key == self.status_key:
+                return array("i", self._status)
+            if key in self._numeric:
+                return array("d", self._numeric[key])
+            if key in self._flags:
+                return array("b", self._flags[key])
+        raise KeyError(key)
+
+    def categories(self) -> List[str]:
+        """Status values indexed by the codes in the status column."""
+        with self._lock:
+            return list(self._categories)
+
+    def status_counts(self) -> Dict[str, int]:
+        """Number of processes per status (statuses no longer used are omitted)."""
+        with self._lock:
+            return {
+                status: count
+                for status, count in zip(self._categories, self._status_counts)
+                if count
+            }
+
+    def histogram(self) -> List[Tuple[str, int]]:
+        """``(bucket label, count)`` for ``histogram_key``, e.g. ``("10-19", 3)``."""
+        low, high = self.histogram_range
+        width = (high - low) / self.histogram_bins
+        with self._lock:
+            counts = list(self._histogram)
+        labels = []
+        for i in range(self.histogram_bins):
+            start = low + i * width
+            end = high if i == self.histogram_bins - 1 else start + width
+            labels.append(f"{start:g}-{end:g}")
+        return list(zip(labels, counts))
+
+    def mean(self, key: str) -> Optional[float]:
+        """Mean of a numeric column over processes that have a value."""
+        with self._lock:
+            count = self._numeric_counts[key]
+            return self._numeric_sums[key] / count if count else None
+
+    def flag_rate(self, key: str) -> Optional[float]:
+        """Share of True among processes where the flag is set."""
+        with self._lock:
+            count = self._flag_set[key]
+            return self._flag_true[key] / count if count else None
+
+    def summary(self) -> AggregateSummary:
+        """All aggregates at once (independent of the number of processes)."""
+        with self._lock:
+            return AggregateSummary(
+                total=len(self._names),
+                status_counts=self.status_counts(),
+                histogram=self.histogram() if self.histogram_key is not None else [],
+                numeric_means={key: self.mean(key) for key in self.numeric_keys},
+                flag_rates={key: self.flag_rate(key) for key in self.flag_keys},
+            )
@@ -0,0 +1,135 @@
+"""Compressed cold tier for idle processes.
+
+Archived processes are written in batches to gzip-compressed JSON segments.
+A small index maps each archived process name to its segment so it can be
+listed without opening any segment and rehydrated on demand. The index also
+keeps a few session_data fields (the status by default), so retention rules
+can be rebuilt after a restart without reading the segments.
+"""
+import gzip
+import json
+import os
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .retention import DEFAULT_STATUS_KEY
+
+
+class ArchiveStore:
+    """Stores full process records (metadata + session_data) in compressed segments."""
+
+    def __init__(self, path: Path, index_keys: Sequence[str] = (DEFAULT_STATUS_KEY,)) -> None:
+        """Open an archive directory.
+
+        Args:
+            path: Directory for segments and ``index.json`` (created lazily)
+            index_keys: session_data keys copied into the index entry (``fields``)
+        """
+        self.path = Path(path)
+        self.index_keys = tuple(index_keys)
+        self.index_file = self.path / "index.json"
+        self.index: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.RLock()
+        if self.index_file.exists():
+            self.index = json.loads(self.index_file.read_bytes())
+
+    def _save_index(self) -> None:
+        self.path.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.index_file.with_name(self.index_file.name + ".tmp")
+        tmp_path.write_bytes(json.dumps(self.index, indent=2, ensure_ascii=False).encode("utf-8"))
+        os.replace(tmp_path, self.index_file)
+
+    def _read_segment(self, segment: str) -> Dict[str, Dict[str, Any]]:
+        with gzip.open(self.path / segment, "rb") as f:
+            return json.loads(f.read())
+
+    def archive(self, records: Dict[str, Dict[str, Any]]) -> Optional[str]:
+        """Write records into a new segment and index them.
+
+        Args:
+            records: Mapping of process name to full stored record
+
+        Returns:
+            The segment file name, or None if ``records`` is empty
+        """
+        if not records:
+            return None
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            archived_at = datetime.now()
+            segment = f"segment-{archived_at.strftime('%Y%m%d-%H%M%S-%f')}.json.gz"
+            payload = json.dumps(records, ensure_ascii=False).encode("utf-8")
+            tmp_path = self.path / (segment + ".tmp")
+            with gzip.open(tmp_path, "wb") as f:
+                f.write(payload)
+            os.replace(tmp_path, self.path / segment)
+
+            # A re-archived process supersedes its entry in an older segment
+            for name in records:
+                self._forget(name)
+            for name, record in records.items():
+                self.index[name] = {
+                    "segment": segment,
+                    "created": record.get("created"),
+                    "last_updated": record.get("last_updated"),
+                    "archived_at": archived_at.isoformat(),
+                    # 対象キーは値がなくても None で記録する (索引済みかどうかを区別できるように)
+                    "fields": {key: record.get("session_data", {}).get(key) for key in self.index_keys},
+                }
+            self._save_index()
+            return segment
+
+    def load(self, process_name: str) -> Optional[Dict[str, Any]]:
+        """Read one archived record (without removing it)."""
+        with self._lock:
+            entry = self.index.get(process_name)
+            if entry is None:
+                return None
+            return self._read_segment(entry["segment"]).get(process_name)
+
+    def records(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Read ``(name, record)`` for every archived process, opening each segment once."""
+        result: List[Tuple[str, Dict[str, Any]]] = []
+        with self._lock:
+            by_segment: Dict[str, List[str]] = {}
+            for name, entry in self.index.items():
+                by_segment.setdefault(entry["segment"], []).append(name)
+            for segment, names in by_segment.items():
+                records = self._read_segment(segment)
+                for name in names:
+                    if name in records:
+                        result.append((name, records[name]))
+        return result
+
+    def remove(self, process_name: str) -> bool:
+        """Drop a process from the archive, deleting its segment once nothing references it."""
+        with self._lock:
+            if process_name not in self.index:
+                return False
+            self._forget(process_name)
+            self._save_index()
+            return True
+
+    def _forget(self, process_name: str) -> None:
+        entry = self.index.pop(process_name, None)
+        if entry is None:
+            return
+        segment = entry["segment"]
+        if not any(e["segment"] == segment for e in self.index.values()):
+            (self.path / segment).unlink(missing_ok=True)
+
+    def list_archived(self) -> List[str]:
+        """List archived process names."""
+        return list(self.index.keys())
+
+    def get_info(self, process_name: str) -> Optional[Dict[str, Any]]:
+        """Get the index entry (created / last_updated / archived_at / fields) of an archived process."""
+        return self.index.get(process_name)
+
+    def __contains__(self, process_name: object) -> bool:
+        return process_name in self.index
+
+    def __len__(self) -> int:
+        return len(self.index)
@@ -0,0 +1,130 @@
+"""Asyncio front ends for the storage backends.
+
+``ExecutorAsyncStorage`` wraps any synchronous backend and runs each call on
+a bounded thread pool, so file I/O and JSON encoding never block the event
+loop and ``asyncio.gather`` over many calls overlaps them.
+``AsyncSimpleStorage`` knows ``SimpleStorage``'s layout: reads served from
+its in-memory hot tier are answered on the loop without a thread hop, and
+only calls that touch files go to the pool.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .codecs import sidecar_refs
+from .models import ProcessData
+from .simple_storage import SimpleStorage
+
+
+class ExecutorAsyncStorage:
+    """``AsyncStorageInterface`` over any synchronous storage.
+
+    Methods other than the interface ones (``update_process``,
+    ``search_processes``, ...) are forwarded as coroutines too.
+    """
+
+    def __init__(self, backend: Any, max_workers: int = 8, executor: Optional[ThreadPoolExecutor] = None) -> None:
+        """Wrap a synchronous storage.
+
+        Args:
+            backend: Storage to wrap (``SimpleStorage``, ``CachedStorage``, ``RemoteStorage``, ...)
+            max_workers: Size of the thread pool (the number of calls running at once)
+            executor: Use this pool instead of creating one (it is then not shut down by ``close``)
+        """
+        self.backend = backend
+        self._owns_executor = executor is None
+        self._executor = executor or ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="async-storage")
+
+    async def _call(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+
+    async def save_process(self, process_name: str, session_data: ProcessData) -> None:
+        await self._call(self.backend.save_process, process_name, session_data)
+
+    async def load_process(self, process_name: str) -> Optional[ProcessData]:
+        return await self._call(self.backend.load_process, process_name)
+
+    async def list_processes(self) -> List[str]:
+        return await self._call(self.backend.list_processes)
+
+    async def delete_process(self, process_name: str) -> bool:
+        return await self._call(self.backend.delete_process, process_name)
+
+    async def process_exists(self, process_name: str) -> bool:
+        return await self._call(self.backend.process_exists, process_name)
+
+    async def load_processes(self, process_names: List[str]) -> Dict[str, Optional[ProcessData]]:
+        """Load several processes concurrently."""
+        results = await asyncio.gather(*(self.load_process(name) for name in process_names))
+        return dict(zip(process_names, results))
+
+    def __getattr__(self, name: str) -> Any:
+        attr = getattr(self.backend, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def call(*args: Any, **kwargs: Any) -> Any:
+            return await self._call(attr, *args, **kwargs)
+        return call
+
+    def close(self) -> None:
+        """Shut down the thread pool (if this instance created it)."""
+        if self._owns_executor:
+            self._executor.shutdown(wait=False)
+
+    async def __aenter__(self) -> "ExecutorAsyncStorage":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.close()
+
+
+class AsyncSimpleStorage(ExecutorAsyncStorage):
+    """Async ``SimpleStorage``.
+
+    Hot records without sidecar arrays are decoded on the event loop; loads
+    that read sidecar files or rehydrate from the archive run concurrently
+    on the pool. Writes also run on the pool, where ``SimpleStorage``'s lock
+    serializes them.
+    """
+
+    backend: SimpleStorage
+
+    @classmethod
+    async def open(cls, base_path: Path, max_workers: int = 8, **storage_kwargs: Any) -> "AsyncSimpleStorage":
+        """Create the ``SimpleStorage`` (which reads ``processes.json``) without blocking the loop.
+
+        Args:
+            base_path: Data directory
+            max_workers: Size of the thread pool
+            **storage_kwargs: Passed to ``SimpleStorage``
+        """
+        executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="async-storage")
+        loop = asyncio.get_running_loop()
+        storage = await loop.run_in_executor(executor, functools.partial(SimpleStorage, base_path, **storage_kwargs))
+        instance = cls(storage, executor=executor)
+        instance._owns_executor = True
+        return instance
+
+    async def load_process(self, process_name: str) -> Optional[ProcessData]:
+        storage = self.backend
+        record = storage.data.get(process_name)
+        if record is not None:
+            session_data = record.get("session_data", {})
+            if not sidecar_refs(session_data):
+                # ファイルを読まないのでループ上でそのまま返す (スキーマ移行は同期版と同じく適用する)
+                return storage._decode_record(process_name, record)
+        return await self._call(storage.load_process, process_name)
+
+    async def list_processes(self) -> List[str]:
+        return self.backend.list_processes()
+
+    async def process_exists(self, process_name: str) -> bool:
+        return self.backend.process_exists(process_name)
+
+    async def get_process_info(self, process_name: str) -> Optional[Dict[str, Any]]:
+        return self.backend.get_process_info(process_name)
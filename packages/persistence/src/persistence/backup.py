@@ -0,0 +1,281 @@
+"""Online, incremental backups of a ``SimpleStorage``.
+
+A backup is taken at a change-feed position: ``snapshot_records`` copies the
+records under the storage lock (no file I/O, so saves are not held up) and
+everything is written from that copy. The first backup is full; later ones
+store only the processes changed since the previous backup's position, and
+array files are content-addressed so each one is copied once::
+
+    backups/
+        catalog.json                          backups in order (id, kind, parent, seq)
+        <id>.json.gz                          hot / archived records, deleted names, checksums
+        sidecars/<dir>/<hash>.npy             array files shared by all backups
+
+Every backup records a checksum of each process's decoded data, so
+``verify`` can check a backup chain in place and ``restore`` checks the
+restored directory against it.
+"""
+import json
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from .archive import ArchiveStore
+from .change_feed import ChangeFeedGap
+from .codecs import CodecRegistry, SidecarStore, sidecar_refs
+from .compact import plain
+from .migrator import checksum
+from .replication import link_or_copy, read_gzip, write_atomic, write_gzip
+from .simple_storage import SimpleStorage, sidecar_dir_name
+
+logger = logging.getLogger(__name__)
+
+FULL = "full"
+INCREMENTAL = "incremental"
+
+
+@dataclass
+class RestoreReport:
+    """Result of ``BackupStore.verify`` / ``BackupStore.restore``."""
+    backup_id: str
+    processes: int = 0
+    verified: int = 0
+    mismatched: List[str] = field(default_factory=list)
+    errors: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatched and not self.errors
+
+    def format(self) -> str:
+        """Human readable summary (used by the CLI)."""
+        lines = [f"Backup {self.backup_id}: verified {self.verified}/{self.processes} processes"]
+        lines.extend(f"  checksum mismatch: {name}" for name in self.mismatched)
+        lines.extend(f"  error: {name}: {error}" for name, error in sorted(self.errors.items()))
+        return "\n".join(lines)
+
+
+class BackupStore:
+    """Directory of backups of one storage."""
+
+    def __init__(self, path: Path, codecs: Optional[CodecRegistry] = None) -> None:
+        """Open (or create lazily) a backup directory.
+
+        Args:
+            path: Backup directory
+            codecs: Codecs of the backed-up storage (used to checksum decoded data)
+        """
+        self.path = Path(path)
+        self.catalog_file = self.path / "catalog.json"
+        self.codecs = codecs if codecs is not None else CodecRegistry.default()
+        self.sidecar_path = self.path / "sidecars"
+
+    def backups(self) -> List[Dict[str, Any]]:
+        """Catalog entries, oldest first."""
+        try:
+            return json.loads(self.catalog_file.read_bytes())["backups"]
+        except FileNotFoundError:
+            return []
+
+    def _entry(self, backup_id: Optional[str]) -> Dict[str, Any]:
+        backups = self.backups()
+        if not backups:
+            raise ValueError(f"no backups in {self.path}")
+        if backup_id is None:
+            return backups[-1]
+        for entry in backups:
+            if entry["id"] == backup_id:
+                return entry
+        raise ValueError(f"unknown backup '{backup_id}'")
+
+    def _chain(self, backup_id: Optional[str]) -> List[Dict[str, Any]]:
+        """The full backup and the incrementals leading to ``backup_id``."""
+        by_id = {entry["id"]: entry for entry in self.backups()}
+        chain = [self._entry(backup_id)]
+        while chain[-1]["parent"] is not None:
+            chain.append(by_id[chain[-1]["parent"]])
+        return list(reversed(chain))
+
+    # --- backup ---
+
+    def backup(self, storage: SimpleStorage, full: bool = False) -> Optional[Dict[str, Any]]:
+        """Back up the storage at its current change-feed position.
+
+        Args:
+            storage: Storage to back up (change tracking must be enabled)
+            full: Take a full backup even if an earlier one exists
+
+        Returns:
+            The new catalog entry, or None if nothing changed since the last backup
+        """
+        backups = self.backups()
+        parent = None if full or not backups else backups[-1]
+        try:
+            seq, hot = storage.snapshot_records(since=parent["seq"] if parent else None)
+        except ChangeFeedGap:
+            # 前回の位置以降の履歴が圧縮済み: 全体バックアップに切り替える
+            logger.info("change history since seq %d was compacted; taking a full backup", parent["seq"] if parent else 0)
+            parent = None
+            seq, hot = storage.snapshot_records()
+        if parent is not None and not hot:
+            return None
+
+        # アーカイブは索引を読み直して使う (他プロセスが移動しているかもしれない)
+        archive = ArchiveStore(storage.archive.path)
+        archived: Dict[str, Dict[str, Any]] = {}
+        deleted: List[str] = []
+        if parent is None:
+            archived = {name: record for name, record in archive.records() if name not in hot}
+        for name in [name for name, record in hot.items() if record is None]:
+            del hot[name]
+            record = archive.load(name)
+            if record is not None:
+                archived[name] = record
+            else:
+                deleted.append(name)
+
+        checksums: Dict[str, str] = {}
+        for records in (hot, archived):
+            for name in list(records):
+                records[name] = self._copy_sidecars(storage, name, records[name])
+                checksums[name] = self._checksum(name, records[name])
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        backup_id = f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{seq:012d}"
+        file_name = f"{backup_id}.json.gz"
+        write_gzip(self.path / file_name, {
+            "seq": seq,
+            "since": parent["seq"] if parent else None,
+            "hot": hot,
+            "archived": archived,
+            "deleted": deleted,
+            "checksums": checksums,
+        })
+        entry = {
+            "id": backup_id,
+            "kind": INCREMENTAL if parent else FULL,
+            "parent": parent["id"] if parent else None,
+            "seq": seq,
+            "created_at": datetime.now().isoformat(),
+            "file": file_name,
+            "changed": len(hot) + len(archived) + len(deleted),
+        }
+        # カタログは最後に書く: 途中で失敗したバックアップは一覧に現れない
+        write_atomic(self.catalog_file, json.dumps({"backups": [*backups, entry]}, indent=2).encode("utf-8"))
+        logger.info("%s backup %s: %d changed processes up to seq %d", entry["kind"], backup_id, entry["changed"], seq)
+        return entry
+
+    def _copy_sidecars(self, storage: SimpleStorage, name: str, record: Dict[str, Any]) -> Dict[str, Any]:
+        """Copy the array files of a record; re-read the record if it was overwritten meanwhile."""
+        directory = sidecar_dir_name(name)
+        for _ in range(3):
+            missing = False
+            for ref in sidecar_refs(record.get("session_data", {})):
+                target = self.sidecar_path / directory / ref
+                if target.exists():
+                    continue
+                try:
+                    link_or_copy(storage.sidecar_path / directory / ref, target)
+                except FileNotFoundError:
+                    missing = True
+            if not missing:
+                return record
+            # スナップショット後に上書き保存され、古い配列が削除された: 新しい版を使う
+            with storage._lock:
+                storage.reload_if_changed()
+                latest = plain(storage.data.get(name))
+            if latest is None:
+                break
+            record = latest
+        raise RuntimeError(f"array files of process '{name}' changed while they were backed up")
+
+    def _checksum(self, name: str, record: Dict[str, Any]) -> str:
+        sidecars = SidecarStore(self.sidecar_path / sidecar_dir_name(name))
+        return checksum(self.codecs.decode(record.get("session_data", {}), sidecars))
+
+    # --- verify / restore ---
+
+    def _state(self, backup_id: Optional[str]) -> Tuple[str, Dict[str, Tuple[str, Dict[str, Any], str]]]:
+        """Fold a backup chain into ``{name: (tier, record, checksum)}``."""
+        chain = self._chain(backup_id)
+        state: Dict[str, Tuple[str, Dict[str, Any], str]] = {}
+        for entry in chain:
+            payload = read_gzip(self.path / entry["file"])
+            for name in payload["deleted"]:
+                state.pop(name, None)
+            for tier in ("hot", "archived"):
+                for name, record in payload[tier].items():
+                    state[name] = (tier, record, payload["checksums"][name])
+        return chain[-1]["id"], state
+
+    def verify(self, backup_id: Optional[str] = None) -> RestoreReport:
+        """Check that every process of a backup decodes to its recorded checksum.
+
+        Args:
+            backup_id: Backup to check (defaults to the latest)
+        """
+        resolved, state = self._state(backup_id)
+        report = RestoreReport(resolved, processes=len(state))
+        for name, (_, record, expected) in state.items():
+            try:
+                actual = self._checksum(name, record)
+            except Exception as error:
+                report.errors[name] = str(error)
+                continue
+            if actual == expected:
+                report.verified += 1
+            else:
+                report.mismatched.append(name)
+        return report
+
+    def restore(self, target_path: Path, backup_id: Optional[str] = None, verify: bool = True) -> RestoreReport:
+        """Restore a backup into an empty data directory.
+
+        Args:
+            target_path: Directory to create the storage in (must not contain one)
+            backup_id: Backup to restore (defaults to the latest)
+            verify: Re-open the restored storage and compare every process with its checksum
+
+        Returns:
+            RestoreReport (only ``processes`` is set when ``verify`` is False)
+
+        Raises:
+            FileExistsError: If ``target_path`` already holds a storage
+        """
+        target_path = Path(target_path)
+        if (target_path / "processes.json").exists():
+            raise FileExistsError(f"{target_path} already contains a storage")
+        resolved, state = self._state(backup_id)
+        seq = self._entry(resolved)["seq"]
+        target_path.mkdir(parents=True, exist_ok=True)
+
+        refs: Set[Tuple[str, str]] = set()
+        for name, (_, record, _) in state.items():
+            refs.update((sidecar_dir_name(name), ref) for ref in sidecar_refs(record.get("session_data", {})))
+        for directory, ref in refs:
+            link_or_copy(self.sidecar_path / directory / ref, target_path / "sidecars" / directory / ref)
+        archived = {name: record for name, (tier, record, _) in state.items() if tier == "archived"}
+        if archived:
+            ArchiveStore(target_path / "archive").archive(archived)
+        hot = {name: record for name, (tier, record, _) in state.items() if tier == "hot"}
+        write_atomic(target_path / "processes.json", json.dumps(hot, indent=2, ensure_ascii=False).encode("utf-8"))
+        # 復元したレコードの seq より後から番号を振るよう、変更フィードの起点を合わせる
+        write_atomic(target_path / "changes.log", (json.dumps({"floor": seq, "last": seq}) + "\n").encode("utf-8"))
+
+        report = RestoreReport(resolved, processes=len(state))
+        if not verify:
+            return report
+        restored = SimpleStorage(target_path, codecs=self.codecs)
+        for name, (_, _, expected) in state.items():
+            try:
+                exported = restored.export_process(name)
+            except Exception as error:
+                report.errors[name] = str(error)
+                continue
+            if exported is not None and checksum(exported["session_data"]) == expected:
+                report.verified += 1
+            else:
+                report.mismatched.append(name)
+        return report
@@ -0,0 +1,283 @@
+"""Bounded LRU/TTL read cache that wraps any StorageInterface backend."""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .change_feed import ChangeFeedGap
+from .codecs import estimate_size
+from .models import ProcessData
+
+# Cache entry kinds
+_DATA = "data"
+_INFO = "info"
+
+
+@dataclass
+class CacheStats:
+    """Counters describing cache effectiveness."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    prefetches: int = 0
+    prefetch_hits: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+
+class _Entry:
+    __slots__ = ("value", "size", "expires_at", "prefetched")
+
+    def __init__(self, value: Any, size: int, expires_at: Optional[float], prefetched: bool = False) -> None:
+        self.value = value
+        self.size = size
+        self.expires_at = expires_at
+        # 先読みされ、まだ一度も読まれていないエントリ
+        self.prefetched = prefetched
+
+
+class CachedStorage:
+    """Caches decoded payloads and metadata of a wrapped backend.
+
+    Entries are kept in LRU order within a byte budget and optionally expire
+    after ``ttl`` seconds. Writes that go through this wrapper invalidate the
+    affected process; writes made directly to the backend (or by another
+    process) are picked up after the TTL expires, on ``invalidate()``, or on
+    ``sync_changes()`` when the backend has a change feed.
+
+    Cached payloads are shared objects - callers must not mutate them.
+    """
+
+    def __init__(
+        self,
+        backend: Any,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the cache.
+
+        Args:
+            backend: Any object implementing StorageInterface
+            max_bytes: Byte budget for all cached entries
+            ttl: Seconds an entry stays valid, or None for no expiry
+            clock: Monotonic clock (injectable for tests)
+        """
+        self.backend = backend
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self.stats = CacheStats()
+        self.current_bytes = 0
+        # 先読みされてまだ読まれていないエントリのバイト数 (prefetch の予算と比べる)
+        self.prefetched_bytes = 0
+        # 無効化のたびに進む世代 (先読み中に書き込まれた古い値を入れないため)
+        self._generation = 0
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._seen_seq = getattr(backend, "last_seq", 0)
+
+    # --- cache internals -------------------------------------------------
+
+    def _get(self, key: Tuple[str, str]) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.stats.misses += 1
+                return False, None
+            if entry.expires_at is not None and entry.expires_at <= self.clock():
+                self._remove(key)
+                self.stats.expirations += 1
+                self.stats.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.stats.hits += 1
+            if entry.prefetched:
+                entry.prefetched = False
+                self.prefetched_bytes -= entry.size
+                self.stats.prefetch_hits += 1
+            return True, entry.value
+
+    def _put(self, key: Tuple[str, str], value: Any, size: Optional[int] = None, prefetched: bool = False) -> None:
+        if size is None:
+            size = estimate_size(value)
+        if size > self.max_bytes:
+            return
+        expires_at = self.clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = _Entry(value, size, expires_at, prefetched)
+            self.current_bytes += size
+            if prefetched:
+                self.prefetched_bytes += size
+            while self.current_bytes > self.max_bytes and self._entries:
+                evicted_key = next(iter(self._entries))
+                self._remove(evicted_key)
+                self.stats.evictions += 1
+
+    def _remove(self, key: Tuple[str, str]) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.current_bytes -= entry.size
+            if entry.prefetched:
+                self.prefetched_bytes -= entry.size
+
+    def prefetch(self, process_name: str, max_bytes: int) -> bool:
+        """Load a process into the cache ahead of use, within a separate byte budget.
+
+        Prefetched entries that have not been read yet count against
+        ``max_bytes``; the oldest of them are dropped to make room. Hits and
+        misses are not counted. If the process is written while it is being
+        loaded, the (possibly stale) value is discarded.
+
+        Args:
+            process_name: Process to load
+            max_bytes: Budget for prefetched, not yet read entries
+
+        Returns:
+            True if the process was loaded into the cache
+        """
+        with self._lock:
+            if (_DATA, process_name) in self._entries:
+                return False
+            generation = self._generation
+        value = self.backend.load_process(process_name)
+        info = self.backend.get_process_info(process_name) if value is not None else None
+        if value is None or info is None:
+            return False
+        value_size, info_size = estimate_size(value), estimate_size(info)
+        size = value_size + info_size
+        if size > max_bytes:
+            return False
+        with self._lock:
+            if generation != self._generation or (_DATA, process_name) in self._entries:
+                return False
+            # 予算を超える分は、読まれないまま残っている古い先読みから捨てる
+            for key in [key for key, entry in self._entries.items() if entry.prefetched]:
+                if self.prefetched_bytes + size <= max_bytes:
+                    break
+                self._remove(key)
+                self.stats.evictions += 1
+            if self.prefetched_bytes + size > max_bytes:
+                return False
+            self._put((_DATA, process_name), value, value_size, prefetched=True)
+            self._put((_INFO, process_name), info, info_size, prefetched=True)
+            self.stats.prefetches += 1
+            return True
+
+    def invalidate(self, process_name: Optional[str] = None) -> None:
+        """Drop one process (or everything when ``process_name`` is None) from the cache."""
+        with self._lock:
+            if process_name is None:
+                self._entries.clear()
+                self.current_bytes = 0
+                self.prefetched_bytes = 0
+            else:
+                self._remove((_DATA, process_name))
+                self._remove((_INFO, process_name))
+            self._generation += 1
+            self.stats.invalidations += 1
+
+    def sync_changes(self) -> List[str]:
+        """Invalidate entries changed by other writers, using the backend's change feed.
+
+        Only works with backends that provide ``changes_since``; otherwise
+        nothing happens and the TTL is the only freshness bound.
+
+        Returns:
+            Names of the processes that were invalidated
+        """
+        if not hasattr(self.backend, "changes_since"):
+            return []
+        try:
+            changes = self.backend.changes_since(self._seen_seq)
+        except ChangeFeedGap as gap:
+            self.invalidate()
+            self._seen_seq = gap.last_seq
+            return []
+        names = [change.process_name for change in changes]
+        for name in names:
+            self.invalidate(name)
+        if changes:
+            self._seen_seq = changes[-1].seq
+        return names
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, process_name: object) -> bool:
+        """Whether the process's data is cached and not expired (no hit/miss counted)."""
+        with self._lock:
+            entry = self._entries.get((_DATA, process_name))
+            return entry is not None and (entry.expires_at is None or entry.expires_at > self.clock())
+
+    def _load(self, key: Tuple[str, str], read: Callable[[str], Any]) -> Any:
+        found, value = self._get(key)
+        if found:
+            return value
+        with self._lock:
+            generation = self._generation
+        value = read(key[1])
+        if value is not None:
+            with self._lock:
+                # 読んでいる間に書き込み (無効化) があったら、古いかもしれない値は入れない
+                if generation == self._generation:
+                    self._put(key, value)
+        return value
+
+    # --- StorageInterface ------------------------------------------------
+
+    def load_process(self, process_name: str) -> Optional[ProcessData]:
+        """Load process data, serving it from the cache when possible."""
+        return self._load((_DATA, process_name), self.backend.load_process)
+
+    def get_process_info(self, process_name: str) -> Optional[Dict[str, Any]]:
+        """Get process metadata, serving it from the cache when possible."""
+        return self._load((_INFO, process_name), self.backend.get_process_info)
+
+    def save_process(self, process_name: str, session_data: ProcessData) -> None:
+        """Save through to the backend and invalidate the cached entries."""
+        try:
+            self.backend.save_process(process_name, session_data)
+        finally:
+            self.invalidate(process_name)
+
+    def save_process_with_prefix_filter(
+        self, process_name: str, session_data: ProcessData, persist_prefix: str = "persist_"
+    ) -> None:
+        """Save through to the backend and invalidate the cached entries."""
+        try:
+            self.backend.save_process_with_prefix_filter(process_name, session_data, persist_prefix)
+        finally:
+            self.invalidate(process_name)
+
+    def update_process(self, process_name: str, updates: ProcessData) -> None:
+        """Update through to the backend and invalidate the cached entries."""
+        try:
+            self.backend.update_process(process_name, updates)
+        finally:
+            self.invalidate(process_name)
+
+    def delete_process(self, process_name: str) -> bool:
+        """Delete from the backend and invalidate the cached entries."""
+        try:
+            return self.backend.delete_process(process_name)
+        finally:
+            self.invalidate(process_name)
+
+    def list_processes(self) -> List[str]:
+        return self.backend.list_processes()
+
+    def process_exists(self, process_name: str) -> bool:
+        if process_name in self:
+            return True
+        return self.backend.process_exists(process_name)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.backend, name)
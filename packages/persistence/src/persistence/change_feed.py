@@ -0,0 +1,194 @@
+"""Durable change feed with monotonically increasing sequence numbers.
+
+Every save/delete appends one JSON line to a log file. Readers remember the
+last sequence number they saw and ask for ``changes_since(seq)`` instead of
+reloading everything. The log is shared between processes: appends are
+serialized with an advisory file lock and each reader tails the file from its
+last offset. Compaction keeps only the latest event per process name.
+"""
+import json
+import os
+import threading
+from bisect import bisect_right
+from contextlib import contextmanager
+from operator import attrgetter
+from pathlib import Path
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore[assignment]
+
+SAVE = "save"
+DELETE = "delete"
+ARCHIVE = "archive"
+RESTORE = "restore"
+
+_seq_of = attrgetter("seq")
+
+
+class ChangeEvent(NamedTuple):
+    seq: int
+    process_name: str
+    operation: str
+
+
+class ChangeFeedGap(Exception):
+    """Raised when the requested history was compacted away.
+
+    The reader has to do a full reload and continue from ``last_seq``.
+    """
+
+    def __init__(self, requested: int, floor: int, last_seq: int) -> None:
+        super().__init__(f"changes after seq {requested} are no longer available (history starts after {floor})")
+        self.requested = requested
+        self.floor = floor
+        self.last_seq = last_seq
+
+
+class ChangeFeed:
+    """Append-only, compactable log of process changes."""
+
+    def __init__(self, path: Path, max_entries: int = 10000) -> None:
+        """Open (or create) a change feed.
+
+        Args:
+            path: Log file path
+            max_entries: Compaction is triggered once the log holds more events than this
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_entries = max_entries
+        self._events: List[ChangeEvent] = []
+        self._last_seq = 0
+        self._floor = 0
+        self._offset = 0
+        self._inode: Optional[int] = None
+        self._lock = threading.RLock()
+        with self._lock:
+            self._refresh()
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Serialize writers across processes (no-op where fcntl is unavailable)."""
+        if fcntl is None:
+            yield
+            return
+        lock_path = self.path.with_name(self.path.name + ".lock")
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _reset(self) -> None:
+        self._events = []
+        self._last_seq = 0
+        self._floor = 0
+        self._offset = 0
+        self._inode = None
+
+    def _refresh(self) -> None:
+        """Read events appended (by anyone) since the last refresh."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset()
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._offset:
+            # File was replaced by a compaction - start over
+            self._reset()
+            self._inode = stat.st_ino
+        if stat.st_size == self._offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            chunk = f.read()
+        # A writer in another process may be mid-line; only consume complete lines
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._offset += end
+
+    def _apply(self, entry: Dict) -> None:
+        if "floor" in entry:
+            self._floor = entry["floor"]
+            self._last_seq = max(self._last_seq, entry.get("last", 0))
+            return
+        event = ChangeEvent(entry["seq"], entry["name"], entry["op"])
+        self._events.append(event)
+        self._last_seq = max(self._last_seq, event.seq)
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the most recent change (0 if none)."""
+        with self._lock:
+            self._refresh()
+            return self._last_seq
+
+    def append(self, operation: str, process_name: str) -> int:
+        """Record a change and return its sequence number."""
+        with self._lock, self._file_lock():
+            self._refresh()
+            seq = self._last_seq + 1
+            line = json.dumps({"seq": seq, "op": operation, "name": process_name}, ensure_ascii=False) + "\n"
+            with open(self.path, "ab") as f:
+                f.write(line.encode("utf-8"))
+            self._refresh()
+            if len(self._events) > self.max_entries:
+                self._compact_locked()
+            return seq
+
+    def changes_since(self, seq: int) -> List[ChangeEvent]:
+        """Return the latest change per process name with a sequence number above ``seq``.
+
+        Args:
+            seq: Last sequence number the caller has already seen
+
+        Returns:
+            Events ordered by sequence number, one per changed process
+
+        Raises:
+            ChangeFeedGap: If changes after ``seq`` were compacted away
+        """
+        with self._lock:
+            self._refresh()
+            if seq < self._floor:
+                raise ChangeFeedGap(seq, self._floor, self._last_seq)
+            start = bisect_right(self._events, seq, key=_seq_of)
+            latest: Dict[str, ChangeEvent] = {}
+            for event in self._events[start:]:
+                latest[event.process_name] = event
+            return sorted(latest.values(), key=_seq_of)
+
+    def compact(self) -> None:
+        """Rewrite the log keeping only the latest event per process."""
+        with self._lock, self._file_lock():
+            self._refresh()
+            self._compact_locked()
+
+    def _compact_locked(self) -> None:
+        latest: Dict[str, ChangeEvent] = {}
+        for event in self._events:
+            latest[event.process_name] = event
+        kept = sorted(latest.values(), key=_seq_of)
+        floor = self._floor
+        # Still too many distinct names: drop the oldest half and raise the floor
+        limit = max(1, self.max_entries // 2)
+        if len(kept) > limit:
+            floor = kept[-limit - 1].seq
+            kept = kept[-limit:]
+
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            header = {"floor": floor, "last": self._last_seq}
+            f.write((json.dumps(header) + "\n").encode("utf-8"))
+            for event in kept:
+                line = {"seq": event.seq, "op": event.operation, "name": event.process_name}
+                f.write((json.dumps(line, ensure_ascii=False) + "\n").encode("utf-8"))
+        os.replace(tmp_path, self.path)
+        self._reset()
+        self._refresh()
@@ -0,0 +1,393 @@
+"""Typed value codecs for session values that JSON cannot represent.
+
+Small values (datetime, date, Decimal, bytes, NumPy scalars) are stored as
+tagged JSON objects such as ``{"__codec__": "datetime", "value": "..."}``.
+NumPy arrays - and the columns of pandas DataFrames - are written to binary
+``.npy`` sidecar files named after their content and memory-mapped
+(copy-on-write) when loaded, so large arrays are neither parsed nor rewritten
+unless they change.
+
+NumPy and pandas are optional: their codecs only come into play when such a
+value is actually stored, and they are imported lazily on load.
+"""
+import base64
+import hashlib
+import os
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Protocol, Set
+
+from .models import JsonSerializable
+
+TAG = "__codec__"
+
+
+def _numpy() -> Any:
+    try:
+        import numpy
+    except ImportError as exc:  # pragma: no cover - depends on environment
+        raise TypeError("numpy is required to load array values") from exc
+    return numpy
+
+
+def _pandas() -> Any:
+    try:
+        import pandas
+    except ImportError as exc:  # pragma: no cover - depends on environment
+        raise TypeError("pandas is required to load DataFrame values") from exc
+    return pandas
+
+
+class SidecarStore:
+    """Directory of ``.npy`` files addressed by a hash of their content."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+
+    def write_array(self, array: Any) -> str:
+        """Write an array (if not already present) and return its file name."""
+        np = _numpy()
+        array = np.ascontiguousarray(array)
+        digest = hashlib.sha1(f"{array.dtype.str}{array.shape}".encode("utf-8"))
+        digest.update(array.tobytes())
+        name = f"{digest.hexdigest()}.npy"
+        target = self.path / name
+        if not target.exists():
+            self.path.mkdir(parents=True, exist_ok=True)
+            tmp_path = self.path / (name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                np.save(f, array, allow_pickle=False)
+            os.replace(tmp_path, target)
+        return name
+
+    def read_array(self, name: str) -> Any:
+        """Memory-map a sidecar copy-on-write (in-place edits never reach the file)."""
+        np = _numpy()
+        path = self.path / name
+        try:
+            return np.load(path, mmap_mode="c", allow_pickle=False)
+        except ValueError:
+            # Empty arrays cannot be mapped
+            return np.load(path, allow_pickle=False)
+
+    def prune(self, keep: Iterable[str]) -> None:
+        """Delete sidecars that are not in ``keep``."""
+        if not self.path.exists():
+            return
+        keep = set(keep)
+        for path in self.path.glob("*.npy"):
+            if path.name not in keep:
+                path.unlink(missing_ok=True)
+        if not any(self.path.iterdir()):
+            self.path.rmdir()
+
+    def clear(self) -> None:
+        """Delete every sidecar in this directory."""
+        self.prune(())
+
+
+class ValueCodec(Protocol):
+    """Converts one type of value to and from a JSON payload."""
+
+    tag: str
+
+    def can_encode(self, value: Any) -> bool:
+        ...
+
+    def encode(self, value: Any, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> JsonSerializable:
+        ...
+
+    def decode(self, payload: Any, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> Any:
+        ...
+
+
+class DatetimeCodec:
+    tag = "datetime"
+
+    def can_encode(self, value: Any) -> bool:
+        return isinstance(value, datetime)
+
+    def encode(self, value: datetime, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> JsonSerializable:
+        return value.isoformat()
+
+    def decode(self, payload: str, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> datetime:
+        return datetime.fromisoformat(payload)
+
+
+class DateCodec:
+    tag = "date"
+
+    def can_encode(self, value: Any) -> bool:
+        return isinstance(value, date) and not isinstance(value, datetime)
+
+    def encode(self, value: date, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> JsonSerializable:
+        return value.isoformat()
+
+    def decode(self, payload: str, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> date:
+        return date.fromisoformat(payload)
+
+
+class DecimalCodec:
+    tag = "decimal"
+
+    def can_encode(self, value: Any) -> bool:
+        return isinstance(value, Decimal)
+
+    def encode(self, value: Decimal, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> JsonSerializable:
+        return str(value)
+
+    def decode(self, payload: str, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> Decimal:
+        return Decimal(payload)
+
+
+class BytesCodec:
+    tag = "bytes"
+
+    def can_encode(self, value: Any) -> bool:
+        return isinstance(value, (bytes, bytearray))
+
+    def encode(self, value: bytes, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> JsonSerializable:
+        return base64.b64encode(value).decode("ascii")
+
+    def decode(self, payload: str, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> bytes:
+        return base64.b64decode(payload)
+
+
+class NumpyScalarCodec:
+    tag = "numpy_scalar"
+
+    def can_encode(self, value: Any) -> bool:
+        np = sys.modules.get("numpy")
+        return np is not None and isinstance(value, (np.bool_, np.integer, np.floating))
+
+    def encode(self, value: Any, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> JsonSerializable:
+        return {"dtype": value.dtype.str, "value": value.item()}
+
+    def decode(self, payload: Dict[str, Any], registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> Any:
+        return _numpy().dtype(payload["dtype"]).type(payload["value"])
+
+
+class NdarrayCodec:
+    """NumPy arrays (except object dtype) as ``.npy`` sidecars."""
+
+    tag = "ndarray"
+
+    def can_encode(self, value: Any) -> bool:
+        np = sys.modules.get("numpy")
+        return np is not None and isinstance(value, np.ndarray) and value.dtype != object
+
+    def encode(self, value: Any, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> JsonSerializable:
+        if sidecars is None:
+            raise TypeError("array values need a sidecar directory")
+        return {"sidecar": sidecars.write_array(value)}
+
+    def decode(self, payload: Dict[str, Any], registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> Any:
+        if sidecars is None:
+            raise TypeError("array values need a sidecar directory")
+        return sidecars.read_array(payload["sidecar"])
+
+
+class DataFrameCodec:
+    """pandas DataFrames: NumPy-typed columns as sidecars, other columns as JSON lists."""
+
+    tag = "dataframe"
+
+    def can_encode(self, value: Any) -> bool:
+        pd = sys.modules.get("pandas")
+        return pd is not None and isinstance(value, pd.DataFrame)
+
+    def _encode_values(self, values: Any, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> Dict[str, Any]:
+        np = _numpy()
+        if isinstance(values.dtype, np.dtype) and values.dtype != object:
+            return {"array": registry.encode(np.asarray(values), sidecars)}
+        encoded = {"values": registry.encode(list(values), sidecars)}
+        if values.dtype != object:
+            # 拡張型 (string / category / tz付き日時 など) は型名を残して復元する
+            encoded["dtype"] = str(values.dtype)
+        return encoded
+
+    def _decode_values(self, payload: Dict[str, Any], registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> Any:
+        if "array" in payload:
+            return registry.decode(payload["array"], sidecars)
+        values = registry.decode(payload["values"], sidecars)
+        if "dtype" in payload:
+            return _pandas().array(values, dtype=payload["dtype"])
+        result = _numpy().empty(len(values), dtype=object)
+        for i, item in enumerate(values):
+            result[i] = item
+        return result
+
+    def encode(self, value: Any, registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> JsonSerializable:
+        pd = _pandas()
+        if not value.columns.is_unique:
+            raise TypeError("DataFrames with duplicate column names are not supported")
+        index = value.index
+        if isinstance(index, pd.RangeIndex):
+            encoded_index: Dict[str, Any] = {"range": [index.start, index.stop, index.step]}
+        else:
+            encoded_index = self._encode_values(index, registry, sidecars)
+        encoded_index["name"] = registry.encode(index.name, sidecars)
+        return {
+            "columns": registry.encode(list(value.columns), sidecars),
+            "data": [self._encode_values(value[column], registry, sidecars) for column in value.columns],
+            "index": encoded_index,
+        }
+
+    def decode(self, payload: Dict[str, Any], registry: "CodecRegistry", sidecars: Optional[SidecarStore]) -> Any:
+        pd = _pandas()
+        encoded_index = payload["index"]
+        name = registry.decode(encoded_index.get("name"), sidecars)
+        if "range" in encoded_index:
+            index = pd.RangeIndex(*encoded_index["range"], name=name)
+        else:
+            index = pd.Index(self._decode_values(encoded_index, registry, sidecars), name=name)
+        columns = registry.decode(payload["columns"], sidecars)
+        data = {
+            column: self._decode_values(values, registry, sidecars)
+            for column, values in zip(columns, payload["data"])
+        }
+        return pd.DataFrame(data, index=index, columns=columns)
+
+
+class CodecRegistry:
+    """Ordered set of codecs used to encode/decode session values recursively.
+
+    JSON-native values pass through unchanged; dicts and lists are walked;
+    anything else is handed to the first codec whose ``can_encode`` accepts it.
+    """
+
+    def __init__(self, codecs: Optional[Iterable[ValueCodec]] = None) -> None:
+        self._codecs: List[ValueCodec] = []
+        self._by_tag: Dict[str, ValueCodec] = {}
+        for codec in codecs or ():
+            self.register(codec)
+
+    @classmethod
+    def default(cls) -> "CodecRegistry":
+        """Registry with the built-in codecs."""
+        return cls([
+            DatetimeCodec(),
+            DateCodec(),
+            DecimalCodec(),
+            BytesCodec(),
+            NumpyScalarCodec(),
+            NdarrayCodec(),
+            DataFrameCodec(),
+        ])
+
+    def register(self, codec: ValueCodec) -> None:
+        """Add a codec (codecs registered later are tried later)."""
+        if codec.tag in self._by_tag or codec.tag == "dict":
+            raise ValueError(f"codec tag '{codec.tag}' is already registered")
+        self._codecs.append(codec)
+        self._by_tag[codec.tag] = codec
+
+    def encode(self, value: Any, sidecars: Optional[SidecarStore] = None) -> JsonSerializable:
+        """Encode a value into JSON-compatible data.
+
+        Args:
+            value: Value to encode
+            sidecars: Where binary values are written (required for arrays)
+
+        Raises:
+            TypeError: If no codec can encode the value
+        """
+        if value is None or isinstance(value, (str, bool, int, float)):
+            return value
+        if isinstance(value, dict):
+            encoded = {key: self.encode(item, sidecars) for key, item in value.items()}
+            if TAG in value:
+                # ユーザーデータのキーがタグと衝突する場合はエスケープする
+                return {TAG: "dict", "value": encoded}
+            return encoded
+        if isinstance(value, (list, tuple)):
+            return [self.encode(item, sidecars) for item in value]
+        for codec in self._codecs:
+            if codec.can_encode(value):
+                return {TAG: codec.tag, "value": codec.encode(value, self, sidecars)}
+        raise TypeError(f"no codec for values of type {type(value).__name__}")
+
+    def decode(self, value: Any, sidecars: Optional[SidecarStore] = None) -> Any:
+        """Decode data produced by ``encode``."""
+        if isinstance(value, dict):
+            tag = value.get(TAG)
+            if tag is None:
+                return {key: self.decode(item, sidecars) for key, item in value.items()}
+            if tag == "dict":
+                return {key: self.decode(item, sidecars) for key, item in value["value"].items()}
+            codec = self._by_tag.get(tag)
+            if codec is None:
+                raise ValueError(f"unknown codec tag '{tag}'")
+            return codec.decode(value["value"], self, sidecars)
+        if isinstance(value, list):
+            return [self.decode(item, sidecars) for item in value]
+        return value
+
+
+def sidecar_refs(encoded: Any) -> Set[str]:
+    """Collect the sidecar file names referenced by encoded data."""
+    refs: Set[str] = set()
+    stack = [encoded]
+    while stack:
+        item = stack.pop()
+        if isinstance(item, dict):
+            if item.get(TAG) == NdarrayCodec.tag:
+                refs.add(item["value"]["sidecar"])
+            else:
+                stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return refs
+
+
+def values_equal(a: Any, b: Any) -> bool:
+    """Equality that also works for arrays and DataFrames (``==`` is element-wise there)."""
+    if isinstance(a, dict):
+        return isinstance(b, dict) and a.keys() == b.keys() and all(values_equal(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)):
+        return (
+            isinstance(b, (list, tuple)) and len(a) == len(b)
+            and all(values_equal(x, y) for x, y in zip(a, b))
+        )
+    np = sys.modules.get("numpy")
+    if np is not None and (isinstance(a, np.ndarray) or isinstance(b, np.ndarray)):
+        if not (isinstance(a, np.ndarray) and isinstance(b, np.ndarray)):
+            return False
+        if a.shape != b.shape or a.dtype != b.dtype:
+            return False
+        try:
+            return bool(np.array_equal(a, b, equal_nan=True))
+        except TypeError:
+            return bool(np.array_equal(a, b))
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(a, (pd.DataFrame, pd.Series)):
+        return isinstance(b, type(a)) and bool(a.equals(b))
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+def estimate_size(value: Any) -> int:
+    """Rough in-memory size of a session value in bytes.
+
+    Arrays and DataFrames report their buffers (object columns are not
+    followed); containers are summed recursively; anything else uses
+    ``sys.getsizeof``.
+    """
+    nbytes = getattr(value, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+    memory_usage = getattr(value, "memory_usage", None)
+    if callable(memory_usage):
+        try:
+            return int(memory_usage(deep=False).sum())
+        except TypeError:
+            pass
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(estimate_size(k) + estimate_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set, frozenset)):
+        return sys.getsizeof(value) + sum(estimate_size(item) for item in value)
+    return sys.getsizeof(value)
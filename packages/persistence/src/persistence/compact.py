@@ -0,0 +1,163 @@
+"""Compact in-memory records for ``SimpleStorage``.
+
+A stored record is a small dict (``session_data`` plus ``created`` /
+``last_updated`` / ``seq`` ...). At 100k processes the per-dict overhead,
+the ISO timestamp strings and the many small ``session_data`` dicts cost far
+more memory than the values themselves. ``CompactRecord`` keeps the same
+mapping interface with:
+
+- ``__slots__`` instead of a dict per record
+- timestamps held as integer microseconds (converted back to the same ISO
+  string on access)
+- small ``session_data`` payloads held as compact UTF-8 JSON bytes and
+  decoded when accessed; larger payloads stay dicts with interned keys
+"""
+import json
+import sys
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, Mapping, Optional
+
+from .migrations import SCHEMA_VERSION_KEY
+
+# これ以下のバイト数 (エンコード済み JSON) のペイロードは bytes のまま保持する
+INLINE_PAYLOAD_LIMIT = 2048
+
+_FIELDS = ("session_data", "last_updated", "created", SCHEMA_VERSION_KEY, "seq", "restored_at")
+_TIME_FIELDS = frozenset(("last_updated", "created", "restored_at"))
+_FIELD_SET = frozenset(_FIELDS)
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+# json.dumps は引数付きだと呼び出しごとにエンコーダーを作るので使い回す
+_ENCODER = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+
+def pack_time(value: Any) -> Any:
+    """ISO timestamp -> integer microseconds (other values are returned unchanged)."""
+    if not isinstance(value, str):
+        return value
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return value
+    # 同じ文字列に戻せない形式 (タイムゾーン付き・日付のみ等) はそのまま保持する
+    if parsed.tzinfo is not None or parsed.isoformat() != value:
+        return value
+    return (parsed - _EPOCH) // _MICROSECOND
+
+
+def unpack_time(value: Any) -> Any:
+    """Inverse of ``pack_time``."""
+    if isinstance(value, int):
+        return (_EPOCH + value * _MICROSECOND).isoformat()
+    return value
+
+
+def pack_session(session_data: Dict[str, Any]) -> Any:
+    """Compact JSON bytes for small payloads, a dict with interned keys otherwise."""
+    encoded = _ENCODER.encode(session_data).encode("utf-8")
+    if len(encoded) <= INLINE_PAYLOAD_LIMIT:
+        return encoded
+    return {sys.intern(key): value for key, value in session_data.items()}
+
+
+class CompactRecord(MutableMapping):
+    """A stored process record with the interface of the dict it replaces.
+
+    Fields set to None are treated as absent. Reading ``session_data`` of a
+    small payload decodes a fresh dict, so changes to it are not stored;
+    assign the key instead.
+    """
+
+    __slots__ = _FIELDS + ("_extra",)
+
+    def __init__(self, record: Optional[Mapping[str, Any]] = None) -> None:
+        record = record or {}
+        session_data = record.get("session_data")
+        self.session_data = pack_session(session_data) if isinstance(session_data, dict) else session_data
+        self.last_updated = pack_time(record.get("last_updated"))
+        self.created = pack_time(record.get("created"))
+        self.restored_at = pack_time(record.get("restored_at"))
+        self.seq = record.get("seq")
+        setattr(self, SCHEMA_VERSION_KEY, record.get(SCHEMA_VERSION_KEY))
+        extra = {key: value for key, value in record.items() if key not in _FIELD_SET}
+        self._extra: Optional[Dict[str, Any]] = extra or None
+
+    def __getitem__(self, key: str) -> Any:
+        if key in _FIELD_SET:
+            value = getattr(self, key)
+            if value is None:
+                raise KeyError(key)
+            if key == "session_data":
+                return json.loads(value) if isinstance(value, bytes) else value
+            if key in _TIME_FIELDS:
+                return unpack_time(value)
+            return value
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value: Any) -> None:
+        if key in _FIELD_SET:
+            if key == "session_data" and isinstance(value, dict):
+                value = pack_session(value)
+            elif key in _TIME_FIELDS:
+                value = pack_time(value)
+            setattr(self, key, value)
+            return
+        if self._extra is None:
+            self._extra = {}
+        self._extra[key] = value
+
+    def __delitem__(self, key: str) -> None:
+        if key in _FIELD_SET and getattr(self, key) is not None:
+            setattr(self, key, None)
+        elif self._extra is not None and key in self._extra:
+            del self._extra[key]
+        else:
+            raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for field in _FIELDS:
+            if getattr(self, field) is not None:
+                yield field
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"CompactRecord({self.to_dict()!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict copy (e.g. to serialize or hand out)."""
+        return dict(self.items())
+
+    def to_json(self) -> bytes:
+        """UTF-8 JSON of the record, reusing the already encoded payload."""
+        metadata = _ENCODER.encode({key: self[key] for key in self if key != "session_data"}).encode("utf-8")
+        session = self.session_data
+        if session is None:
+            return metadata
+        if not isinstance(session, bytes):
+            session = _ENCODER.encode(session).encode("utf-8")
+        if metadata == b"{}":
+            return b'{"session_data":' + session + b"}"
+        return b'{"session_data":' + session + b"," + metadata[1:]
+
+
+def plain(record: Any) -> Any:
+    """A plain dict for a ``CompactRecord`` (other values are returned unchanged)."""
+    return record.to_dict() if isinstance(record, CompactRecord) else record
+
+
+def dump_records(records: Mapping[str, Mapping[str, Any]]) -> bytes:
+    """Serialize ``{name: record}`` as the JSON object ``processes.json`` holds (one record per line)."""
+    lines = []
+    for name, record in records.items():
+        body = record.to_json() if isinstance(record, CompactRecord) else _ENCODER.encode(record).encode("utf-8")
+        lines.append(_ENCODER.encode(name).encode("utf-8") + b":" + body)
+    if not lines:
+        return b"{}"
+    return b"{\n" + b",\n".join(lines) + b"\n}"
@@ -1,4 +1,4 @@
-from typing import Protocol, List, Optional
+from typing import Any, Dict, Protocol, List, Optional
 from .models import ProcessData
 
 
@@ -23,4 +23,41 @@ class StorageInterface(Protocol):
     
     def process_exists(self, process_name: str) -> bool:
         """Check if process exists."""
-        ...
\ No newline at end of file
+        ...
+
+
+class AsyncStorageInterface(Protocol):
+    """Asyncio version of ``StorageInterface`` (see ``persistence.async_storage``)."""
+    
+    async def save_process(self, process_name: str, session_data: ProcessData) -> None:
+        """Save process session data."""
+        ...
+    
+    async def load_process(self, process_name: str) -> Optional[ProcessData]:
+        """Load process session data by name."""
+        ...
+    
+    async def list_processes(self) -> List[str]:
+        """List all process names."""
+        ...
+    
+    async def delete_process(self, process_name: str) -> bool:
+        """Delete a process by name."""
+        ...
+    
+    async def process_exists(self, process_name: str) -> bool:
+        """Check if process exists."""
+        ...
+
+
+class StorageListener(Protocol):
+    """Receives in-process notifications after a storage change is written.
+
+    ``operation`` is one of the change feed operations ("save", "delete",
+    "archive", "restore"); ``record`` is the stored record (metadata plus
+    ``session_data``) for save/restore and None otherwise.
+    """
+    
+    def on_change(self, operation: str, process_name: str, record: Optional[Dict[str, Any]]) -> None:
+        """Handle a change."""
+        ...
@@ -24,19 +24,17 @@ class JsonStorage:
         )
         process.audit_trail.append(audit_entry)
         
-        # Save to file
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(process.to_dict(), f, indent=2, ensure_ascii=False)
+        # Save to file (dumps + 1回の書き込みの方が json.dump の細切れ書き込みより速い)
+        file_path.write_text(json.dumps(process.to_dict(), indent=2, ensure_ascii=False), encoding='utf-8')
     
     def load_process(self, process_id: str) -> Optional[ProcessState]:
         file_path = self._get_file_path(process_id)
         
-        if not file_path.exists():
+        try:
+            data = json.loads(file_path.read_bytes())
+        except FileNotFoundError:
             return None
         
-        with open(file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-        
         return ProcessState.from_dict(data)
     
     def list_processes(self) -> List[str]:
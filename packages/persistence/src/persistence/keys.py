@@ -0,0 +1,159 @@
+"""Declarative registry of persisted session-state keys.
+
+Pages declare the keys they persist, with a type and a default, instead of
+relying on a ``persist_`` prefix scan over the whole session state::
+
+    keys = KeyRegistry()
+
+    @keys.schema
+    class WorkspaceKeys:
+        persist_担当者名: str = ""
+        persist_進捗率: int = 0
+        persist_ステータス: Literal["準備中", "実行中", "完了", "保留"] = "準備中"
+
+Each annotation is compiled once into a validator; saving reads only the
+declared keys and loading fills in defaults for keys a process does not have.
+"""
+import copy
+import logging
+import typing
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterator, List, Literal, Mapping, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+Validator = Callable[[Any], bool]
+
+_MISSING = object()
+
+
+def compile_validator(annotation: Any) -> Validator:
+    """Build a validator for a type annotation.
+
+    Supports plain classes (``int`` rejects ``bool``; ``float`` accepts ``int``),
+    ``Optional``/``Union``, ``Literal`` and generic containers (checked
+    shallowly, e.g. ``List[int]`` only checks for a list).
+    """
+    if annotation is Any:
+        return lambda value: True
+    if annotation is None or annotation is type(None):
+        return lambda value: value is None
+    origin = typing.get_origin(annotation)
+    if origin is Literal:
+        choices = typing.get_args(annotation)
+        return lambda value: value in choices and type(value) in {type(c) for c in choices}
+    if origin is Union:
+        validators = [compile_validator(arg) for arg in typing.get_args(annotation)]
+        return lambda value: any(validate(value) for validate in validators)
+    if origin is not None:
+        return compile_validator(origin)
+    if annotation is bool:
+        return lambda value: isinstance(value, bool)
+    if annotation is int:
+        return lambda value: isinstance(value, int) and not isinstance(value, bool)
+    if annotation is float:
+        return lambda value: isinstance(value, (int, float)) and not isinstance(value, bool)
+    if isinstance(annotation, type):
+        return lambda value: isinstance(value, annotation)
+    raise TypeError(f"unsupported annotation for a persisted key: {annotation!r}")
+
+
+@dataclass(frozen=True)
+class PersistedKey:
+    """One declared key."""
+    name: str
+    annotation: Any = Any
+    default: Any = None
+    validator: Validator = field(default=lambda value: True, compare=False, repr=False)
+
+    def default_value(self) -> Any:
+        """A fresh copy of the default (mutable defaults are not shared between processes)."""
+        return copy.deepcopy(self.default)
+
+
+class KeyRegistry:
+    """The set of session-state keys that are persisted, with types and defaults."""
+
+    def __init__(self) -> None:
+        self._keys: Dict[str, PersistedKey] = {}
+
+    def declare(self, name: str, annotation: Any = Any, default: Any = None) -> PersistedKey:
+        """Declare a persisted key.
+
+        Declaring the same key again with the same type and default is a
+        no-op (page scripts re-run on every interaction).
+
+        Raises:
+            ValueError: If the key is already declared differently or the default is invalid
+        """
+        key = PersistedKey(name, annotation, default, compile_validator(annotation))
+        existing = self._keys.get(name)
+        if existing is not None:
+            if existing != key:
+                raise ValueError(f"persisted key '{name}' is already declared as {existing.annotation!r} = {existing.default!r}")
+            return existing
+        if default is not None and not key.validator(default):
+            raise ValueError(f"default {default!r} of persisted key '{name}' does not match {annotation!r}")
+        self._keys[name] = key
+        return key
+
+    def schema(self, cls: type) -> type:
+        """Class decorator declaring every annotated attribute as a persisted key."""
+        hints = typing.get_type_hints(cls)
+        for name in cls.__dict__.get("__annotations__", {}):
+            self.declare(name, hints[name], getattr(cls, name, None))
+        return cls
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._keys
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def get(self, name: str) -> Optional[PersistedKey]:
+        return self._keys.get(name)
+
+    def names(self) -> List[str]:
+        return list(self._keys)
+
+    def defaults(self) -> Dict[str, Any]:
+        """``{name: default}`` for every declared key."""
+        return {name: key.default_value() for name, key in self._keys.items()}
+
+    def apply_defaults(self, data: Mapping[str, Any]) -> Dict[str, Any]:
+        """Copy of ``data`` with defaults filled in for missing declared keys."""
+        result = dict(data)
+        for name, key in self._keys.items():
+            if name not in result:
+                result[name] = key.default_value()
+        return result
+
+    def validate(self, name: str, value: Any) -> bool:
+        """Whether ``value`` is valid for a declared key (undeclared keys are invalid)."""
+        key = self._keys.get(name)
+        return key is not None and key.validator(value)
+
+    def collect(self, session_state: Mapping[str, Any], defaults: bool = True) -> Dict[str, Any]:
+        """Read only the declared keys from session state.
+
+        Values of the wrong type are skipped (and logged) so one bad widget
+        value does not block the save.
+
+        Args:
+            session_state: Session state to read
+            defaults: Give missing keys their default (otherwise they are left out)
+        """
+        data: Dict[str, Any] = {}
+        for name, key in self._keys.items():
+            value = session_state.get(name, _MISSING)
+            if value is _MISSING:
+                if defaults:
+                    data[name] = key.default_value()
+            elif key.validator(value):
+                data[name] = value
+            else:
+                logger.warning("not persisting %r: %r is not %r", name, value, key.annotation)
+        return data
@@ -0,0 +1,294 @@
+"""Metrics instrumentation for storage operations.
+
+Counters and latency histograms are pushed into a pluggable sink. When no
+sink is configured nothing is wrapped or recorded, so the storage hot path
+stays untouched.
+"""
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List, Mapping, Optional, Protocol, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets in seconds (upper bounds, Prometheus style)
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+)
+
+OPERATIONS_TOTAL = "persistence_operations_total"
+ERRORS_TOTAL = "persistence_operation_errors_total"
+OPERATION_SECONDS = "persistence_operation_seconds"
+BYTES_READ_TOTAL = "persistence_bytes_read_total"
+BYTES_WRITTEN_TOTAL = "persistence_bytes_written_total"
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class MetricsSink(Protocol):
+    """Destination for metric events."""
+
+    def increment(self, name: str, amount: float = 1, labels: Optional[Mapping[str, str]] = None) -> None:
+        """Increase a counter."""
+        ...
+
+    def observe(self, name: str, value: float, labels: Optional[Mapping[str, str]] = None) -> None:
+        """Record a value (e.g. a latency in seconds) into a histogram."""
+        ...
+
+
+def _label_key(labels: Optional[Mapping[str, str]]) -> LabelKey:
+    if not labels:
+        return ()
+    return tuple(sorted(labels.items()))
+
+
+class _Histogram:
+    __slots__ = ("buckets", "counts", "total", "count")
+
+    def __init__(self, buckets: Tuple[float, ...]) -> None:
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.total = 0.0
+        self.count = 0
+
+    def add(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Approximate a quantile from bucket upper bounds."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class InMemorySink:
+    """Aggregates counters and histograms in memory."""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = buckets
+        self._counters: Dict[Tuple[str, LabelKey], float] = {}
+        self._histograms: Dict[Tuple[str, LabelKey], _Histogram] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, amount: float = 1, labels: Optional[Mapping[str, str]] = None) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, labels: Optional[Mapping[str, str]] = None) -> None:
+        key = (name, _label_key(labels))
+        with self._lock:
+            hist = self._histograms.get(key)
+            if hist is None:
+                hist = self._histograms[key] = _Histogram(self.buckets)
+            hist.add(value)
+
+    def counter(self, name: str, labels: Optional[Mapping[str, str]] = None) -> float:
+        """Return the current value of a counter (0 if never incremented)."""
+        return self._counters.get((name, _label_key(labels)), 0)
+
+    def reset(self) -> None:
+        """Drop all recorded values."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return a JSON friendly view of all metrics.
+
+        Returns:
+            Dictionary with ``counters`` and ``histograms`` lists
+        """
+        with self._lock:
+            counters = [
+                {"name": name, "labels": dict(labels), "value": value}
+                for (name, labels), value in sorted(self._counters.items())
+            ]
+            histograms = [
+                {
+                    "name": name,
+                    "labels": dict(labels),
+                    "count": hist.count,
+                    "sum": hist.total,
+                    "mean": hist.total / hist.count if hist.count else 0.0,
+                    "p50": hist.quantile(0.5),
+                    "p95": hist.quantile(0.95),
+                }
+                for (name, labels), hist in sorted(self._histograms.items())
+            ]
+        return {"counters": counters, "histograms": histograms}
+
+    def render_prometheus(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        lines: List[str] = []
+        with self._lock:
+            seen_types = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in seen_types:
+                    lines.append(f"# TYPE {name} counter")
+                    seen_types.add(name)
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for (name, labels), hist in sorted(self._histograms.items()):
+                if name not in seen_types:
+                    lines.append(f"# TYPE {name} histogram")
+                    seen_types.add(name)
+                cumulative = 0
+                for bound, count in zip(hist.buckets, hist.counts):
+                    cumulative += count
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {cumulative}")
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {hist.count}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {hist.total:g}")
+                lines.append(f"{name}_count{_format_labels(labels)} {hist.count}")
+        return "\n".join(lines) + "\n"
+
+
+def _format_labels(labels: LabelKey) -> str:
+    if not labels:
+        return ""
+    inner = ",".join('{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels)
+    return "{" + inner + "}"
+
+
+class LoggingSink:
+    """Writes every metric event to a logger."""
+
+    def __init__(self, log: Optional[logging.Logger] = None, level: int = logging.DEBUG) -> None:
+        self.log = log or logger
+        self.level = level
+
+    def increment(self, name: str, amount: float = 1, labels: Optional[Mapping[str, str]] = None) -> None:
+        if self.log.isEnabledFor(self.level):
+            self.log.log(self.level, "metric %s%s += %g", name, _format_labels(_label_key(labels)), amount)
+
+    def observe(self, name: str, value: float, labels: Optional[Mapping[str, str]] = None) -> None:
+        if self.log.isEnabledFor(self.level):
+            self.log.log(self.level, "metric %s%s = %.6f", name, _format_labels(_label_key(labels)), value)
+
+
+class PrometheusFileSink(InMemorySink):
+    """In-memory sink that periodically dumps Prometheus text to a file.
+
+    The file is replaced atomically so a scraper (e.g. node_exporter's
+    textfile collector) never sees a partial dump.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        flush_interval: float = 10.0,
+        buckets: Tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(buckets)
+        self.path = Path(path)
+        self.flush_interval = flush_interval
+        self._last_flush = time.monotonic()
+
+    def increment(self, name: str, amount: float = 1, labels: Optional[Mapping[str, str]] = None) -> None:
+        super().increment(name, amount, labels)
+        self._maybe_flush()
+
+    def observe(self, name: str, value: float, labels: Optional[Mapping[str, str]] = None) -> None:
+        super().observe(name, value, labels)
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Write the current metrics to ``path``."""
+        self._last_flush = time.monotonic()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(self.render_prometheus(), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+def create_sink(spec: Optional[str]) -> Optional[MetricsSink]:
+    """Build a sink from a short textual spec.
+
+    Args:
+        spec: ``"memory"``, ``"logging"`` or ``"prometheus:<path>"``.
+            Empty / ``None`` / ``"off"`` disables metrics.
+
+    Returns:
+        The configured sink, or None when metrics are disabled
+    """
+    if not spec or spec.lower() in ("0", "off", "none", "false"):
+        return None
+    kind, _, arg = spec.partition(":")
+    kind = kind.lower()
+    if kind == "memory":
+        return InMemorySink()
+    if kind == "logging":
+        return LoggingSink()
+    if kind == "prometheus":
+        if not arg:
+            raise ValueError("prometheus metrics sink requires a path, e.g. 'prometheus:/tmp/persistence.prom'")
+        return PrometheusFileSink(Path(arg))
+    raise ValueError(f"Unknown metrics sink spec: {spec!r}")
+
+
+class InstrumentedStorage:
+    """Wraps a storage backend and records count/latency for every call.
+
+    Only the wrapper pays the timing cost; use the bare backend when metrics
+    are disabled.
+    """
+
+    def __init__(self, backend: Any, sink: MetricsSink) -> None:
+        self.backend = backend
+        self.sink = sink
+
+    def _call(self, operation: str, func: Any, *args: Any, **kwargs: Any) -> Any:
+        labels = {"operation": operation}
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            self.sink.increment(ERRORS_TOTAL, 1, labels)
+            raise
+        finally:
+            self.sink.observe(OPERATION_SECONDS, time.perf_counter() - start, labels)
+            self.sink.increment(OPERATIONS_TOTAL, 1, labels)
+
+    def save_process(self, process_name: str, session_data: Any) -> None:
+        self._call("save_process", self.backend.save_process, process_name, session_data)
+
+    def save_process_with_prefix_filter(
+        self, process_name: str, session_data: Any, persist_prefix: str = "persist_"
+    ) -> None:
+        self._call(
+            "save_process", self.backend.save_process_with_prefix_filter, process_name, session_data, persist_prefix
+        )
+
+    def load_process(self, process_name: str) -> Any:
+        return self._call("load_process", self.backend.load_process, process_name)
+
+    def list_processes(self) -> List[str]:
+        return self._call("list_processes", self.backend.list_processes)
+
+    def delete_process(self, process_name: str) -> bool:
+        return self._call("delete_process", self.backend.delete_process, process_name)
+
+    def process_exists(self, process_name: str) -> bool:
+        return self._call("process_exists", self.backend.process_exists, process_name)
+
+    def get_process_info(self, process_name: str) -> Any:
+        return self._call("get_process_info", self.backend.get_process_info, process_name)
+
+    def __getattr__(self, name: str) -> Any:
+        # Anything not explicitly instrumented is forwarded untouched
+        return getattr(self.backend, name)
@@ -0,0 +1,153 @@
+"""Schema versions of stored payloads and on-read migration.
+
+Each migration upgrades session data by one version. ``SimpleStorage``
+stamps new records with the registry's current version, upgrades older
+payloads in memory when they are loaded and writes them back on the next
+save; ``SchemaUpgrader`` can upgrade the rest in throttled batches::
+
+    migrations = MigrationRegistry()
+
+    @migrations.register(1)
+    def rename_assignee(data):
+        data["persist_担当者名"] = data.pop("persist_担当者", "")
+        return data
+
+    storage = SimpleStorage(path, migrations=migrations)
+"""
+import logging
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# レコード (メタデータ) 側に保存するスキーマバージョンのキー。無いレコードは 0 とみなす
+SCHEMA_VERSION_KEY = "schema_version"
+
+Migration = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+
+class MigrationRegistry:
+    """Ordered migration functions; ``register(n)`` upgrades version ``n - 1`` to ``n``."""
+
+    def __init__(self) -> None:
+        self._migrations: Dict[int, Migration] = {}
+
+    def register(self, version: int) -> Callable[[Migration], Migration]:
+        """Decorator registering the migration that produces ``version``.
+
+        The function receives a copy of the (decoded) session data and
+        returns the upgraded data.
+
+        Raises:
+            ValueError: If the version is not positive or already registered
+        """
+        if version < 1:
+            raise ValueError("migration versions start at 1")
+        if version in self._migrations:
+            raise ValueError(f"a migration to version {version} is already registered")
+
+        def decorator(func: Migration) -> Migration:
+            self._migrations[version] = func
+            return func
+        return decorator
+
+    @property
+    def current_version(self) -> int:
+        """Version written by this code (0 when no migration is registered)."""
+        return max(self._migrations, default=0)
+
+    def needs_upgrade(self, version: int) -> bool:
+        return version < self.current_version
+
+    def upgrade(self, session_data: Dict[str, Any], version: int) -> Dict[str, Any]:
+        """Upgrade session data stored at ``version`` to the current version.
+
+        Raises:
+            ValueError: If the data is newer than this code or a migration step is missing
+        """
+        current = self.current_version
+        if version > current:
+            raise ValueError(f"payload schema version {version} is newer than the supported version {current}")
+        data = dict(session_data)
+        for step in range(version + 1, current + 1):
+            migration = self._migrations.get(step)
+            if migration is None:
+                raise ValueError(f"no migration to schema version {step}")
+            data = migration(data)
+        return data
+
+
+class SchemaUpgrader:
+    """Upgrades outdated processes in the background, a batch at a time.
+
+    The storage must provide ``outdated_processes`` and ``upgrade_processes``
+    (``SimpleStorage`` / ``PartitionedStorage``). Archived processes are left
+    alone; they are upgraded when they are restored and loaded.
+    """
+
+    def __init__(self, storage: Any, batch_size: int = 50, pause: float = 1.0, idle_interval: float = 3600.0) -> None:
+        """Create an upgrader.
+
+        Args:
+            storage: Storage created with a ``MigrationRegistry``
+            batch_size: Processes rewritten per batch (one write of ``processes.json``)
+            pause: Seconds to wait between batches
+            idle_interval: Seconds to wait before checking again once nothing is outdated
+        """
+        self.storage = storage
+        self.batch_size = batch_size
+        self.pause = pause
+        self.idle_interval = idle_interval
+        self.upgraded_total = 0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> List[str]:
+        """Upgrade one batch.
+
+        Returns:
+            Names of the upgraded processes (empty when nothing is outdated)
+        """
+        names = self.storage.outdated_processes(limit=self.batch_size)
+        if not names:
+            return []
+        upgraded = self.storage.upgrade_processes(names)
+        self.upgraded_total += len(upgraded)
+        logger.info("schema upgrade: upgraded %d processes", len(upgraded))
+        return upgraded
+
+    def run(self) -> int:
+        """Upgrade everything outdated now (still pausing between batches).
+
+        Returns:
+            Number of upgraded processes
+        """
+        total = 0
+        while not self._stop.is_set():
+            upgraded = self.run_once()
+            if not upgraded:
+                break
+            total += len(upgraded)
+            self._stop.wait(self.pause)
+        return total
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="schema-upgrader", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                upgraded = self.run_once()
+            except Exception:
+                logger.exception("schema upgrade failed")
+                upgraded = []
+            self._stop.wait(self.pause if upgraded else self.idle_interval)
@@ -0,0 +1,208 @@
+"""Copying every process from one storage to another.
+
+``StorageMigrator`` works with any ``StorageInterface`` pair (e.g. a
+single-file ``SimpleStorage`` into a ``PartitionedStorage``). Processes are
+read in batches by a worker pool while the previous batch is written, each
+batch is written at once when the target supports ``import_processes``,
+progress is checkpointed after every batch so an interrupted run resumes
+where it stopped, and the copies are verified against checksums of the
+source data at the end.
+"""
+import hashlib
+import json
+import logging
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _feed(digest: Any, value: Any) -> None:
+    if isinstance(value, dict):
+        digest.update(b"{")
+        for key in sorted(value, key=str):
+            _feed(digest, str(key))
+            _feed(digest, value[key])
+        digest.update(b"}")
+    elif isinstance(value, (list, tuple)):
+        digest.update(b"[")
+        for item in value:
+            _feed(digest, item)
+        digest.update(b"]")
+    elif hasattr(value, "dtype") and hasattr(value, "tobytes"):
+        # NumPy 配列 / スカラー: 全要素を対象にする (repr は省略されるため使わない)
+        digest.update(f"ndarray:{value.dtype.str}:{getattr(value, 'shape', ())}:".encode("utf-8"))
+        digest.update(value.tobytes())
+    elif hasattr(value, "to_json"):
+        digest.update(b"pandas:")
+        digest.update(value.to_json(orient="split", date_format="iso", date_unit="ns").encode("utf-8"))
+    else:
+        digest.update(json.dumps(value, ensure_ascii=False, default=repr).encode("utf-8"))
+    digest.update(b";")
+
+
+def checksum(session_data: Any) -> str:
+    """Checksum of (decoded) session data, independent of key order and storage format."""
+    digest = hashlib.sha256()
+    _feed(digest, session_data)
+    return digest.hexdigest()
+
+
+@dataclass
+class MigrationReport:
+    """Result of ``StorageMigrator.run``."""
+    copied: List[str] = field(default_factory=list)
+    skipped: int = 0
+    failed: Dict[str, str] = field(default_factory=dict)
+    verified: int = 0
+    mismatched: List[str] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.failed and not self.mismatched
+
+    def format(self) -> str:
+        """Human readable summary (used by the CLI)."""
+        lines = [
+            f"Copied {len(self.copied)} processes ({self.skipped} already done)",
+            f"Verified {self.verified} processes",
+        ]
+        lines.extend(f"  failed: {name}: {error}" for name, error in sorted(self.failed.items()))
+        lines.extend(f"  checksum mismatch: {name}" for name in self.mismatched)
+        return "\n".join(lines)
+
+
+class _Checkpoint:
+    """``{name: checksum}`` of processes already copied, rewritten atomically after each batch."""
+
+    def __init__(self, path: Optional[Path]) -> None:
+        self.path = Path(path) if path is not None else None
+        self.completed: Dict[str, str] = {}
+        if self.path is not None and self.path.exists():
+            self.completed = json.loads(self.path.read_text(encoding="utf-8")).get("completed", {})
+
+    def save(self) -> None:
+        if self.path is None:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        tmp_path.write_text(json.dumps({"completed": self.completed}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, self.path)
+
+
+class StorageMigrator:
+    """Copies all processes of ``source`` into ``target``."""
+
+    def __init__(
+        self,
+        source: Any,
+        target: Any,
+        workers: int = 4,
+        batch_size: int = 100,
+        checkpoint_path: Optional[Path] = None,
+    ) -> None:
+        """Create a migrator.
+
+        ``created`` / ``last_updated`` are preserved when the source has
+        ``export_process`` and the target ``import_processes`` (``SimpleStorage``,
+        ``PartitionedStorage``); otherwise plain ``load_process`` /
+        ``save_process`` are used.
+
+        Args:
+            source: Storage to read from
+            target: Storage to write to
+            workers: Threads reading (and verifying) processes in parallel
+            batch_size: Processes per write and per checkpoint
+            checkpoint_path: File recording finished processes; an existing file resumes the run
+        """
+        self.source = source
+        self.target = target
+        self.workers = workers
+        self.batch_size = batch_size
+        self.checkpoint = _Checkpoint(checkpoint_path)
+
+    def source_names(self) -> List[str]:
+        """Hot and (if the source has an archive) archived process names."""
+        names = list(self.source.list_processes())
+        if hasattr(self.source, "list_archived_processes"):
+            hot = set(names)
+            names.extend(name for name in self.source.list_archived_processes() if name not in hot)
+        return names
+
+    def _read(self, process_name: str) -> Optional[Dict[str, Any]]:
+        if hasattr(self.source, "export_process"):
+            return self.source.export_process(process_name)
+        session_data = self.source.load_process(process_name)
+        return None if session_data is None else {"session_data": session_data}
+
+    def _write(self, records: Dict[str, Dict[str, Any]]) -> None:
+        if hasattr(self.target, "import_processes") and all("created" in record for record in records.values()):
+            self.target.import_processes(records)
+            return
+        for name, record in records.items():
+            self.target.save_process(name, record["session_data"])
+
+    def run(self, verify: bool = True, progress: Optional[Callable[[int, int], None]] = None) -> MigrationReport:
+        """Copy every process not yet recorded in the checkpoint, then verify.
+
+        Args:
+            verify: Re-read every copied process from the target and compare checksums
+            progress: Called with (done, total) after each batch
+
+        Returns:
+            MigrationReport
+        """
+        report = MigrationReport()
+        names = self.source_names()
+        pending = [name for name in names if name not in self.checkpoint.completed]
+        report.skipped = len(names) - len(pending)
+        batches = [pending[i:i + self.batch_size] for i in range(0, len(pending), self.batch_size)]
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="migrator") as executor:
+            def submit(batch: Sequence[str]) -> List[Tuple[str, Future]]:
+                return [(name, executor.submit(self._read, name)) for name in batch]
+
+            # 次のバッチの読み込みを投げてから現在のバッチを書き込む
+            in_flight = submit(batches[0]) if batches else []
+            for index in range(len(batches)):
+                current = in_flight
+                in_flight = submit(batches[index + 1]) if index + 1 < len(batches) else []
+                records: Dict[str, Dict[str, Any]] = {}
+                for name, future in current:
+                    try:
+                        record = future.result()
+                    except Exception as error:
+                        report.failed[name] = f"read: {error}"
+                        continue
+                    if record is not None:
+                        records[name] = record
+                if records:
+                    try:
+                        self._write(records)
+                    except Exception as error:
+                        for name in records:
+                            report.failed[name] = f"write: {error}"
+                        logger.exception("writing a batch of %d processes failed", len(records))
+                        continue
+                for name, record in records.items():
+                    self.checkpoint.completed[name] = checksum(record["session_data"])
+                    report.copied.append(name)
+                self.checkpoint.save()
+                if progress is not None:
+                    progress(report.skipped + sum(len(batch) for batch in batches[:index + 1]), len(names))
+
+            if verify:
+                expected = dict(self.checkpoint.completed)
+                actual = executor.map(self._target_checksum, list(expected))
+                for name, digest in zip(list(expected), actual):
+                    if digest != expected[name]:
+                        report.mismatched.append(name)
+                report.verified = len(expected) - len(report.mismatched)
+        return report
+
+    def _target_checksum(self, process_name: str) -> Optional[str]:
+        session_data = self.target.load_process(process_name)
+        return None if session_data is None else checksum(session_data)
@@ -1,10 +1,88 @@
 # Flexible data models for persistence layer
-from typing import Any, Dict, List, Union
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from typing import Any, Dict, List, NamedTuple, Optional, Union
 
 # Type definitions for JSON serializable data
 type JsonSerializable = Union[str, int, float, bool, None, Dict[str, Any], List[Any]]
 type ProcessData = Dict[str, JsonSerializable]
 
-# Note: This module previously contained rigid dataclass models (ProcessState, ProcessStep, etc.)
-# but has been simplified to support flexible dict-based data structures.
-# This allows for dynamic data schemas without requiring model updates.
+# SimpleStorage とアプリは上の dict ベースのデータを使う。
+# 以下は JsonStorage (1プロセス1ファイル) 用の型付きモデル。
+# 大量に生成・変換するため __slots__ を使い、to_dict / from_dict は
+# フィールドを列挙せず手書きで変換する (dataclasses.asdict 等のリフレクションは使わない)。
+
+
+class ProcessStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+# 値 → Enum の変換表 (ProcessStatus(value) の探索より速い)
+_STATUS_BY_VALUE: Dict[str, ProcessStatus] = {status.value: status for status in ProcessStatus}
+_parse_datetime = datetime.fromisoformat
+# NamedTuple の生成コードを通さずにタプルを作る (監査エントリは数が多い)
+_new_tuple = tuple.__new__
+
+
+class AuditEntry(NamedTuple):
+    """One audit record; stored as ``[timestamp, action, details]``."""
+    timestamp: datetime
+    action: str
+    details: Dict[str, Any]
+
+    def to_list(self) -> List[Any]:
+        return [self.timestamp.isoformat(), self.action, self.details]
+
+    @classmethod
+    def from_list(cls, data: List[Any]) -> "AuditEntry":
+        return _new_tuple(cls, (_parse_datetime(data[0]), data[1], data[2]))
+
+
+@dataclass(slots=True)
+class ProcessState:
+    """A weekly process handled by ``JsonStorage``."""
+    process_id: str
+    week_number: int
+    year: int
+    status: ProcessStatus = ProcessStatus.PENDING
+    started_at: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+    data: Dict[str, Any] = field(default_factory=dict)
+    audit_trail: List[AuditEntry] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        started_at = self.started_at
+        completed_at = self.completed_at
+        return {
+            "process_id": self.process_id,
+            "week_number": self.week_number,
+            "year": self.year,
+            "status": self.status.value,
+            "started_at": started_at.isoformat() if started_at is not None else None,
+            "completed_at": completed_at.isoformat() if completed_at is not None else None,
+            "data": self.data,
+            "audit_trail": [[timestamp.isoformat(), action, details] for timestamp, action, details in self.audit_trail],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ProcessState":
+        started_at = data.get("started_at")
+        completed_at = data.get("completed_at")
+        return cls(
+            data["process_id"],
+            data["week_number"],
+            data["year"],
+            _STATUS_BY_VALUE[data.get("status", "pending")],
+            _parse_datetime(started_at) if started_at else None,
+            _parse_datetime(completed_at) if completed_at else None,
+            data.get("data") or {},
+            [
+                _new_tuple(AuditEntry, (_parse_datetime(timestamp), action, details))
+                for timestamp, action, details in data.get("audit_trail", ())
+            ],
+        )
@@ -0,0 +1,142 @@
+"""Sorted process-name index with prefix, substring and recency lookups."""
+import heapq
+import threading
+from bisect import bisect_left, insort
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Set
+
+from .change_feed import ARCHIVE, DELETE
+
+
+def _fold(name: str) -> str:
+    key = name.casefold()
+    # 大文字を含まない名前 (日本語名など) は同じ文字列を共有する
+    return name if key == name else key
+
+
+def _grams(text: str, n: int) -> Set[str]:
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class NameIndex:
+    """In-memory index over process names.
+
+    - a sorted list of case-folded names for prefix lookups (bisect)
+    - unigram/bigram postings for substring lookups (works for Japanese names too)
+    - the real names behind each case-folded key ("Alpha" and "alpha" are two processes)
+    - last-updated timestamps so results can be returned most recent first
+
+    It implements ``StorageListener`` so a storage can keep it up to date.
+    """
+
+    def __init__(self) -> None:
+        self._sorted: List[str] = []          # case-folded keys
+        self._names: Dict[str, Set[str]] = {}  # case-folded key -> original names
+        self._updated: Dict[str, str] = {}    # original name -> last_updated (ISO)
+        self._postings: Dict[str, Set[str]] = {}
+        self._lock = threading.RLock()
+
+    def rebuild(self, records: Mapping[str, Mapping[str, Any]]) -> None:
+        """Rebuild from ``{name: record}`` where records carry ``last_updated``."""
+        with self._lock:
+            self._names = {}
+            for name in records:
+                self._names.setdefault(_fold(name), set()).add(name)
+            self._sorted = sorted(self._names)
+            self._updated = {name: record.get("last_updated", "") for name, record in records.items()}
+            self._postings = {}
+            for key in self._names:
+                for gram in _grams(key, 1) | _grams(key, 2):
+                    self._postings.setdefault(gram, set()).add(key)
+
+    def add(self, name: str, last_updated: str = "") -> None:
+        """Add a name or refresh its last-updated time."""
+        key = _fold(name)
+        with self._lock:
+            self._updated[name] = last_updated
+            names = self._names.get(key)
+            if names is not None:
+                names.add(name)
+                return
+            self._names[key] = {name}
+            insort(self._sorted, key)
+            for gram in _grams(key, 1) | _grams(key, 2):
+                self._postings.setdefault(gram, set()).add(key)
+
+    def remove(self, name: str) -> None:
+        key = _fold(name)
+        with self._lock:
+            self._updated.pop(name, None)
+            names = self._names.get(key)
+            if names is None or name not in names:
+                return
+            names.discard(name)
+            if names:
+                return
+            del self._names[key]
+            i = bisect_left(self._sorted, key)
+            if i < len(self._sorted) and self._sorted[i] == key:
+                del self._sorted[i]
+            for gram in _grams(key, 1) | _grams(key, 2):
+                keys = self._postings.get(gram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self._postings[gram]
+
+    def on_change(self, operation: str, process_name: str, record: Optional[Dict[str, Any]]) -> None:
+        """StorageListener hook: archived and deleted processes leave the index."""
+        if operation in (DELETE, ARCHIVE) or record is None:
+            self.remove(process_name)
+        else:
+            self.add(process_name, record.get("last_updated", ""))
+
+    def __len__(self) -> int:
+        return len(self._updated)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._updated
+
+    def prefix(self, prefix: str, limit: Optional[int] = None) -> List[str]:
+        """Names starting with ``prefix`` (case-insensitive), in sorted order."""
+        key = prefix.casefold()
+        result: List[str] = []
+        with self._lock:
+            i = bisect_left(self._sorted, key)
+            while i < len(self._sorted) and self._sorted[i].startswith(key):
+                result.extend(sorted(self._names[self._sorted[i]]))
+                if limit is not None and len(result) >= limit:
+                    return result[:limit]
+                i += 1
+        return result
+
+    def _matching_keys(self, query: str) -> Iterable[str]:
+        grams = _grams(query, 2) if len(query) >= 2 else {query}
+        postings = [self._postings.get(gram) for gram in grams]
+        if any(p is None for p in postings):
+            return []
+        postings.sort(key=len)  # type: ignore[arg-type]
+        candidates = set(postings[0])  # type: ignore[arg-type]
+        for p in postings[1:]:
+            candidates &= p  # type: ignore[operator]
+            if not candidates:
+                return []
+        if len(query) <= 2:
+            return candidates
+        return [key for key in candidates if query in key]
+
+    def search(self, query: str = "", limit: int = 50) -> List[str]:
+        """Names containing ``query`` (case-insensitive), most recently updated first.
+
+        An empty query returns the ``limit`` most recently updated names.
+        """
+        key = query.strip().casefold()
+        with self._lock:
+            if not key:
+                names: Iterable[str] = self._updated.keys()
+            else:
+                names = [name for k in self._matching_keys(key) for name in self._names[k]]
+            return heapq.nlargest(limit, names, key=lambda name: (self._updated.get(name, ""), name))
+
+    def recent(self, limit: int = 50) -> List[str]:
+        """The ``limit`` most recently updated names."""
+        return self.search("", limit)
@@ -0,0 +1,405 @@
+"""Hash-partitioned storage over several child backends.
+
+Process names are mapped to partitions with a consistent-hash ring (each
+partition owns many virtual points), so adding a partition only moves the
+names whose ring segment it takes over. Per-process calls go to the owning
+partition; listing calls fan out to all partitions in parallel and merge.
+
+The ring membership is written to ``ring.json`` in every partition
+directory, so reopening with a different set of partitions is refused
+instead of silently routing names to partitions that do not hold them.
+"""
+import hashlib
+import json
+import threading
+from bisect import bisect_right
+from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from .change_feed import ChangeEvent
+from .interface import StorageListener
+from .models import ProcessData
+from .replication import write_atomic
+from .simple_storage import SimpleStorage
+
+# パーティションの構成 (ID・仮想ノード数) を各パーティションのディレクトリに記録するファイル
+RING_FILE = "ring.json"
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+def _load_ring(files: Iterable[Path]) -> Optional[Dict[str, Any]]:
+    """The newest ring membership recorded in ``files`` (partitions are only ever added)."""
+    rings = [json.loads(path.read_text(encoding="utf-8")) for path in files if path.exists()]
+    return max(rings, key=lambda ring: len(ring["partitions"]), default=None)
+
+
+def _check_ring(ring: Optional[Dict[str, Any]], partition_ids: Iterable[str], replicas: int) -> None:
+    if ring is None:
+        return
+    if sorted(partition_ids) != ring["partitions"] or replicas != ring["replicas"]:
+        raise ValueError(
+            f"partitions {sorted(partition_ids)} (replicas={replicas}) do not match the stored ring "
+            f"{ring['partitions']} (replicas={ring['replicas']}); add partitions with add_partition "
+            "(scripts/add_partition.py)"
+        )
+
+
+class HashRing:
+    """Consistent-hash ring with ``replicas`` virtual points per node."""
+
+    def __init__(self, nodes: Sequence[str] = (), replicas: int = 64) -> None:
+        self.replicas = replicas
+        self._points: List[Tuple[int, str]] = []
+        for node in nodes:
+            self.add(node)
+
+    def add(self, node: str) -> None:
+        if node in self.nodes:
+            raise ValueError(f"node '{node}' is already on the ring")
+        self._points.extend((_hash(f"{node}#{i}"), node) for i in range(self.replicas))
+        self._points.sort()
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted({node for _, node in self._points})
+
+    def node_for(self, key: str) -> str:
+        """The node owning ``key`` (first point clockwise from its hash)."""
+        if not self._points:
+            raise LookupError("the ring has no nodes")
+        i = bisect_right(self._points, (_hash(key), "\uffff"))
+        return self._points[i % len(self._points)][1]
+
+
+class _ReadWriteLock:
+    """Many concurrent operations, or one exclusive rebalance."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                self._cond.notify_all()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        with self._cond:
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class _PartitionedArchive:
+    """Read-only view over the partitions' archives (for ``AggregateView``)."""
+
+    def __init__(self, storage: "PartitionedStorage") -> None:
+        self._storage = storage
+
+    def records(self) -> List[Tuple[str, Dict[str, Any]]]:
+        return [item for records in self._storage._fan_out(lambda p: p.archive.records()) for item in records]
+
+    def __contains__(self, process_name: object) -> bool:
+        return isinstance(process_name, str) and process_name in self._storage._owner(process_name).archive
+
+    def __len__(self) -> int:
+        return sum(self._storage._fan_out(lambda p: len(p.archive)))
+
+
+class PartitionedStorage:
+    """Spreads processes over child storages (e.g. ``SimpleStorage`` in separate directories).
+
+    Implements ``StorageInterface`` and the ``SimpleStorage`` extensions used
+    by ``StreamlitSessionManager``, ``AggregateView`` and ``RetentionEngine``.
+    """
+
+    def __init__(self, partitions: Mapping[str, Any], replicas: int = 64) -> None:
+        """Create a partitioned storage.
+
+        The ring is derived from the partition ids only, so reopening with
+        the same ids finds every process again. Partitions with a
+        ``base_path`` record the ids in ``ring.json``; opening with other ids
+        raises. Without a recorded ring (data from older versions) the
+        partitions are checked for processes the ring would not route to them.
+
+        Args:
+            partitions: ``{partition id: storage}``
+            replicas: Virtual points per partition on the hash ring
+
+        Raises:
+            ValueError: The partitions do not match the stored ring, or hold
+                processes that belong to another partition
+        """
+        if not partitions:
+            raise ValueError("at least one partition is required")
+        self.partitions: Dict[str, Any] = dict(partitions)
+        self.ring = HashRing(list(self.partitions), replicas)
+        self._executor = ThreadPoolExecutor(max_workers=max(4, len(self.partitions)), thread_name_prefix="partition")
+        self._rwlock = _ReadWriteLock()
+        self._listeners: List[StorageListener] = []
+
+        ring = _load_ring(self._ring_files())
+        _check_ring(ring, self.partitions, replicas)
+        if ring is None:
+            misplaced = [name for names in self._misplaced().values() for name in names]
+            if misplaced:
+                self.close()
+                raise ValueError(
+                    f"{len(misplaced)} processes (e.g. '{misplaced[0]}') are stored on a partition that does "
+                    "not own them; open with the partition ids they were saved with"
+                )
+            self._save_ring()
+        elif ring.get("rebalancing"):
+            # add_partition が途中で止まっていた: 残りの移動を終わらせる
+            self._move_misplaced([])
+            self._save_ring()
+
+    @classmethod
+    def from_paths(cls, paths: Sequence[Path], replicas: int = 64, **storage_kwargs: Any) -> "PartitionedStorage":
+        """One ``SimpleStorage`` per directory; the directory name is the partition id.
+
+        Raises:
+            ValueError: Duplicate ids, or ids that do not match the stored ring
+        """
+        paths = [Path(path) for path in paths]
+        ids = [path.name for path in paths]
+        for partition_id in ids:
+            if ids.count(partition_id) > 1:
+                raise ValueError(f"duplicate partition id '{partition_id}'")
+        # ディレクトリを作る前に確認する
+        _check_ring(_load_ring(path / RING_FILE for path in paths), ids, replicas)
+        return cls({path.name: SimpleStorage(path, **storage_kwargs) for path in paths}, replicas)
+
+    def _ring_files(self) -> List[Path]:
+        return [
+            Path(partition.base_path) / RING_FILE
+            for partition in self.partitions.values() if getattr(partition, "base_path", None) is not None
+        ]
+
+    def _save_ring(self, rebalancing: bool = False) -> None:
+        ring: Dict[str, Any] = {"partitions": self.ring.nodes, "replicas": self.ring.replicas}
+        if rebalancing:
+            ring["rebalancing"] = True
+        payload = json.dumps(ring, indent=2).encode("utf-8")
+        for path in self._ring_files():
+            write_atomic(path, payload)
+
+    def _owner(self, process_name: str) -> Any:
+        return self.partitions[self.ring.node_for(process_name)]
+
+    def partition_for(self, process_name: str) -> str:
+        """Id of the partition that owns ``process_name``."""
+        return self.ring.node_for(process_name)
+
+    def _fan_out(self, func: Callable[[Any], Any]) -> List[Any]:
+        partitions = list(self.partitions.values())
+        if len(partitions) == 1:
+            return [func(partitions[0])]
+        return list(self._executor.map(func, partitions))
+
+    def _route(self, method: str, process_name: str, *args: Any) -> Any:
+        with self._rwlock.read():
+            return getattr(self._owner(process_name), method)(process_name, *args)
+
+    # StorageInterface
+    def save_process(self, process_name: str, session_data: ProcessData) -> None:
+        self._route("save_process", process_name, session_data)
+
+    def load_process(self, process_name: str) -> Optional[ProcessData]:
+        return self._route("load_process", process_name)
+
+    def list_processes(self) -> List[str]:
+        with self._rwlock.read():
+            return [name for names in self._fan_out(lambda p: p.list_processes()) for name in names]
+
+    def delete_process(self, process_name: str) -> bool:
+        return self._route("delete_process", process_name)
+
+    def process_exists(self, process_name: str) -> bool:
+        return self._route("process_exists", process_name)
+
+    # SimpleStorage extensions
+    def save_process_with_prefix_filter(
+        self, process_name: str, session_data: ProcessData, persist_prefix: str = "persist_"
+    ) -> None:
+        self._route("save_process_with_prefix_filter", process_name, session_data, persist_prefix)
+
+    def update_process(self, process_name: str, updates: ProcessData) -> None:
+        self._route("update_process", process_name, updates)
+
+    def get_process_info(self, process_name: str) -> Optional[Dict[str, Any]]:
+        return self._route("get_process_info", process_name)
+
+    def get_process_infos(self) -> Dict[str, Dict[str, Any]]:
+        """Metadata of every hot process, gathered from all partitions in parallel."""
+        with self._rwlock.read():
+            infos: Dict[str, Dict[str, Any]] = {}
+            for part in self._fan_out(lambda p: {name: p.get_process_info(name) for name in p.list_processes()}):
+                infos.update(part)
+            return infos
+
+    def search_processes(self, query: str = "", limit: int = 50) -> List[str]:
+        """Each partition returns its best ``limit`` matches; the merge keeps the most recent."""
+        with self._rwlock.read():
+            results = self._fan_out(lambda p: [(name, p.get_process_info(name)) for name in p.search_processes(query, limit)])
+        candidates = [(((info or {}).get("last_updated", ""), name)) for part in results for name, info in part]
+        return [name for _, name in sorted(candidates, reverse=True)[:limit]]
+
+    def list_archived_processes(self) -> List[str]:
+        with self._rwlock.read():
+            return [name for names in self._fan_out(lambda p: p.list_archived_processes()) for name in names]
+
+    def get_archived_info(self, process_name: str) -> Optional[Dict[str, Any]]:
+        return self._route("get_archived_info", process_name)
+
+    def restore_process(self, process_name: str) -> bool:
+        return self._route("restore_process", process_name)
+
+    def archive_idle(self, *args: Any, **kwargs: Any) -> List[str]:
+        with self._rwlock.read():
+            return [name for names in self._fan_out(lambda p: p.archive_idle(*args, **kwargs)) for name in names]
+
+    def export_process(self, process_name: str) -> Optional[Dict[str, Any]]:
+        return self._route("export_process", process_name)
+
+    def import_processes(self, records: Dict[str, Dict[str, Any]]) -> None:
+        """Import records, one batch (and one write) per owning partition."""
+        with self._rwlock.read():
+            groups: Dict[str, Dict[str, Dict[str, Any]]] = {}
+            for name, record in records.items():
+                groups.setdefault(self.ring.node_for(name), {})[name] = record
+            for pid, group in groups.items():
+                self.partitions[pid].import_processes(group)
+
+    def outdated_processes(self, limit: Optional[int] = None) -> List[str]:
+        with self._rwlock.read():
+            names = [name for names in self._fan_out(lambda p: p.outdated_processes(limit)) for name in names]
+        return names if limit is None else names[:limit]
+
+    def upgrade_processes(self, process_names: Iterable[str]) -> List[str]:
+        """Upgrade processes, one batch (and one write) per owning partition."""
+        with self._rwlock.read():
+            groups: Dict[str, List[str]] = {}
+            for name in process_names:
+                groups.setdefault(self.ring.node_for(name), []).append(name)
+            return [name for pid, names in groups.items() for name in self.partitions[pid].upgrade_processes(names)]
+
+    def reload_if_changed(self) -> List[ChangeEvent]:
+        with self._rwlock.read():
+            return [event for events in self._fan_out(lambda p: p.reload_if_changed()) for event in events]
+
+    @property
+    def last_seq(self) -> int:
+        """Sum of the partitions' sequence numbers: changes whenever any partition changes."""
+        return sum(self._fan_out(lambda p: p.last_seq))
+
+    @property
+    def data(self) -> Mapping[str, Dict[str, Any]]:
+        """Read-only merged view of the partitions' hot records."""
+        return ChainMap(*(p.data for p in self.partitions.values()))
+
+    @property
+    def archive(self) -> _PartitionedArchive:
+        return _PartitionedArchive(self)
+
+    def add_listener(self, listener: StorageListener) -> None:
+        """Register a listener on every partition (including ones added later)."""
+        self._listeners.append(listener)
+        for partition in self.partitions.values():
+            partition.add_listener(listener)
+
+    def remove_listener(self, listener: StorageListener) -> None:
+        self._listeners.remove(listener)
+        for partition in self.partitions.values():
+            partition.remove_listener(listener)
+
+    def add_partition(self, partition_id: str, storage: Any) -> List[str]:
+        """Add a partition and move the processes it now owns.
+
+        Only names whose ring position falls into the new partition's
+        segments move; other calls wait until the move is finished. The new
+        membership is recorded before the move, so an interrupted move is
+        finished the next time the partitions are opened with the new ids.
+
+        Returns:
+            Names of the moved processes
+        """
+        with self._rwlock.write():
+            if partition_id in self.partitions:
+                raise ValueError(f"partition '{partition_id}' already exists")
+            sources = list(self.partitions.values())
+            self.ring.add(partition_id)
+            self.partitions[partition_id] = storage
+            self._executor.shutdown(wait=False)
+            self._executor = ThreadPoolExecutor(max_workers=max(4, len(self.partitions)), thread_name_prefix="partition")
+            # 移動前に新しい構成を記録する: 途中で止まっても新しい構成で開き直せば残りを移動する
+            self._save_ring(rebalancing=True)
+            moved = self._move_misplaced(sources)
+            self._save_ring()
+            return moved
+
+    def _misplaced(self) -> Dict[str, List[str]]:
+        """``{partition id: names}`` of processes stored on a partition the ring does not route them to."""
+        def names(item: Tuple[str, Any]) -> Tuple[str, List[str]]:
+            pid, partition = item
+            stored = [*partition.list_processes(), *partition.list_archived_processes()]
+            return pid, [name for name in stored if self.ring.node_for(name) != pid]
+
+        return {pid: found for pid, found in self._executor.map(names, list(self.partitions.items())) if found}
+
+    def _move_misplaced(self, sources: List[Any]) -> List[str]:
+        """Move every misplaced process to its owner (copy first, then delete).
+
+        Args:
+            sources: Partitions that currently carry the registered listeners
+        """
+        # 移動は外部から見ると変化なし: コピー先の SAVE より後に来るコピー元の DELETE で
+        # 名前単位のリスナー (集計・保持ルール) が消してしまわないよう、移動中は外しておく
+        for listener in self._listeners:
+            for source in sources:
+                source.remove_listener(listener)
+        moved: List[str] = []
+        try:
+            for pid, names in self._misplaced().items():
+                source = self.partitions[pid]
+                groups: Dict[str, Dict[str, Dict[str, Any]]] = {}
+                for name in names:
+                    record = source.export_process(name)
+                    if record is not None:
+                        groups.setdefault(self.ring.node_for(name), {})[name] = record
+                # コピーしてから削除 (途中で失敗してもデータは残る)
+                for owner, group in groups.items():
+                    self.partitions[owner].import_processes(group)
+                source.delete_processes(names)
+                moved.extend(names)
+        finally:
+            for listener in self._listeners:
+                for partition in self.partitions.values():
+                    partition.add_listener(listener)
+        return moved
+
+    def close(self) -> None:
+        """Stop the fan-out thread pool."""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,160 @@
+"""Background prefetch of the processes a session is likely to open next.
+
+Switching processes in the selector loads the new process on the critical
+path of the rerun. ``Prefetcher`` takes hints (the current process, the
+list shown in the selector and the session's recently used processes) and
+warms a ``CachedStorage`` with the neighbours of the current process and
+the recent ones from a daemon thread, so a switch is usually a cache hit.
+
+``hint`` only queues names; all loading happens in the thread, and
+prefetched data is held within its own byte budget of the cache.
+"""
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, List, Optional, Sequence
+
+from .cached_storage import CachedStorage
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PrefetchStats:
+    """Counters of the prefetch thread."""
+    loaded: int = 0
+    skipped: int = 0
+    dropped: int = 0
+    errors: int = 0
+
+
+class Prefetcher:
+    """Warms a ``CachedStorage`` in a daemon thread from selector hints."""
+
+    def __init__(
+        self,
+        cache: CachedStorage,
+        max_bytes: int = 8 * 1024 * 1024,
+        neighbours: int = 2,
+        recent: int = 5,
+        max_pending: int = 32,
+    ) -> None:
+        """Initialize the prefetcher.
+
+        Args:
+            cache: Cache to warm
+            max_bytes: Budget for prefetched entries that have not been read yet
+            neighbours: Processes on each side of the current one to prefetch
+            recent: Recently used processes to prefetch
+            max_pending: Queue length; the oldest hints are dropped beyond it
+        """
+        self.cache = cache
+        self.max_bytes = max_bytes
+        self.neighbours = neighbours
+        self.recent = recent
+        self.max_pending = max_pending
+        self.stats = PrefetchStats()
+        self._pending: Deque[str] = deque()
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def candidates(self, current: str, ordered: Sequence[str], recent: Sequence[str] = ()) -> List[str]:
+        """Processes worth prefetching, most likely first.
+
+        Args:
+            current: Process currently open (not included)
+            ordered: Processes in the order the selector shows them
+            recent: Processes the session used recently, most recent first
+        """
+        names: List[str] = []
+        if current in ordered:
+            index = list(ordered).index(current)
+            for distance in range(1, self.neighbours + 1):
+                # 前後を交互に (直前・直後・2つ前・2つ後 ...)
+                for i in (index - distance, index + distance):
+                    if 0 <= i < len(ordered):
+                        names.append(ordered[i])
+        names.extend(list(recent)[:self.recent])
+        result: List[str] = []
+        for name in names:
+            if name != current and name not in result:
+                result.append(name)
+        return result
+
+    def hint(self, current: str, ordered: Sequence[str], recent: Sequence[str] = ()) -> None:
+        """Queue the likely-next processes of a session (never loads anything itself).
+
+        Args:
+            current: Process currently open
+            ordered: Processes in the order the selector shows them
+            recent: Processes the session used recently, most recent first
+        """
+        names = [name for name in self.candidates(current, ordered, recent) if name not in self.cache]
+        if not names:
+            return
+        with self._condition:
+            # 新しいヒントを先に処理する (古いヒントのセッションはもう別の場所にいるかもしれない)
+            for name in reversed(names):
+                if name in self._pending:
+                    self._pending.remove(name)
+                self._pending.appendleft(name)
+            while len(self._pending) > self.max_pending:
+                self._pending.pop()
+                self.stats.dropped += 1
+            self._condition.notify()
+
+    def run_pending(self) -> int:
+        """Prefetch every queued process in the calling thread.
+
+        Returns:
+            Number of processes loaded into the cache
+        """
+        loaded = 0
+        while True:
+            with self._condition:
+                if not self._pending:
+                    return loaded
+                name = self._pending.popleft()
+            loaded += self._prefetch(name)
+
+    def _prefetch(self, process_name: str) -> bool:
+        try:
+            if self.cache.prefetch(process_name, self.max_bytes):
+                self.stats.loaded += 1
+                return True
+            self.stats.skipped += 1
+        except Exception:
+            # 先読みの失敗は通常の読み込みで改めて表面化するので、ここでは記録だけ
+            logger.debug("prefetch of %r failed", process_name, exc_info=True)
+            self.stats.errors += 1
+        return False
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="process-prefetcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            with self._condition:
+                while not self._pending and not self._stop.is_set():
+                    self._condition.wait()
+            if self._stop.is_set():
+                return
+            try:
+                # 他の書き手による変更を先に反映し、古い先読みを残さない
+                self.cache.sync_changes()
+            except Exception:
+                logger.debug("change sync before prefetch failed", exc_info=True)
+            self.run_pending()
@@ -0,0 +1,102 @@
+"""Opt-in profiling of a single Streamlit rerun (or any block of code)."""
+import cProfile
+import io
+import logging
+import pstats
+import re
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+logger = logging.getLogger(__name__)
+
+_UNSAFE_CHARS = re.compile(r'[\\/:*?"<>|\s]+')
+
+
+class RerunProfiler:
+    """Context manager that profiles a block with cProfile and optionally tracemalloc.
+
+    On exit a ``.pstats`` file and a top-N text summary are written to
+    ``output_dir`` and the summary is kept in ``self.summary``.
+    """
+
+    def __init__(
+        self,
+        output_dir: Path,
+        label: str,
+        top_n: int = 20,
+        trace_memory: bool = False,
+        sort_by: str = "cumulative",
+    ) -> None:
+        """Initialize the profiler.
+
+        Args:
+            output_dir: Directory for the pstats and summary files
+            label: Name used in file names (e.g. the page name)
+            top_n: Number of functions / allocation sites in the summary
+            trace_memory: Also record allocations with tracemalloc
+            sort_by: pstats sort key for the summary
+        """
+        self.output_dir = Path(output_dir)
+        self.label = _UNSAFE_CHARS.sub("_", label) or "rerun"
+        self.top_n = top_n
+        self.trace_memory = trace_memory
+        self.sort_by = sort_by
+        self.summary: Optional[str] = None
+        self.stats_path: Optional[Path] = None
+        self._profile: Optional[cProfile.Profile] = None
+        self._started_tracemalloc = False
+        self._memory_start: Optional[tracemalloc.Snapshot] = None
+
+    def __enter__(self) -> "RerunProfiler":
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+            self._memory_start = tracemalloc.take_snapshot()
+        self._profile = cProfile.Profile()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        assert self._profile is not None
+        self._profile.disable()
+        memory_report = ""
+        if self.trace_memory:
+            memory_report = self._memory_report()
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        try:
+            self._write_reports(memory_report)
+        except OSError:
+            # プロファイル出力の失敗でページ描画を止めない
+            logger.warning("failed to write profile for %s", self.label, exc_info=True)
+
+    def _memory_report(self) -> str:
+        assert self._memory_start is not None
+        _, peak = tracemalloc.get_traced_memory()
+        end = tracemalloc.take_snapshot()
+        lines = [f"tracemalloc peak: {peak / 1024:.1f} KiB", f"top {self.top_n} allocation sites:"]
+        for stat in end.compare_to(self._memory_start, "lineno")[: self.top_n]:
+            lines.append(f"  {stat}")
+        return "\n".join(lines)
+
+    def _write_reports(self, memory_report: str) -> None:
+        assert self._profile is not None
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S-%f")
+        stem = f"profile_{self.label}_{stamp}"
+        self.stats_path = self.output_dir / f"{stem}.pstats"
+        self._profile.dump_stats(str(self.stats_path))
+
+        buffer = io.StringIO()
+        stats = pstats.Stats(self._profile, stream=buffer)
+        stats.strip_dirs().sort_stats(self.sort_by).print_stats(self.top_n)
+        summary = buffer.getvalue().strip()
+        if memory_report:
+            summary = f"{summary}\n\n{memory_report}"
+        self.summary = summary
+        (self.output_dir / f"{stem}.txt").write_text(summary, encoding="utf-8")
+        logger.info("profile for %s written to %s", self.label, self.stats_path)
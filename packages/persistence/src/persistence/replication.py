@@ -0,0 +1,525 @@
+"""Read-only replicas of a ``SimpleStorage`` through snapshot shipping.
+
+``SnapshotPublisher`` runs next to the writer and periodically publishes the
+stored records into a replica directory::
+
+    replica/
+        MANIFEST.json                       current snapshot, increments, seq, published_at
+        snapshot-<seq>.json.gz              every hot record at <seq>
+        increment-<from>-<to>.json.gz       records changed in (from, to]; null = removed
+        sidecars/<dir>/<hash>.npy           array files (content-addressed, copied once)
+        archive/                            copy of the cold tier
+
+Snapshot and increment files are never modified once written and the
+manifest is replaced atomically, so any number of ``ReadOnlyStorage``
+instances (in other processes or on other nodes sharing the directory) can
+read them without locks or coordination with the writer. A reader checks
+the manifest at most every ``check_interval`` seconds, so the data it serves
+is at most ``publish interval + check_interval`` old while the publisher runs.
+"""
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .archive import ArchiveStore
+from .change_feed import ARCHIVE, DELETE, SAVE, ChangeEvent, ChangeFeedGap
+from .codecs import CodecRegistry, SidecarStore, sidecar_refs
+from .interface import StorageListener
+from .migrations import SCHEMA_VERSION_KEY, MigrationRegistry
+from .models import ProcessData
+from .name_index import NameIndex
+from .simple_storage import SimpleStorage, sidecar_dir_name
+
+logger = logging.getLogger(__name__)
+
+MANIFEST = "MANIFEST.json"
+FORMAT_VERSION = 1
+
+
+class ReadOnlyStorageError(PermissionError):
+    """Raised by write operations of a ``ReadOnlyStorage``."""
+
+
+class StaleReplicaError(Exception):
+    """Raised when the replica was last published longer ago than ``max_staleness``."""
+
+    def __init__(self, staleness: float, max_staleness: float) -> None:
+        super().__init__(f"replica data is {staleness:.1f}s old (limit {max_staleness:.1f}s)")
+        self.staleness = staleness
+        self.max_staleness = max_staleness
+
+
+def write_atomic(path: Path, payload: bytes) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_bytes(payload)
+    os.replace(tmp_path, path)
+
+
+def write_gzip(path: Path, data: Dict[str, Any]) -> None:
+    tmp_path = path.with_name(path.name + ".tmp")
+    with gzip.open(tmp_path, "wb", compresslevel=1) as f:
+        f.write(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+    os.replace(tmp_path, path)
+
+
+def read_gzip(path: Path) -> Dict[str, Any]:
+    with gzip.open(path, "rb") as f:
+        return json.loads(f.read())
+
+
+def _read_manifest(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        return json.loads((path / MANIFEST).read_bytes())
+    except FileNotFoundError:
+        return None
+
+
+def link_or_copy(source: Path, target: Path) -> None:
+    """Hard-link (same file system) or copy ``source`` to ``target`` atomically."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(target.name + ".tmp")
+    tmp_path.unlink(missing_ok=True)
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copy2(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+class SnapshotPublisher:
+    """Publishes snapshots and increments of a ``SimpleStorage`` into a replica directory."""
+
+    def __init__(
+        self,
+        storage: SimpleStorage,
+        replica_path: Path,
+        interval: float = 2.0,
+        snapshot_every: int = 100,
+    ) -> None:
+        """Create a publisher.
+
+        The first ``publish`` always writes a full snapshot.
+
+        Args:
+            storage: Storage to replicate (change tracking must be enabled)
+            replica_path: Directory readers open with ``ReadOnlyStorage``
+            interval: Seconds between publishes when started in the background
+            snapshot_every: Write a new full snapshot (and drop the increments) after this many increments
+        """
+        if storage.change_feed is None:
+            raise ValueError("replication needs a storage with change tracking")
+        self.storage = storage
+        self.path = Path(replica_path)
+        self.interval = interval
+        self.snapshot_every = snapshot_every
+        self.published_total = 0
+        self._manifest: Optional[Dict[str, Any]] = None
+        # 前回の世代までは読み込み中のリーダーがいる可能性があるので残す
+        self._previous_files: Set[str] = set()
+        self._sidecar_garbage: Set[str] = set()
+        self._archive_index_mtime: Optional[int] = None
+        # アーカイブ済みプロセスが参照する配列ファイル (全体スナップショット時の削除対象から外す)
+        self._archive_sidecars: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def seq(self) -> int:
+        """Sequence number of the latest published change (0 before the first publish)."""
+        return self._manifest["seq"] if self._manifest is not None else 0
+
+    def publish(self) -> int:
+        """Publish the changes since the previous publish (or a full snapshot).
+
+        The manifest is rewritten even when nothing changed, so readers can
+        tell a quiet writer from a stopped publisher.
+
+        Returns:
+            Number of processes written (all hot processes for a full snapshot)
+        """
+        with self._lock:
+            self.path.mkdir(parents=True, exist_ok=True)
+            manifest = self._manifest
+            if manifest is None:
+                previous = _read_manifest(self.path)
+                if previous is not None:
+                    self._previous_files = self._files_of(previous)
+            full = manifest is None or len(manifest["increments"]) >= self.snapshot_every
+            records: Dict[str, Optional[Dict[str, Any]]] = {}
+            seq = self.seq
+            if not full:
+                try:
+                    seq, records = self.storage.snapshot_records(since=self.seq)
+                except ChangeFeedGap:
+                    full = True
+            if full:
+                seq, records = self.storage.snapshot_records()
+
+            # 本体より先に配列ファイルとアーカイブをコピーする (マニフェストが参照する前に揃える)
+            hot_sidecars = self._sidecar_files(records.items())
+            self._ship_sidecars(hot_sidecars)
+            self._ship_archive()
+
+            if full:
+                name = f"snapshot-{seq:012d}.json.gz"
+                write_gzip(self.path / name, {"seq": seq, "records": records})
+                manifest = {"format": FORMAT_VERSION, "snapshot": name, "snapshot_seq": seq, "increments": []}
+            elif records:
+                assert manifest is not None
+                name = f"increment-{manifest['seq']:012d}-{seq:012d}.json.gz"
+                write_gzip(self.path / name, {"from": manifest["seq"], "seq": seq, "records": records})
+                manifest = {**manifest, "increments": [*manifest["increments"], name]}
+            assert manifest is not None
+            manifest = {**manifest, "seq": seq, "published_at": datetime.now().isoformat()}
+            write_atomic(self.path / MANIFEST, json.dumps(manifest, indent=2).encode("utf-8"))
+
+            current_files = self._files_of(manifest)
+            if full:
+                self._prune(current_files | self._previous_files)
+                self._prune_sidecars(hot_sidecars | self._archive_sidecars)
+            self._previous_files = current_files
+            self._manifest = manifest
+            if records:
+                logger.debug("published %s up to seq %d (%d processes)", "snapshot" if full else "increment", seq, len(records))
+            self.published_total += len(records)
+            return len(records)
+
+    @staticmethod
+    def _files_of(manifest: Dict[str, Any]) -> Set[str]:
+        return {manifest["snapshot"], *manifest["increments"]}
+
+    @staticmethod
+    def _sidecar_files(records: Iterable[Tuple[str, Optional[Dict[str, Any]]]]) -> Set[str]:
+        """Sidecar files (relative to ``sidecars/``) referenced by ``records``."""
+        return {
+            f"{sidecar_dir_name(name)}/{ref}"
+            for name, record in records if record is not None
+            for ref in sidecar_refs(record.get("session_data", {}))
+        }
+
+    def _ship_sidecars(self, files: Set[str]) -> None:
+        for relative in files:
+            target = self.path / "sidecars" / relative
+            if target.exists():
+                continue
+            try:
+                link_or_copy(self.storage.sidecar_path / relative, target)
+            except FileNotFoundError:
+                # 直後に上書き保存されて消えた配列: 次の増分が新しいレコードを運ぶ
+                logger.debug("sidecar %s vanished before it was shipped", relative)
+
+    def _prune_sidecars(self, live: Set[str]) -> None:
+        # 全体スナップショット時だけ: 参照されなくなったファイルは1世代待ってから消す
+        root = self.path / "sidecars"
+        existing = {str(path.relative_to(root)) for path in root.glob("*/*.npy")} if root.exists() else set()
+        garbage = existing - live
+        for relative in garbage & self._sidecar_garbage:
+            (root / relative).unlink(missing_ok=True)
+        self._sidecar_garbage = garbage - self._sidecar_garbage
+
+    def _ship_archive(self) -> None:
+        source = self.storage.archive.path
+        index_file = self.storage.archive.index_file
+        try:
+            mtime = index_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime == self._archive_index_mtime:
+            return
+        target = self.path / "archive"
+        index = index_file.read_bytes()
+        segments = {entry["segment"] for entry in json.loads(index).values()}
+        for segment in segments:
+            if not (target / segment).exists():
+                try:
+                    link_or_copy(source / segment, target / segment)
+                except FileNotFoundError:
+                    # 読んだ索引より後に書き換えられた: 次の公開でやり直す
+                    return
+        # アーカイブ済みレコードの配列ファイルも索引より先に揃える
+        self._archive_sidecars = self._sidecar_files(self.storage.archive.records())
+        self._ship_sidecars(self._archive_sidecars)
+        write_atomic(target / "index.json", index)
+        self._archive_index_mtime = mtime
+        for path in target.glob("segment-*.json.gz"):
+            if path.name not in segments:
+                path.unlink(missing_ok=True)
+
+    def _prune(self, keep: Set[str]) -> None:
+        for pattern in ("snapshot-*.json.gz", "increment-*.json.gz"):
+            for path in self.path.glob(pattern):
+                if path.name not in keep:
+                    path.unlink(missing_ok=True)
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="snapshot-publisher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_forever(self) -> None:
+        """Publish every ``interval`` seconds until ``stop`` is called."""
+        self._run()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self.publish()
+            except Exception:
+                logger.exception("publishing the replica failed")
+            self._stop.wait(self.interval)
+
+
+class ReadOnlyStorage:
+    """Serves the processes published by a ``SnapshotPublisher``.
+
+    Provides the read side of ``SimpleStorage`` (including ``data``,
+    listeners, the name index and the archive) so it can back the session
+    manager, ``AggregateView`` or ``StorageMigrator``. Writes raise
+    ``ReadOnlyStorageError``; archived processes are read in place instead
+    of being restored.
+    """
+
+    def __init__(
+        self,
+        replica_path: Path,
+        check_interval: float = 1.0,
+        max_staleness: Optional[float] = None,
+        codecs: Optional[CodecRegistry] = None,
+        migrations: Optional[MigrationRegistry] = None,
+    ) -> None:
+        """Open a replica directory.
+
+        Args:
+            replica_path: Directory written by ``SnapshotPublisher``
+            check_interval: Minimum seconds between checks for a new manifest
+            max_staleness: Raise ``StaleReplicaError`` on reads once the last
+                publish is older than this many seconds (None to always serve)
+            codecs: Codecs of the writer (for values JSON cannot represent)
+            migrations: Schema migrations applied to outdated payloads on read
+        """
+        self.base_path = Path(replica_path)
+        self.check_interval = check_interval
+        self.max_staleness = max_staleness
+        self.codecs = codecs if codecs is not None else CodecRegistry.default()
+        self.migrations = migrations
+        self.sidecar_path = self.base_path / "sidecars"
+        self.data: Dict[str, Dict[str, Any]] = {}
+        self.archive = ArchiveStore(self.base_path / "archive")
+        self.name_index = NameIndex()
+        self._listeners: List[StorageListener] = [self.name_index]
+        self._snapshot: Optional[str] = None
+        self._increments: List[str] = []
+        self._seq = 0
+        self._published_at: Optional[datetime] = None
+        self._manifest_mtime: Optional[int] = None
+        self._archive_mtime: Optional[int] = None
+        self._last_check = float("-inf")
+        self._lock = threading.RLock()
+        self.refresh()
+
+    # --- replication ---
+
+    def refresh(self) -> List[ChangeEvent]:
+        """Apply a newer manifest if one was published.
+
+        Listeners are notified of every process that changed.
+
+        Returns:
+            One event per changed process
+        """
+        with self._lock:
+            self._last_check = time.monotonic()
+            attempts = 3
+            while True:
+                try:
+                    return self._refresh()
+                except FileNotFoundError:
+                    # 読み込み中に古い世代が削除された: マニフェストから読み直す
+                    attempts -= 1
+                    if attempts == 0:
+                        raise
+
+    def _refresh(self) -> List[ChangeEvent]:
+        try:
+            mtime = (self.base_path / MANIFEST).stat().st_mtime_ns
+        except FileNotFoundError:
+            return []
+        if mtime == self._manifest_mtime:
+            return []
+        manifest = _read_manifest(self.base_path)
+        if manifest is None:
+            return []
+        if manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"unsupported replica format {manifest.get('format')}")
+        self._reload_archive()
+
+        increments = manifest["increments"]
+        if manifest["snapshot"] != self._snapshot or increments[:len(self._increments)] != self._increments:
+            records = read_gzip(self.base_path / manifest["snapshot"])["records"]
+            for name in increments:
+                records.update(read_gzip(self.base_path / name)["records"])
+            changed = {
+                name: record for name, record in records.items()
+                if record is not None and (name not in self.data or self.data[name].get("seq") != record.get("seq"))
+            }
+            changed.update({name: None for name in self.data if records.get(name) is None})
+        else:
+            changed = {}
+            for name in increments[len(self._increments):]:
+                changed.update(read_gzip(self.base_path / name)["records"])
+
+        events = []
+        for name, record in changed.items():
+            if record is None:
+                if self.data.pop(name, None) is None:
+                    continue
+                events.append(ChangeEvent(manifest["seq"], name, ARCHIVE if name in self.archive else DELETE))
+            else:
+                self.data[name] = record
+                events.append(ChangeEvent(record.get("seq", manifest["seq"]), name, SAVE))
+        self._snapshot = manifest["snapshot"]
+        self._increments = list(increments)
+        self._seq = manifest["seq"]
+        self._published_at = datetime.fromisoformat(manifest["published_at"])
+        self._manifest_mtime = mtime
+        events.sort(key=lambda event: event.seq)
+        for event in events:
+            self._notify(event.operation, event.process_name, self.data.get(event.process_name))
+        if events:
+            logger.debug("replica advanced to seq %d (%d changes)", self._seq, len(events))
+        return events
+
+    def _reload_archive(self) -> None:
+        try:
+            mtime = self.archive.index_file.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._archive_mtime:
+            self.archive = ArchiveStore(self.base_path / "archive")
+            self._archive_mtime = mtime
+
+    def _maybe_refresh(self) -> None:
+        if time.monotonic() - self._last_check >= self.check_interval:
+            self.refresh()
+        if self.max_staleness is not None:
+            staleness = self.staleness
+            if staleness is not None and staleness > self.max_staleness:
+                raise StaleReplicaError(staleness, self.max_staleness)
+
+    @property
+    def staleness(self) -> Optional[float]:
+        """Seconds since the publisher last wrote the manifest (None before the first publish)."""
+        if self._published_at is None:
+            return None
+        return (datetime.now() - self._published_at).total_seconds()
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the writer's change the replica is at."""
+        self._maybe_refresh()
+        return self._seq
+
+    def reload_if_changed(self) -> List[ChangeEvent]:
+        """Same as ``refresh`` (name kept for the session manager)."""
+        return self.refresh()
+
+    def add_listener(self, listener: StorageListener) -> None:
+        """Register a listener notified of the changes applied by ``refresh``."""
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: StorageListener) -> None:
+        self._listeners.remove(listener)
+
+    def _notify(self, operation: str, process_name: str, record: Optional[Dict[str, Any]]) -> None:
+        for listener in self._listeners:
+            listener.on_change(operation, process_name, record)
+
+    # --- reads ---
+
+    def _decode_record(self, process_name: str, record: Dict[str, Any]) -> ProcessData:
+        sidecars = SidecarStore(self.sidecar_path / sidecar_dir_name(process_name))
+        session_data = self.codecs.decode(record.get("session_data", {}), sidecars)
+        if self.migrations is not None:
+            session_data = self.migrations.upgrade(session_data, record.get(SCHEMA_VERSION_KEY, 0))
+        return session_data
+
+    def _record(self, process_name: str) -> Optional[Dict[str, Any]]:
+        self._maybe_refresh()
+        record = self.data.get(process_name)
+        if record is None:
+            record = self.archive.load(process_name)
+        return record
+
+    def load_process(self, process_name: str) -> Optional[ProcessData]:
+        """Load process session data (hot or archived)."""
+        record = self._record(process_name)
+        return self._decode_record(process_name, record) if record else None
+
+    def export_process(self, process_name: str) -> Optional[Dict[str, Any]]:
+        """Full record (metadata plus decoded session data), as ``SimpleStorage.export_process``."""
+        record = self._record(process_name)
+        if record is None:
+            return None
+        return {
+            "session_data": self._decode_record(process_name, record),
+            "created": record.get("created"),
+            "last_updated": record.get("last_updated"),
+        }
+
+    def list_processes(self) -> List[str]:
+        self._maybe_refresh()
+        return list(self.data.keys())
+
+    def search_processes(self, query: str = "", limit: int = 50) -> List[str]:
+        self._maybe_refresh()
+        return self.name_index.search(query, limit)
+
+    def process_exists(self, process_name: str) -> bool:
+        self._maybe_refresh()
+        return process_name in self.data or process_name in self.archive
+
+    def get_process_info(self, process_name: str) -> Optional[Dict[str, Any]]:
+        self._maybe_refresh()
+        return self.data.get(process_name)
+
+    def list_archived_processes(self) -> List[str]:
+        self._maybe_refresh()
+        return self.archive.list_archived()
+
+    def get_archived_info(self, process_name: str) -> Optional[Dict[str, Any]]:
+        self._maybe_refresh()
+        return self.archive.get_info(process_name)
+
+    def outdated_processes(self, limit: Optional[int] = None) -> List[str]:
+        # 移行は書き込み側で行う
+        return []
+
+    # --- writes ---
+
+    def _read_only(self, *args: Any, **kwargs: Any) -> Any:
+        raise ReadOnlyStorageError(f"{self.base_path} is a read-only replica")
+
+    save_process = _read_only
+    save_process_with_prefix_filter = _read_only
+    update_process = _read_only
+    import_processes = _read_only
+    upgrade_processes = _read_only
+    delete_process = _read_only
+    delete_processes = _read_only
+    restore_process = _read_only
+    archive_idle = _read_only
@@ -0,0 +1,254 @@
+"""Retention rules with per-rule expiry indexes.
+
+Instead of loading every process and comparing dates, each rule keeps a
+min-heap keyed by expiry time that is updated from storage change
+notifications. A sweep only pops the heap entries that are already due.
+"""
+import heapq
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from .change_feed import ARCHIVE, DELETE
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATUS_KEY = "persist_ステータス"
+
+
+@dataclass(frozen=True)
+class RetentionRule:
+    """Delete processes ``max_age`` after their last update.
+
+    When ``statuses`` is given, the rule only applies while the process's
+    status (``session_data[status_key]``) is one of them, e.g. ``{"完了"}``.
+    """
+    max_age: timedelta
+    statuses: Optional[FrozenSet[str]] = None
+    status_key: str = DEFAULT_STATUS_KEY
+    name: str = ""
+
+    @property
+    def label(self) -> str:
+        if self.name:
+            return self.name
+        if self.statuses:
+            return f"{'/'.join(sorted(self.statuses))} > {self.max_age.days}d"
+        return f"idle > {self.max_age.days}d"
+
+    def expiry(self, record: Dict[str, Any]) -> Optional[float]:
+        """Return the expiry timestamp for a stored record, or None if the rule does not apply."""
+        if self.statuses is not None:
+            status = record.get("session_data", {}).get(self.status_key)
+            if status not in self.statuses:
+                return None
+        last_updated = record.get("last_updated")
+        if not last_updated:
+            return None
+        return datetime.fromisoformat(last_updated).timestamp() + self.max_age.total_seconds()
+
+
+class _ExpiryIndex:
+    """Min-heap of (expiry, name) with lazy invalidation of superseded entries."""
+
+    def __init__(self) -> None:
+        self._heap: List[Tuple[float, str]] = []
+        self._current: Dict[str, float] = {}
+
+    def set(self, name: str, expires_at: Optional[float]) -> None:
+        if expires_at is None:
+            self._current.pop(name, None)
+            return
+        if self._current.get(name) == expires_at:
+            return
+        self._current[name] = expires_at
+        heapq.heappush(self._heap, (expires_at, name))
+        # Keep stale entries from piling up on frequently saved processes
+        if len(self._heap) > 2 * len(self._current) + 64:
+            self._heap = [(t, n) for n, t in self._current.items()]
+            heapq.heapify(self._heap)
+
+    def discard(self, name: str) -> None:
+        self._current.pop(name, None)
+
+    def due(self, now: float) -> List[Tuple[float, str]]:
+        """Return live entries with expiry <= now, earliest first (without removing them)."""
+        result = []
+        while self._heap and self._heap[0][0] <= now:
+            entry = heapq.heappop(self._heap)
+            expires_at, name = entry
+            if self._current.get(name) == expires_at:
+                result.append(entry)
+        # Put back live entries; stale ones are dropped for good
+        for entry in result:
+            heapq.heappush(self._heap, entry)
+        return result
+
+    def next_expiry(self) -> Optional[float]:
+        while self._heap:
+            expires_at, name = self._heap[0]
+            if self._current.get(name) == expires_at:
+                return expires_at
+            heapq.heappop(self._heap)
+        return None
+
+    def __len__(self) -> int:
+        return len(self._current)
+
+
+@dataclass
+class ExpiredProcess:
+    process_name: str
+    rule: str
+    expired_at: datetime
+
+
+@dataclass
+class RetentionReport:
+    """Result of a sweep."""
+    dry_run: bool
+    expired: List[ExpiredProcess] = field(default_factory=list)
+    deleted: List[str] = field(default_factory=list)
+
+    def format(self) -> str:
+        """Human readable summary (used by the CLI)."""
+        verb = "Would delete" if self.dry_run else "Deleted"
+        lines = [
+            f"  {verb}: {item.process_name} ({item.rule}, expired {item.expired_at:%Y-%m-%d %H:%M})"
+            for item in self.expired
+            if self.dry_run or item.process_name in self.deleted
+        ]
+        count = len(self.expired) if self.dry_run else len(self.deleted)
+        lines.append(f"{verb} {count} processes")
+        return "\n".join(lines)
+
+
+class RetentionEngine:
+    """Maintains expiry indexes for a storage and deletes expired processes.
+
+    The storage must provide ``add_listener`` (see ``StorageListener``);
+    the indexes are built once from the in-memory metadata and the archive
+    index (without opening segments), then kept up to date from change
+    notifications. Archived processes keep their index entries and are
+    deleted from the archive when they expire.
+    """
+
+    def __init__(
+        self,
+        storage: Any,
+        rules: List[RetentionRule],
+        clock: Callable[[], datetime] = datetime.now,
+    ) -> None:
+        self.storage = storage
+        self.rules = list(rules)
+        self.clock = clock
+        self._indexes = [_ExpiryIndex() for _ in self.rules]
+        self._lock = threading.RLock()
+        self._build()
+        storage.add_listener(self)
+
+    def _build(self) -> None:
+        with self._lock:
+            for name, record in self.storage.data.items():
+                self._index(name, record)
+            # アーカイブ済みは索引のメタデータと fields (ステータス) から作る
+            infos = {name: self.storage.get_archived_info(name) or {} for name in self.storage.list_archived_processes()}
+            status_keys = {rule.status_key for rule in self.rules if rule.statuses is not None}
+            # fields のない古い索引や、索引にないステータスキーのときだけセグメントを読む
+            if any(not status_keys <= set(info.get("fields", {})) for info in infos.values()):
+                records = dict(self.storage.archive.records())
+            else:
+                records = {}
+            for name, info in infos.items():
+                record = records.get(name) or {"last_updated": info.get("last_updated"), "session_data": info.get("fields", {})}
+                self._index(name, record)
+
+    def _index(self, process_name: str, record: Dict[str, Any]) -> None:
+        for rule, index in zip(self.rules, self._indexes):
+            index.set(process_name, rule.expiry(record))
+
+    def on_change(self, operation: str, process_name: str, record: Optional[Dict[str, Any]]) -> None:
+        """StorageListener hook."""
+        with self._lock:
+            if operation == ARCHIVE:
+                return
+            if operation == DELETE or record is None:
+                for index in self._indexes:
+                    index.discard(process_name)
+            else:
+                self._index(process_name, record)
+
+    def expired(self, now: Optional[datetime] = None) -> List[ExpiredProcess]:
+        """List processes whose expiry has passed (earliest rule match per process)."""
+        now_ts = (now or self.clock()).timestamp()
+        found: Dict[str, ExpiredProcess] = {}
+        with self._lock:
+            for rule, index in zip(self.rules, self._indexes):
+                for expires_at, name in index.due(now_ts):
+                    expired_at = datetime.fromtimestamp(expires_at)
+                    if name not in found or expired_at < found[name].expired_at:
+                        found[name] = ExpiredProcess(name, rule.label, expired_at)
+        return sorted(found.values(), key=lambda item: item.expired_at)
+
+    def sweep(self, now: Optional[datetime] = None, dry_run: bool = False) -> RetentionReport:
+        """Delete expired processes.
+
+        Args:
+            now: Reference time (defaults to the clock)
+            dry_run: Only report what would be deleted
+
+        Returns:
+            RetentionReport describing expired and deleted processes
+        """
+        report = RetentionReport(dry_run=dry_run, expired=self.expired(now))
+        if dry_run:
+            return report
+        for item in report.expired:
+            if self.storage.delete_process(item.process_name):
+                report.deleted.append(item.process_name)
+                logger.info("retention: deleted %s (%s)", item.process_name, item.rule)
+        return report
+
+    def next_expiry(self) -> Optional[datetime]:
+        """Earliest upcoming expiry across all rules."""
+        with self._lock:
+            times = [t for t in (index.next_expiry() for index in self._indexes) if t is not None]
+        return datetime.fromtimestamp(min(times)) if times else None
+
+    def __len__(self) -> int:
+        """Number of processes tracked by at least one rule."""
+        names = set()
+        for index in self._indexes:
+            names.update(index._current)
+        return len(names)
+
+
+class RetentionSweeper:
+    """Runs ``engine.sweep()`` periodically in a daemon thread."""
+
+    def __init__(self, engine: RetentionEngine, interval: float = 3600.0) -> None:
+        self.engine = engine
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="retention-sweeper", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.engine.sweep()
+            except Exception:
+                logger.exception("retention sweep failed")
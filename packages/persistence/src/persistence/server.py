@@ -0,0 +1,446 @@
+"""Storage server and pooled client so several app processes share one store.
+
+``StorageServer`` owns a backend (e.g. ``SimpleStorage``) and serves its
+operations over a Unix socket or localhost TCP. ``RemoteStorage`` is a
+client implementing the same methods, so it can be handed to
+``StreamlitSessionManager`` in place of a local storage.
+
+Wire format: each message is a 4-byte big-endian length followed by UTF-8
+JSON. A request is ``{"id", "op", "args", "kwargs"}`` (or ``{"batch": [...]}``
+for several requests in one round trip); the response carries ``result`` or
+``error``. Values are passed through a ``CodecRegistry`` without sidecars, so
+datetimes, Decimals etc. survive the trip; array values are not supported
+over the wire. Only the standard library is used.
+"""
+import json
+import logging
+import socket
+import socketserver
+import struct
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple, Union
+
+from .change_feed import ChangeEvent, ChangeFeedGap
+from .codecs import CodecRegistry
+from .models import ProcessData
+
+logger = logging.getLogger(__name__)
+
+Address = Union[str, Path, Tuple[str, int]]
+
+_HEADER = struct.Struct(">I")
+MAX_MESSAGE_BYTES = 64 * 1024 * 1024
+
+# サーバーが受け付ける操作 (バックエンドのメソッド名)
+OPERATIONS = frozenset({
+    "save_process",
+    "save_process_with_prefix_filter",
+    "update_process",
+    "load_process",
+    "list_processes",
+    "search_processes",
+    "delete_process",
+    "process_exists",
+    "get_process_info",
+    "list_archived_processes",
+    "get_archived_info",
+    "restore_process",
+    "changes_since",
+    "last_seq",
+})
+
+_ERROR_TYPES = {
+    "ValueError": ValueError,
+    "KeyError": KeyError,
+    "TypeError": TypeError,
+}
+
+
+class StorageServerError(RuntimeError):
+    """Raised by the client for server-side failures without a matching local exception type."""
+
+
+def parse_address(spec: str) -> Address:
+    """Parse ``"unix:/path/to.sock"`` or ``"host:port"`` into a socket address."""
+    if spec.startswith("unix:"):
+        return spec[len("unix:"):]
+    host, _, port = spec.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"invalid storage server address '{spec}' (expected host:port or unix:/path)")
+    return (host, int(port))
+
+
+def _send(sock: socket.socket, message: Any) -> None:
+    payload = json.dumps(message, ensure_ascii=False).encode("utf-8")
+    sock.sendall(_HEADER.pack(len(payload)) + payload)
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1024 * 1024))
+        if not chunk:
+            raise ConnectionError("connection closed")
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+def _recv(sock: socket.socket) -> Any:
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if size > MAX_MESSAGE_BYTES:
+        raise ConnectionError(f"message of {size} bytes exceeds the limit")
+    return json.loads(_recv_exact(sock, size))
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    """One thread per connection; requests on a connection are served in order."""
+
+    def handle(self) -> None:
+        storage_server: "StorageServer" = self.server.storage_server  # type: ignore[attr-defined]
+        with storage_server._connections_lock:
+            storage_server._connections.add(self.request)
+        try:
+            self._serve(storage_server)
+        finally:
+            with storage_server._connections_lock:
+                storage_server._connections.discard(self.request)
+
+    def _serve(self, storage_server: "StorageServer") -> None:
+        while True:
+            try:
+                request = _recv(self.request)
+            except (ConnectionError, OSError):
+                return
+            if "batch" in request:
+                response: Any = {"batch": [storage_server.dispatch(item) for item in request["batch"]]}
+            else:
+                response = storage_server.dispatch(request)
+            try:
+                _send(self.request, response)
+            except OSError:
+                return
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class _UnixServer(socketserver.ThreadingUnixStreamServer):  # type: ignore[name-defined]
+        daemon_threads = True
+
+
+class StorageServer:
+    """Serves a storage backend to ``RemoteStorage`` clients."""
+
+    def __init__(self, backend: Any, address: Address = ("127.0.0.1", 0), codecs: Optional[CodecRegistry] = None) -> None:
+        """Bind the server socket (call ``start()`` or ``serve_forever()`` to serve).
+
+        Args:
+            backend: Storage to serve (e.g. SimpleStorage)
+            address: ``(host, port)`` for TCP (port 0 picks a free port) or a Unix socket path
+            codecs: Codecs for values on the wire (defaults to the built-in ones)
+        """
+        self.backend = backend
+        self.codecs = codecs if codecs is not None else CodecRegistry.default()
+        if isinstance(address, tuple):
+            self._server: socketserver.BaseServer = _TCPServer(address, _Handler)
+        else:
+            path = Path(address)
+            path.unlink(missing_ok=True)
+            self._server = _UnixServer(str(path), _Handler)
+        self._server.storage_server = self  # type: ignore[attr-defined]
+        self._thread: Optional[threading.Thread] = None
+        self._connections: Set[socket.socket] = set()
+        self._connections_lock = threading.Lock()
+
+    @property
+    def address(self) -> Address:
+        """The bound address (with the actual port for TCP)."""
+        address = self._server.server_address  # type: ignore[attr-defined]
+        return tuple(address[:2]) if isinstance(address, tuple) else address  # type: ignore[return-value]
+
+    def dispatch(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Execute one request and build its response."""
+        request_id = request.get("id")
+        op = request.get("op")
+        try:
+            if op not in OPERATIONS:
+                raise ValueError(f"unsupported operation '{op}'")
+            if op == "last_seq":
+                result: Any = self.backend.last_seq
+            else:
+                args = self.codecs.decode(request.get("args", []))
+                kwargs = self.codecs.decode(request.get("kwargs", {}))
+                result = getattr(self.backend, op)(*args, **kwargs)
+            return {"id": request_id, "result": self.codecs.encode(result)}
+        except ChangeFeedGap as gap:
+            return {"id": request_id, "error": {
+                "type": "ChangeFeedGap", "message": str(gap), "args": [gap.requested, gap.floor, gap.last_seq],
+            }}
+        except Exception as exc:
+            if not isinstance(exc, (ValueError, KeyError, TypeError)):
+                logger.exception("storage server: %s failed", op)
+            return {"id": request_id, "error": {"type": type(exc).__name__, "message": str(exc)}}
+
+    def serve_forever(self, poll_interval: float = 0.1) -> None:
+        """Serve in the calling thread until ``stop()``."""
+        self._server.serve_forever(poll_interval)
+
+    def start(self) -> "StorageServer":
+        """Serve in a daemon thread."""
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self.serve_forever, name="storage-server", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop serving, close the listening socket and drop client connections."""
+        self._server.shutdown()
+        self._server.server_close()
+        with self._connections_lock:
+            connections = list(self._connections)
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        if self._thread is not None:
+            self._thread.join()
+        if not isinstance(self.address, tuple):
+            Path(self.address).unlink(missing_ok=True)
+
+    def __enter__(self) -> "StorageServer":
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+
+class RemoteBatch:
+    """Collects calls and sends them to the server in one round trip.
+
+    Calls are executed in order on the server; ``execute()`` returns their
+    results and raises the first error (after all calls ran).
+    """
+
+    def __init__(self, storage: "RemoteStorage") -> None:
+        self._storage = storage
+        self._requests: List[Dict[str, Any]] = []
+        self.results: List[Any] = []
+
+    def __getattr__(self, op: str) -> Any:
+        if op not in OPERATIONS or op == "last_seq":
+            raise AttributeError(op)
+
+        def record(*args: Any, **kwargs: Any) -> None:
+            self._requests.append(self._storage._request(op, args, kwargs))
+        return record
+
+    def __len__(self) -> int:
+        return len(self._requests)
+
+    def execute(self) -> List[Any]:
+        if not self._requests:
+            return []
+        responses = self._storage._roundtrip({"batch": self._requests})["batch"]
+        self._requests = []
+        self.results = []
+        error: Optional[Exception] = None
+        for response in responses:
+            try:
+                self.results.append(self._storage._result(response))
+            except Exception as exc:
+                self.results.append(exc)
+                error = error or exc
+        if error is not None:
+            raise error
+        return self.results
+
+    def __enter__(self) -> "RemoteBatch":
+        return self
+
+    def __exit__(self, exc_type: Any, *exc_info: Any) -> None:
+        if exc_type is None:
+            self.execute()
+
+
+class RemoteStorage:
+    """Client for ``StorageServer`` with a pool of persistent connections.
+
+    Implements ``StorageInterface`` plus the extra read methods used by
+    ``StreamlitSessionManager``; it is safe to share between threads.
+    """
+
+    def __init__(
+        self,
+        address: Address,
+        pool_size: int = 4,
+        timeout: float = 10.0,
+        codecs: Optional[CodecRegistry] = None,
+    ) -> None:
+        """Create a client (connections are opened lazily).
+
+        Args:
+            address: ``(host, port)`` or Unix socket path of the server
+            pool_size: Maximum number of concurrent connections
+            timeout: Socket timeout in seconds
+            codecs: Codecs for values on the wire (must match the server's)
+        """
+        self.address = address
+        self.timeout = timeout
+        self.codecs = codecs if codecs is not None else CodecRegistry.default()
+        self._idle: List[socket.socket] = []
+        self._idle_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(pool_size)
+        self._next_id = 0
+
+    def _connect(self) -> socket.socket:
+        if isinstance(self.address, tuple):
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        else:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(str(self.address))
+        return sock
+
+    @contextmanager
+    def _connection(self) -> Iterator[Tuple[socket.socket, bool]]:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise TimeoutError("no storage server connection available")
+        try:
+            with self._idle_lock:
+                sock = self._idle.pop() if self._idle else None
+            reused = sock is not None
+            if sock is None:
+                sock = self._connect()
+            try:
+                yield sock, reused
+            except BaseException:
+                sock.close()
+                raise
+            with self._idle_lock:
+                self._idle.append(sock)
+        finally:
+            self._slots.release()
+
+    def _roundtrip(self, message: Dict[str, Any]) -> Any:
+        for attempt in range(2):
+            try:
+                with self._connection() as (sock, reused):
+                    try:
+                        _send(sock, message)
+                        return _recv(sock)
+                    except (ConnectionError, BrokenPipeError):
+                        # プール中の接続がサーバー再起動などで切れていた場合は1回だけ張り直す
+                        if reused and attempt == 0:
+                            raise _StaleConnection()
+                        raise
+            except _StaleConnection:
+                continue
+        raise ConnectionError("storage server connection failed")  # pragma: no cover
+
+    def _request(self, op: str, args: Any = (), kwargs: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        with self._idle_lock:
+            self._next_id += 1
+            request_id = self._next_id
+        return {
+            "id": request_id,
+            "op": op,
+            "args": self.codecs.encode(list(args)),
+            "kwargs": self.codecs.encode(kwargs or {}),
+        }
+
+    def _result(self, response: Dict[str, Any]) -> Any:
+        error = response.get("error")
+        if error is None:
+            return self.codecs.decode(response.get("result"))
+        if error["type"] == "ChangeFeedGap":
+            raise ChangeFeedGap(*error["args"])
+        raise _ERROR_TYPES.get(error["type"], StorageServerError)(error["message"])
+
+    def _call(self, op: str, *args: Any, **kwargs: Any) -> Any:
+        try:
+            request = self._request(op, args, kwargs)
+        except TypeError as exc:
+            raise ValueError(f"{op}: value cannot be sent to the storage server ({exc})") from exc
+        return self._result(self._roundtrip(request))
+
+    def batch(self) -> RemoteBatch:
+        """Start a batch of calls sent in one round trip."""
+        return RemoteBatch(self)
+
+    def close(self) -> None:
+        """Close pooled connections."""
+        with self._idle_lock:
+            idle, self._idle = self._idle, []
+        for sock in idle:
+            sock.close()
+
+    # StorageInterface
+    def save_process(self, process_name: str, session_data: ProcessData) -> None:
+        self._call("save_process", process_name, session_data)
+
+    def load_process(self, process_name: str) -> Optional[ProcessData]:
+        return self._call("load_process", process_name)
+
+    def list_processes(self) -> List[str]:
+        return self._call("list_processes")
+
+    def delete_process(self, process_name: str) -> bool:
+        return self._call("delete_process", process_name)
+
+    def process_exists(self, process_name: str) -> bool:
+        return self._call("process_exists", process_name)
+
+    # SimpleStorage extensions
+    def save_process_with_prefix_filter(
+        self, process_name: str, session_data: ProcessData, persist_prefix: str = "persist_"
+    ) -> None:
+        filtered = {}
+        for key, value in session_data.items():
+            if key.startswith(persist_prefix):
+                try:
+                    self.codecs.encode(value)
+                    filtered[key] = value
+                except TypeError:
+                    logger.debug("skipping %r of process %r: cannot be sent to the server", key, process_name)
+        self._call("save_process_with_prefix_filter", process_name, filtered, persist_prefix)
+
+    def update_process(self, process_name: str, updates: ProcessData) -> None:
+        self._call("update_process", process_name, updates)
+
+    def search_processes(self, query: str = "", limit: int = 50) -> List[str]:
+        return self._call("search_processes", query, limit)
+
+    def get_process_info(self, process_name: str) -> Optional[Dict[str, Any]]:
+        return self._call("get_process_info", process_name)
+
+    def list_archived_processes(self) -> List[str]:
+        return self._call("list_archived_processes")
+
+    def get_archived_info(self, process_name: str) -> Optional[Dict[str, Any]]:
+        return self._call("get_archived_info", process_name)
+
+    def restore_process(self, process_name: str) -> bool:
+        return self._call("restore_process", process_name)
+
+    @property
+    def last_seq(self) -> int:
+        return self._call("last_seq")
+
+    def changes_since(self, seq: int) -> List[ChangeEvent]:
+        return [ChangeEvent(*event) for event in self._call("changes_since", seq)]
+
+    def reload_if_changed(self) -> List[ChangeEvent]:
+        """No-op: the server holds the only copy of the data."""
+        return []
+
+
+class _StaleConnection(Exception):
+    pass
@@ -0,0 +1,153 @@
+"""Offloading of idle sessions' persisted values out of server memory.
+
+Every open tab keeps its process's persisted values in session state, on
+top of the copy held by the storage. ``SessionOffloader`` records when each
+session was last active; sessions idle past ``idle_after`` have their
+persisted keys dropped (``StreamlitSessionManager.release_session``), and
+the least recently active sessions are released first while the
+estimated resident size exceeds ``max_resident_bytes``. The next
+interaction reloads the data from storage through ``sync_session``.
+
+Sweeps run on other sessions' threads, so releasing never writes: a
+session holding unsaved edits stays resident until its own rerun saves
+them. Sessions whose tab was closed (``is_active``) are forgotten without
+touching their state.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, List, MutableMapping, Optional, Tuple
+
+from .codecs import estimate_size
+from .streamlit_helpers import StreamlitSessionManager
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Resident:
+    session_state: MutableMapping[str, Any]
+    last_active: float
+    size: int
+
+
+class SessionOffloader:
+    """Releases the persisted values of idle sessions (least recently active first)."""
+
+    def __init__(
+        self,
+        manager: StreamlitSessionManager,
+        idle_after: float = 600.0,
+        max_resident_bytes: Optional[int] = None,
+        check_interval: float = 5.0,
+        persist_prefix: str = "persist_",
+        clock: Callable[[], float] = time.monotonic,
+        is_active: Optional[Callable[[str], bool]] = None,
+    ) -> None:
+        """Create an offloader.
+
+        Args:
+            manager: Session manager used to flush and release sessions
+            idle_after: Seconds without activity after which a session is released
+            max_resident_bytes: Cap on the estimated size of persisted values held
+                by all tracked sessions (None for no cap)
+            check_interval: Minimum seconds between sweeps triggered by ``touch``
+            persist_prefix: Prefix of persisted keys
+            clock: Time source (seconds)
+            is_active: Whether a session id still belongs to an open session;
+                closed ones are dropped from tracking at each sweep
+        """
+        self.manager = manager
+        self.idle_after = idle_after
+        self.max_resident_bytes = max_resident_bytes
+        self.check_interval = check_interval
+        self.persist_prefix = persist_prefix
+        self.clock = clock
+        self.is_active = is_active
+        self.released_total = 0
+        # 最近アクティブになったセッションほど後ろ (LRU 順)
+        self._sessions: "OrderedDict[str, _Resident]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._last_check = clock()
+
+    def _session_size(self, session_state: MutableMapping[str, Any]) -> int:
+        return sum(
+            estimate_size(session_state[key])
+            for key in self.manager.persisted_keys(session_state, self.persist_prefix)
+        )
+
+    def touch(self, session_id: str, session_state: MutableMapping[str, Any]) -> None:
+        """Record activity of a session (call on every rerun, after its data is loaded).
+
+        Also runs a sweep when ``check_interval`` has passed since the last one.
+        """
+        resident = _Resident(session_state, self.clock(), self._session_size(session_state))
+        with self._lock:
+            self._sessions[session_id] = resident
+            self._sessions.move_to_end(session_id)
+        if self.clock() - self._last_check >= self.check_interval:
+            self.sweep()
+
+    def forget(self, session_id: str) -> None:
+        """Stop tracking a session (e.g. when it is closed) without releasing it."""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    @property
+    def resident_bytes(self) -> int:
+        """Estimated size of the persisted values held by tracked sessions."""
+        with self._lock:
+            return sum(resident.size for resident in self._sessions.values())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+
+    def sweep(self) -> List[str]:
+        """Release idle sessions, then the least recently active ones over the size cap.
+
+        The most recently active session is never released for the size cap.
+
+        Returns:
+            Ids of the released sessions
+        """
+        now = self.clock()
+        self._last_check = now
+        victims: List[Tuple[str, _Resident]] = []
+        with self._lock:
+            if self.is_active is not None:
+                # 閉じられたタブの状態は参照を手放すだけ (保存も解放もしない)
+                for session_id in [sid for sid in self._sessions if not self.is_active(sid)]:
+                    del self._sessions[session_id]
+            for session_id, resident in list(self._sessions.items()):
+                if now - resident.last_active >= self.idle_after:
+                    victims.append((session_id, self._sessions.pop(session_id)))
+            if self.max_resident_bytes is not None:
+                total = sum(resident.size for resident in self._sessions.values())
+                while total > self.max_resident_bytes and len(self._sessions) > 1:
+                    session_id, resident = self._sessions.popitem(last=False)
+                    total -= resident.size
+                    victims.append((session_id, resident))
+        released = []
+        kept = []
+        for session_id, resident in victims:
+            try:
+                if self.manager.release_session(resident.session_state, self.persist_prefix):
+                    released.append(session_id)
+                elif self.manager.loaded_process(resident.session_state) is not None:
+                    # 未保存の編集があるセッションは残し、次の sweep で改めて確認する
+                    kept.append((session_id, resident))
+            except Exception:
+                # 閉じられたセッション等: 追跡をやめるだけにする
+                logger.exception("failed to release session %s", session_id)
+        with self._lock:
+            for session_id, resident in reversed(kept):
+                if session_id not in self._sessions:
+                    self._sessions[session_id] = resident
+                    self._sessions.move_to_end(session_id, last=False)
+        self.released_total += len(released)
+        if released:
+            logger.debug("released %d idle sessions", len(released))
+        return released
@@ -1,10 +1,31 @@
+import hashlib
 import json
+import logging
+import os
+import shutil
+import threading
+import time
 from pathlib import Path
-from typing import Dict, List, Any, Optional
-from datetime import datetime
+from typing import Dict, Iterable, List, Any, Optional, Tuple
+from datetime import datetime, timedelta
 
+from .archive import ArchiveStore
+from .codecs import CodecRegistry, SidecarStore, sidecar_refs
+from .compact import CompactRecord, dump_records, plain
+from .interface import StorageListener
+from .change_feed import ARCHIVE, DELETE, RESTORE, SAVE, ChangeEvent, ChangeFeed, ChangeFeedGap
+from .name_index import NameIndex
+from .metrics import BYTES_READ_TOTAL, BYTES_WRITTEN_TOTAL, MetricsSink
+from .migrations import SCHEMA_VERSION_KEY, MigrationRegistry
 from .models import JsonSerializable, ProcessData
 
+logger = logging.getLogger(__name__)
+
+
+def sidecar_dir_name(process_name: str) -> str:
+    """Name of the directory holding a process's array files (under ``sidecars/``)."""
+    return hashlib.sha1(process_name.encode("utf-8")).hexdigest()[:16]
+
 
 class SimpleStorage:
     """
@@ -14,25 +35,74 @@ class SimpleStorage:
     - value: session state data (dict)
     """
     
-    def __init__(self, base_path: Path) -> None:
+    def __init__(
+        self,
+        base_path: Path,
+        metrics: Optional[MetricsSink] = None,
+        track_changes: bool = True,
+        archive_after: Optional[timedelta] = None,
+        archive_check_interval: float = 3600.0,
+        codecs: Optional[CodecRegistry] = None,
+        migrations: Optional[MigrationRegistry] = None,
+        compact: bool = True,
+    ) -> None:
         self.base_path = Path(base_path)
+        self.metrics = metrics
         self.base_path.mkdir(parents=True, exist_ok=True)
         self.data_file = self.base_path / "processes.json"
         self.data: Dict[str, Dict[str, Any]] = {}
+        # 保存・削除ごとにシーケンス番号を振る変更フィード (changes.log)
+        self.change_feed: Optional[ChangeFeed] = (
+            ChangeFeed(self.base_path / "changes.log") if track_changes else None
+        )
+        self._seen_seq = self.change_feed.last_seq if self.change_feed is not None else 0
+        # 一定期間更新のないプロセスを退避する圧縮アーカイブ (コールド層)
+        self.archive = ArchiveStore(self.base_path / "archive")
+        self.archive_after = archive_after
+        self.archive_check_interval = archive_check_interval
+        self._last_archive_check = time.monotonic()
+        # JSON にできない値 (datetime / Decimal / ndarray / DataFrame 等) の変換。配列は sidecars/ に保存
+        self.codecs = codecs if codecs is not None else CodecRegistry.default()
+        self.sidecar_path = self.base_path / "sidecars"
+        # ペイロードのスキーマ移行 (読み込み時に変換し、次の保存で書き戻す)
+        self.migrations = migrations
+        # メモリ上のレコードを CompactRecord (__slots__・数値の時刻・小さいペイロードは JSON 文字列) で保持する
+        self.compact = compact
+        self._listeners: List[StorageListener] = []
+        # 書き込み系操作を直列化 (バックグラウンドのスイーパー等と共有するため)
+        self._lock = threading.RLock()
         self._load_data()
+        # プロセス名の検索用インデックス (保存・削除の通知で更新)
+        self.name_index = NameIndex()
+        self.name_index.rebuild(self.data)
+        self.add_listener(self.name_index)
+        if self.archive_after is not None:
+            self.archive_idle()
     
     def _load_data(self) -> None:
         """Load all process data from file."""
         if self.data_file.exists():
-            with open(self.data_file, 'r', encoding='utf-8') as f:
-                self.data = json.load(f)
+            raw = self.data_file.read_bytes()
+            if self.metrics is not None:
+                self.metrics.increment(BYTES_READ_TOTAL, len(raw))
+            self.data = json.loads(raw)
+            if self.compact:
+                self.data = {name: CompactRecord(record) for name, record in self.data.items()}
         else:
             self.data = {}
     
     def _save_data(self) -> None:
         """Save all process data to file."""
-        with open(self.data_file, 'w', encoding='utf-8') as f:
-            json.dump(self.data, f, indent=2, ensure_ascii=False)
+        if self.compact:
+            payload = dump_records(self.data)
+        else:
+            payload = json.dumps(self.data, indent=2, ensure_ascii=False).encode('utf-8')
+        # 他プロセス (バックアップ・レプリカ公開等) が書きかけのファイルを読まないよう置き換えで書く
+        tmp_path = self.data_file.with_name(self.data_file.name + ".tmp")
+        tmp_path.write_bytes(payload)
+        os.replace(tmp_path, self.data_file)
+        if self.metrics is not None:
+            self.metrics.increment(BYTES_WRITTEN_TOTAL, len(payload))
     
     def _validate_data(self, data: ProcessData) -> bool:
         """Validate that all values are JSON serializable."""
@@ -42,20 +112,132 @@ class SimpleStorage:
         except (TypeError, ValueError):
             return False
     
-    def save_process(self, process_name: str, session_data: ProcessData) -> None:
-        """Save process session state data."""
-        if not self._validate_data(session_data):
+    def _sidecars(self, process_name: str) -> SidecarStore:
+        return SidecarStore(self.sidecar_path / sidecar_dir_name(process_name))
+    
+    def _encode(self, process_name: str, session_data: ProcessData) -> Dict[str, Any]:
+        try:
+            encoded = self.codecs.encode(dict(session_data), self._sidecars(process_name))
+        except (TypeError, ValueError):
+            raise ValueError(f"Session data contains non-serializable values for process '{process_name}'")
+        if not self._validate_data(encoded):
             raise ValueError(f"Session data contains non-serializable values for process '{process_name}'")
+        return encoded
+    
+    def add_listener(self, listener: StorageListener) -> None:
+        """Register a listener notified after every save/delete/archive/restore."""
+        self._listeners.append(listener)
+    
+    def remove_listener(self, listener: StorageListener) -> None:
+        """Unregister a listener."""
+        self._listeners.remove(listener)
+    
+    def _notify(self, operation: str, process_name: str, record: Optional[Dict[str, Any]] = None) -> None:
+        for listener in self._listeners:
+            listener.on_change(operation, process_name, record)
+    
+    def save_process(self, process_name: str, session_data: ProcessData) -> None:
+        """Save process session state data.
         
+        Values JSON cannot represent are stored through ``codecs``.
+        
+        Raises:
+            ValueError: If a value has no codec
+        """
+        with self._lock:
+            self._save_record(process_name, self._encode(process_name, session_data))
+        self._maybe_archive_idle()
+    
+    def _save_record(self, process_name: str, session_data: ProcessData) -> None:
+        process_data = self._put_record(process_name, session_data)
+        self._save_data()
+        self._after_save(process_name, process_data)
+
+    def _put_record(
+        self,
+        process_name: str,
+        session_data: ProcessData,
+        created: Optional[str] = None,
+        last_updated: Optional[str] = None,
+    ) -> Dict[str, Any]:
         # Add metadata
+        previous = self.data.get(process_name)
+        if previous is None and process_name in self.archive:
+            # 新しい保存がアーカイブ版を置き換える
+            previous = self.archive.get_info(process_name)
+            self.archive.remove(process_name)
         process_data = {
             "session_data": session_data,
-            "last_updated": datetime.now().isoformat(),
-            "created": self.data.get(process_name, {}).get("created", datetime.now().isoformat())
+            "last_updated": last_updated or datetime.now().isoformat(),
+            "created": created or (previous or {}).get("created", datetime.now().isoformat())
         }
+        if self.migrations is not None:
+            process_data[SCHEMA_VERSION_KEY] = self.migrations.current_version
+        if self.change_feed is not None:
+            process_data["seq"] = self.change_feed.append(SAVE, process_name)
+        if self.compact:
+            process_data = CompactRecord(process_data)
         
         self.data[process_name] = process_data
-        self._save_data()
+        return process_data
+
+    def _after_save(self, process_name: str, process_data: Dict[str, Any]) -> None:
+        # 参照されなくなった配列ファイルを削除
+        self._sidecars(process_name).prune(sidecar_refs(process_data["session_data"]))
+        self._notify(SAVE, process_name, process_data)
+
+    def import_processes(self, records: Dict[str, Dict[str, Any]]) -> None:
+        """Save several processes at once, keeping their ``created`` / ``last_updated``.
+        
+        Used to move processes between storages (e.g. partition rebalancing);
+        ``processes.json`` is written once for the whole batch.
+        
+        Args:
+            records: ``{name: {"session_data": ..., "created": ..., "last_updated": ...}}``
+                with decoded session data (as returned by ``export_process``)
+        """
+        with self._lock:
+            written = {}
+            for name, record in records.items():
+                encoded = self._encode(name, record.get("session_data", {}))
+                written[name] = self._put_record(name, encoded, record.get("created"), record.get("last_updated"))
+            if written:
+                self._save_data()
+            for name, process_data in written.items():
+                self._after_save(name, process_data)
+
+    def export_process(self, process_name: str) -> Optional[Dict[str, Any]]:
+        """Full record (metadata plus decoded session data) of a hot or archived process."""
+        with self._lock:
+            record = self.data.get(process_name)
+            if record is None:
+                record = self.archive.load(process_name)
+            if record is None:
+                return None
+            return {
+                "session_data": self._decode_record(process_name, record),
+                "created": record.get("created"),
+                "last_updated": record.get("last_updated"),
+            }
+
+    def update_process(self, process_name: str, updates: ProcessData) -> None:
+        """Merge ``updates`` into the stored session data, leaving other keys untouched.
+        
+        Args:
+            process_name: Name of the process to update (created if missing)
+            updates: Keys and values to overwrite
+        """
+        with self._lock:
+            encoded = self._encode(process_name, updates)
+            if process_name not in self.data:
+                self.restore_process(process_name)
+            record = self.data.get(process_name, {})
+            current = record.get("session_data", {})
+            if self._is_outdated(record):
+                # 古い形のデータへ差分を混ぜないよう、先に移行する
+                current = self._encode(process_name, self._decode_record(process_name, record))
+            self._save_record(process_name, {**current, **encoded})
+        self._maybe_archive_idle()
 
     def save_process_with_prefix_filter(
         self, 
@@ -65,46 +247,276 @@ class SimpleStorage:
     ) -> None:
         """Save session data to storage, filtering by persist prefix.
         
+        Values without a codec are skipped.
+        
         Args:
             process_name: Name of the process to save
             session_data: Dictionary containing all session data
             persist_prefix: Prefix to filter keys for persistence (default: "persist_")
         """
-        filtered_data = {}
-        for key, value in session_data.items():
-            if key.startswith(persist_prefix):
-                try:
-                    json.dumps(value)  # Test if serializable
-                    filtered_data[key] = value
-                except (TypeError, ValueError):
-                    # Skip non-serializable values
-                    pass
-        
-        self.save_process(process_name, filtered_data)
+        sidecars = self._sidecars(process_name)
+        encoded = {}
+        with self._lock:
+            for key, value in session_data.items():
+                if key.startswith(persist_prefix):
+                    try:
+                        item = self.codecs.encode(value, sidecars)
+                        json.dumps(item)  # Test if serializable
+                        encoded[key] = item
+                    except (TypeError, ValueError):
+                        # Skip values no codec can handle
+                        logger.debug("skipping %r of process %r: no codec for %s", key, process_name, type(value).__name__)
+            self._save_record(process_name, encoded)
+        self._maybe_archive_idle()
     
     def load_process(self, process_name: str) -> Optional[ProcessData]:
-        """Load process session state data."""
+        """Load process session state data (archived processes are rehydrated transparently)."""
         process_data = self.data.get(process_name)
+        if process_data is None and self.restore_process(process_name):
+            process_data = self.data.get(process_name)
         if process_data:
-            return process_data.get("session_data", {})
+            return self._decode_record(process_name, process_data)
         return None
     
+    def _is_outdated(self, record: Dict[str, Any]) -> bool:
+        return self.migrations is not None and self.migrations.needs_upgrade(record.get(SCHEMA_VERSION_KEY, 0))
+    
+    def _decode_record(self, process_name: str, record: Dict[str, Any]) -> ProcessData:
+        session_data = self.codecs.decode(record.get("session_data", {}), self._sidecars(process_name))
+        if self.migrations is not None:
+            session_data = self.migrations.upgrade(session_data, record.get(SCHEMA_VERSION_KEY, 0))
+        return session_data
+    
+    def outdated_processes(self, limit: Optional[int] = None) -> List[str]:
+        """Names of hot processes stored with an older schema version."""
+        names = [name for name, record in list(self.data.items()) if self._is_outdated(record)]
+        return names if limit is None else names[:limit]
+    
+    def upgrade_processes(self, process_names: Iterable[str]) -> List[str]:
+        """Migrate and rewrite outdated processes, writing ``processes.json`` once.
+        
+        ``created`` / ``last_updated`` are kept, so idle and retention
+        timers are not reset by the upgrade.
+        
+        Returns:
+            Names of the processes that were upgraded
+        """
+        with self._lock:
+            written = {}
+            for name in process_names:
+                record = self.data.get(name)
+                if record is None or not self._is_outdated(record):
+                    continue
+                encoded = self._encode(name, self._decode_record(name, record))
+                written[name] = self._put_record(name, encoded, record.get("created"), record.get("last_updated"))
+            if written:
+                self._save_data()
+            for name, process_data in written.items():
+                self._after_save(name, process_data)
+            return list(written)
+    
     def list_processes(self) -> List[str]:
         """List all process names."""
         return list(self.data.keys())
     
+    def search_processes(self, query: str = "", limit: int = 50) -> List[str]:
+        """Find processes whose name contains ``query``, most recently updated first.
+        
+        Args:
+            query: Substring to look for (case-insensitive); empty returns the most recent
+            limit: Maximum number of names to return
+        """
+        return self.name_index.search(query, limit)
+    
     def delete_process(self, process_name: str) -> bool:
-        """Delete a process."""
-        if process_name in self.data:
-            del self.data[process_name]
-            self._save_data()
-            return True
-        return False
+        """Delete a process (hot or archived)."""
+        return self.delete_processes([process_name]) == 1
+    
+    def delete_processes(self, process_names: Iterable[str]) -> int:
+        """Delete several processes (hot or archived), writing ``processes.json`` once.
+        
+        Returns:
+            Number of processes that existed and were deleted
+        """
+        with self._lock:
+            deleted = []
+            for process_name in process_names:
+                archived = self.archive.remove(process_name)
+                if self.data.pop(process_name, None) is None and not archived:
+                    continue
+                if self.change_feed is not None:
+                    self.change_feed.append(DELETE, process_name)
+                shutil.rmtree(self._sidecars(process_name).path, ignore_errors=True)
+                deleted.append(process_name)
+            if deleted:
+                self._save_data()
+            for process_name in deleted:
+                self._notify(DELETE, process_name)
+            return len(deleted)
     
     def get_process_info(self, process_name: str) -> Optional[Dict[str, Any]]:
         """Get process metadata (creation date, last updated)."""
-        return self.data.get(process_name)
+        return plain(self.data.get(process_name))
     
     def process_exists(self, process_name: str) -> bool:
-        """Check if process exists."""
-        return process_name in self.data
\ No newline at end of file
+        """Check if process exists (hot or archived)."""
+        return process_name in self.data or process_name in self.archive
+    
+    @staticmethod
+    def _last_activity(record: Dict[str, Any]) -> datetime:
+        # 復元直後に再アーカイブされないよう restored_at も考慮する
+        return datetime.fromisoformat(max(record.get("last_updated", ""), record.get("restored_at", "")))
+    
+    def archive_idle(self, older_than: Optional[timedelta] = None, now: Optional[datetime] = None) -> List[str]:
+        """Move processes not updated for ``older_than`` into the compressed archive.
+        
+        Args:
+            older_than: Idle period (defaults to ``archive_after``)
+            now: Reference time (defaults to the current time)
+            
+        Returns:
+            Names of the archived processes
+        """
+        older_than = older_than if older_than is not None else self.archive_after
+        self._last_archive_check = time.monotonic()
+        if older_than is None:
+            return []
+        cutoff = (now or datetime.now()) - older_than
+        with self._lock:
+            idle = {
+                name: record for name, record in self.data.items()
+                if self._last_activity(record) < cutoff
+            }
+            if not idle:
+                return []
+            self.archive.archive({name: plain(record) for name, record in idle.items()})
+            for name in idle:
+                del self.data[name]
+                if self.change_feed is not None:
+                    self.change_feed.append(ARCHIVE, name)
+            self._save_data()
+            for name in idle:
+                self._notify(ARCHIVE, name)
+            return list(idle)
+    
+    def _maybe_archive_idle(self) -> None:
+        if (
+            self.archive_after is not None
+            and time.monotonic() - self._last_archive_check >= self.archive_check_interval
+        ):
+            self.archive_idle()
+    
+    def restore_process(self, process_name: str) -> bool:
+        """Move an archived process back into the hot store.
+        
+        Returns:
+            True if the process was restored, False if it is not archived
+        """
+        with self._lock:
+            record = self.archive.load(process_name)
+            if record is None:
+                return False
+            record["restored_at"] = datetime.now().isoformat()
+            if self.change_feed is not None:
+                record["seq"] = self.change_feed.append(RESTORE, process_name)
+            if self.compact:
+                record = CompactRecord(record)
+            self.data[process_name] = record
+            self._save_data()
+            self.archive.remove(process_name)
+            self._notify(RESTORE, process_name, record)
+            return True
+    
+    def list_archived_processes(self) -> List[str]:
+        """List names of archived (cold) processes."""
+        return self.archive.list_archived()
+    
+    def get_archived_info(self, process_name: str) -> Optional[Dict[str, Any]]:
+        """Get created / last_updated / archived_at of an archived process."""
+        return self.archive.get_info(process_name)
+    
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the latest save/delete (0 when change tracking is off)."""
+        return self.change_feed.last_seq if self.change_feed is not None else 0
+    
+    def changes_since(self, seq: int) -> List[ChangeEvent]:
+        """List processes changed after ``seq`` (latest save/delete/archive/restore per process).
+        
+        Raises:
+            ChangeFeedGap: If the requested history was compacted away
+        """
+        if self.change_feed is None:
+            raise RuntimeError("change tracking is disabled for this storage")
+        return self.change_feed.changes_since(seq)
+    
+    def snapshot_records(self, since: Optional[int] = None) -> Tuple[int, Dict[str, Optional[Dict[str, Any]]]]:
+        """Consistent copy of the stored (encoded) hot records, e.g. for replication.
+        
+        Changes made by other writers are loaded first.
+        
+        Args:
+            since: Only processes changed after this sequence number (None for all);
+                processes deleted or archived since then map to None
+            
+        Returns:
+            ``(seq, records)`` where ``seq`` is the last change included
+            
+        Raises:
+            ChangeFeedGap: If changes after ``since`` were compacted away
+        """
+        if self.change_feed is None:
+            raise RuntimeError("change tracking is disabled for this storage")
+        with self._lock:
+            self.reload_if_changed()
+            seq = self._seen_seq
+            if since is None:
+                records = dict(self.data)
+            else:
+                # seq より後の (他プロセスの) 変更も含めて良い: 値は seq 時点のもの
+                names = {change.process_name for change in self.change_feed.changes_since(since)}
+                records = {name: self.data.get(name) for name in names}
+        # レコードは保存のたびに置き換わる (その場では変更されない) ので、展開はロックの外で行う
+        return seq, {name: plain(record) for name, record in records.items()}
+    
+    def reload_if_changed(self) -> List[ChangeEvent]:
+        """Reload ``processes.json`` if another writer changed it.
+        
+        Listeners are notified of every change made by the other writer.
+        
+        Returns:
+            Changes seen since the previous call (including this instance's own)
+        """
+        if self.change_feed is None:
+            return []
+        with self._lock:
+            try:
+                changes = self.change_feed.changes_since(self._seen_seq)
+            except ChangeFeedGap as gap:
+                previous = set(self.data)
+                self._load_data()
+                self._seen_seq = gap.last_seq
+                for name in previous - set(self.data):
+                    self._notify(DELETE, name)
+                for name, record in self.data.items():
+                    self._notify(SAVE, name, record)
+                return []
+            foreign = [change for change in changes if not self._reflects(change)]
+            if foreign:
+                self._load_data()
+                for change in foreign:
+                    self._notify(change.operation, change.process_name, self.data.get(change.process_name))
+            if changes:
+                # 他の書き手は変更フィードへの追記の後に processes.json を書くので、
+                # まだファイルに反映されていない変更の手前までしか進めない (次回読み直す)
+                pending = [change.seq for change in foreign if not self._reflects(change)]
+                self._seen_seq = min(pending) - 1 if pending else changes[-1].seq
+                changes = [change for change in changes if change.seq <= self._seen_seq]
+            return changes
+    
+    def _reflects(self, change: ChangeEvent) -> bool:
+        """Whether the loaded data already contains ``change`` (or something newer)."""
+        record = self.data.get(change.process_name)
+        if change.operation in (SAVE, RESTORE):
+            return record is not None and record.get("seq", 0) >= change.seq
+        return record is None or record.get("seq", 0) > change.seq
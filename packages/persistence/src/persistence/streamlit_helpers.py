@@ -1,19 +1,80 @@
 """Streamlit session state integration helpers for process management."""
+import copy
+import logging
+from datetime import timedelta
 from pathlib import Path
-from typing import Any, Dict, Optional, Mapping
+from typing import Any, Dict, Iterable, List, MutableMapping, Optional, Mapping, Tuple, Union, cast
+from .codecs import values_equal
+from .keys import KeyRegistry
+from .metrics import InstrumentedStorage, MetricsSink
 from .simple_storage import SimpleStorage
+from .undo import MISSING, KeyChange, UndoHistory, UndoStore
+
+logger = logging.getLogger(__name__)
+
+# session_state 上の「どのプロセスのどの版を読み込んだか」の目印
+LOADED_MARKER_KEY = "_persist_loaded"
+# release_session で値を外したプロセス名 (次の読み込みで使う)
+RELEASED_MARKER_KEY = "_persist_released"
+# 選択中プロセスの undo 履歴 (プロセス名, UndoHistory)
+UNDO_KEY = "_persist_undo"
+# 読み込んだ (または書き込んだ) 時点の保存対象キーの値。このセッションが変更したキーの判定に使う
+BASE_KEY = "_persist_base"
+
+ProcessVersion = Union[int, str, None]
 
 
 class StreamlitSessionManager:
     """Manages process session data persistence with Streamlit integration."""
     
-    def __init__(self, data_path: Path):
+    def __init__(
+        self,
+        data_path: Path,
+        metrics: Optional[MetricsSink] = None,
+        archive_after: Optional[timedelta] = None,
+        storage: Optional[Any] = None,
+        keys: Optional[KeyRegistry] = None,
+        undo_max_bytes: Optional[int] = None,
+        undo_store: Optional[UndoStore] = None,
+        namespace: Optional[str] = None,
+    ):
         """Initialize the session manager with a data path.
         
         Args:
             data_path: Path to the directory for storing process data
+            metrics: Optional metrics sink. When None, storage is not instrumented.
+            archive_after: Archive processes not updated for this long (None disables tiering)
+            storage: Use this storage (e.g. a ``RemoteStorage``) instead of a local
+                ``SimpleStorage`` at ``data_path``
+            keys: Declared persisted keys. When given, only these keys are saved
+                (validated against their types) and missing ones get their
+                defaults on load; otherwise every key with ``persist_prefix`` is persisted.
+            undo_max_bytes: Record key-level edits for undo/redo, keeping at most
+                this many bytes of old/new values per session (None disables undo)
+            undo_store: Keep each process's undo history in this store so it
+                outlives the session (otherwise it is dropped when the session
+                switches to another process). It listens to the storage, so
+                deletions by other writers (e.g. retention) drop the history too.
+            namespace: Tenant this manager serves (see ``TenantRegistry``). Markers
+                in session state are qualified with it, so a session that moves to
+                another tenant never takes a same-named process for the loaded one.
         """
-        self.storage = SimpleStorage(data_path)
+        self.metrics = metrics
+        self.keys = keys
+        self.undo_max_bytes = undo_max_bytes
+        self.undo_store = undo_store
+        self.namespace = namespace
+        if storage is None:
+            storage = SimpleStorage(data_path, metrics=metrics, archive_after=archive_after)
+        if metrics is not None:
+            # InstrumentedStorage forwards everything it does not time itself
+            storage = InstrumentedStorage(storage, metrics)
+        self.storage = cast(SimpleStorage, storage)
+        if undo_store is not None and hasattr(storage, "add_listener"):
+            storage.add_listener(undo_store)
+        # list_processes() の結果を変更フィードのシーケンス番号単位でキャッシュ
+        self._process_list: Optional[List[str]] = None
+        self._process_list_seq = 0
     
     def load_process_data(self, process_name: str) -> Dict[str, Any]:
         """Load process data from storage.
@@ -26,7 +87,7 @@ class StreamlitSessionManager:
         """
         data = self.storage.load_process(process_name)
         if data:
-            print(f"loading {process_name} process data... : {data}")
+            logger.debug("loaded process %r (%d keys)", process_name, len(data))
             return data
         return {}
     
@@ -43,9 +104,424 @@ class StreamlitSessionManager:
             session_data: Dictionary containing all session data
             persist_prefix: Prefix to filter keys for persistence (default: "persist_")
         """
-        print(f"saving {process_name} process data...")
+        logger.debug("saving process %r", process_name)
         self.storage.save_process_with_prefix_filter(process_name, session_data, persist_prefix)
     
+    def get_process_version(self, process_name: str) -> ProcessVersion:
+        """Get a token that changes whenever the stored process changes.
+        
+        Args:
+            process_name: Name of the process
+            
+        Returns:
+            The change-feed sequence number (or ``last_updated`` when change
+            tracking is off), or None if the process is not in the hot store
+        """
+        info = self.storage.get_process_info(process_name)
+        if not info:
+            return None
+        return info.get("seq", info.get("last_updated"))
+    
+    def loaded_process(self, session_state: Mapping[str, Any]) -> Optional[str]:
+        """Name of the process whose data is currently held in ``session_state``."""
+        marker = session_state.get(LOADED_MARKER_KEY)
+        return self._unqualify(marker[0]) if marker else None
+    
+    def _qualify(self, process_name: str) -> str:
+        # セッション状態の目印はテナント名付きで持つ (同名プロセスを取り違えない)
+        return process_name if self.namespace is None else f"{self.namespace}/{process_name}"
+    
+    def _unqualify(self, qualified: Optional[str]) -> Optional[str]:
+        if qualified is None or self.namespace is None:
+            return qualified
+        prefix = f"{self.namespace}/"
+        return qualified[len(prefix):] if qualified.startswith(prefix) else None
+    
+    def _mark_loaded(self, session_state: MutableMapping[str, Any], process_name: str) -> None:
+        session_state[LOADED_MARKER_KEY] = (self._qualify(process_name), self.get_process_version(process_name))
+    
+    def _is_current(self, session_state: Mapping[str, Any], process_name: str) -> bool:
+        """Whether the stored process is still the version this session loaded."""
+        marker = session_state.get(LOADED_MARKER_KEY)
+        return marker is not None and marker[1] == self.get_process_version(process_name)
+    
+    def _changes(
+        self,
+        session_state: Mapping[str, Any],
+        current: Mapping[str, Any],
+        stored: Mapping[str, Any],
+    ) -> Tuple[Dict[str, Any], List[str]]:
+        # 読み込んだ時点の値と比べ、このセッションが変更・削除したキーだけを返す
+        # (他のセッションがその後に保存したキーを古い値で上書きしない)
+        base: Mapping[str, Any] = session_state.get(BASE_KEY, stored)
+        updates = {
+            key: value for key, value in current.items()
+            if key not in base or not values_equal(base[key], value)
+        }
+        removed = [key for key in base if key not in current and key in stored]
+        return updates, removed
+    
+    def _write(
+        self,
+        session_state: MutableMapping[str, Any],
+        process_name: str,
+        updates: Mapping[str, Any],
+        removed: Iterable[str] = (),
+        persist_prefix: str = "persist_",
+    ) -> None:
+        """Write changed / removed keys and move the session's base past them.
+        
+        If another session saved the process since this one loaded it, the
+        marker keeps the old version so the next ``sync_session`` loads the
+        merged result.
+        """
+        removed = list(removed)
+        current = self._is_current(session_state, process_name)
+        if removed:
+            # キーの削除は部分更新できないので、最新の保存データに差分を当てて全体を保存する
+            data = {key: value for key, value in (self.storage.load_process(process_name) or {}).items() if key not in removed}
+            data.update(updates)
+            if self.keys is not None:
+                self.storage.save_process(process_name, data)
+            else:
+                self.save_process_data(process_name, data, persist_prefix)
+        else:
+            self.storage.update_process(process_name, dict(updates))
+        base = dict(session_state.get(BASE_KEY, {}))
+        for key in removed:
+            base.pop(key, None)
+        # session_state の値はその場で変更されうるので複製して持つ
+        base.update(copy.deepcopy(dict(updates)))
+        session_state[BASE_KEY] = base
+        if current:
+            self._mark_loaded(session_state, process_name)
+    
+    def sync_session(
+        self,
+        session_state: MutableMapping[str, Any],
+        process_name: str,
+        persist_prefix: str = "persist_",
+    ) -> bool:
+        """Copy stored data into session state only if it is not already there.
+        
+        Data is loaded when the session holds another process (or none) or
+        when the stored version changed since it was loaded.
+        
+        Args:
+            session_state: Streamlit session state object
+            process_name: Process that should be loaded
+            persist_prefix: Prefix of persisted keys
+            
+        Returns:
+            True if session state was (re)loaded
+        """
+        marker: Optional[Tuple[str, ProcessVersion]] = session_state.get(LOADED_MARKER_KEY)
+        if marker is not None and self._unqualify(marker[0]) == process_name:
+            if marker[1] == self.get_process_version(process_name):
+                self._retain_persisted_keys(session_state, persist_prefix)
+                return False
+        self._load_into_session(session_state, process_name, persist_prefix)
+        return True
+    
+    def persisted_keys(self, session_state: Mapping[str, Any], persist_prefix: str = "persist_") -> List[str]:
+        """Persisted keys present in session state (declared keys, or the prefix scan)."""
+        if self.keys is not None:
+            return [key for key in self.keys if key in session_state]
+        return [str(k) for k in session_state.keys() if str(k).startswith(persist_prefix)]
+    
+    def _retain_persisted_keys(self, session_state: MutableMapping[str, Any], persist_prefix: str) -> None:
+        # Streamlit は描画されなかったウィジェットの状態を再実行の終わりに破棄する。
+        # 再代入してウィジェット管理から外し、別ステップの値が消えないようにする。
+        for key in self.persisted_keys(session_state, persist_prefix):
+            session_state[key] = session_state[key]
+    
+    def switch_process(
+        self,
+        session_state: MutableMapping[str, Any],
+        process_name: str,
+        persist_prefix: str = "persist_",
+    ) -> None:
+        """Save the currently loaded process, then load ``process_name``.
+        
+        Args:
+            session_state: Streamlit session state object
+            process_name: Process to switch to
+            persist_prefix: Prefix of persisted keys
+        """
+        previous = self.loaded_process(session_state)
+        if previous and previous != process_name:
+            self.save_session(session_state, previous, persist_prefix)
+        self._load_into_session(session_state, process_name, persist_prefix)
+    
+    def save_session(
+        self,
+        session_state: MutableMapping[str, Any],
+        process_name: str,
+        persist_prefix: str = "persist_",
+    ) -> bool:
+        """Save persisted keys of session state if they belong to ``process_name`` and changed.
+        
+        Nothing is written when the session holds another process's data
+        (e.g. right after the selection changed) or when the values equal
+        what is already stored. Only the keys this session changed since it
+        loaded the process are written, so a session holding an older
+        version never writes its stale values over another session's
+        save. With a key registry only the declared keys
+        that changed are merged into the stored data; undeclared stored keys
+        and stored values of keys that fail validation are kept.
+        
+        Args:
+            session_state: Streamlit session state object
+            process_name: Process to save to
+            persist_prefix: Prefix of persisted keys
+            
+        Returns:
+            True if the process was written
+        """
+        self._resume_released(session_state, process_name, persist_prefix)
+        if self.loaded_process(session_state) != process_name:
+            return False
+        if self.keys is not None:
+            # 宣言済みキーだけを読み、変わったものだけを保存データへ書き込む
+            # (宣言していないキーや型の合わない値の保存データは消さずに残す)
+            return bool(self.save_keys(session_state, process_name, list(self.keys.collect(session_state, defaults=False))))
+        session_data = {str(k): v for k, v in session_state.items() if str(k).startswith(persist_prefix)}
+        stored = self.storage.load_process(process_name) or {}
+        updates, removed = self._changes(session_state, session_data, stored)
+        # 削除として扱うのは session_state から消えた保存対象キーだけ
+        removed = [key for key in removed if key.startswith(persist_prefix)]
+        if not updates and not removed:
+            return False
+        logger.debug("saving keys %s of process %r", sorted(updates), process_name)
+        self._write(session_state, process_name, updates, removed, persist_prefix)
+        # 拒否された書き込み (容量制限など) は履歴に残さない
+        self._record_edit(session_state, process_name, stored, updates, removed)
+        return True
+    
+    def save_keys(
+        self,
+        session_state: MutableMapping[str, Any],
+        process_name: str,
+        keys: Iterable[str],
+    ) -> List[str]:
+        """Save only ``keys`` (e.g. the keys owned by one fragment) that changed since they were loaded.
+        
+        With a key registry, undeclared keys and values of the wrong type are skipped.
+        
+        Args:
+            session_state: Streamlit session state object
+            process_name: Process to save to
+            keys: Session state keys to persist
+            
+        Returns:
+            The keys that were written (empty if nothing changed)
+        """
+        self._resume_released(session_state, process_name)
+        if self.loaded_process(session_state) != process_name:
+            return []
+        if self.keys is not None:
+            registry = self.keys
+            keys = [key for key in keys if key in session_state and registry.validate(key, session_state[key])]
+        stored = self.storage.load_process(process_name) or {}
+        updates, _ = self._changes(session_state, {key: session_state[key] for key in keys if key in session_state}, stored)
+        if not updates:
+            return []
+        logger.debug("saving keys %s of process %r", sorted(updates), process_name)
+        self._write(session_state, process_name, updates)
+        self._record_edit(session_state, process_name, stored, updates)
+        return list(updates)
+    
+    def has_unsaved_changes(self, session_state: Mapping[str, Any], persist_prefix: str = "persist_") -> bool:
+        """Whether session state holds persisted values not written to storage yet."""
+        process_name = self.loaded_process(session_state)
+        if process_name is None:
+            return False
+        base = session_state.get(BASE_KEY)
+        if base is None:
+            # 比較できない場合は未保存として扱う
+            return True
+        if self.keys is not None:
+            return bool(self._changes(session_state, self.keys.collect(session_state, defaults=False), base)[0])
+        current = {key: session_state[key] for key in self.persisted_keys(session_state, persist_prefix)}
+        updates, removed = self._changes(session_state, current, base)
+        return bool(updates) or any(key.startswith(persist_prefix) for key in removed)
+    
+    def release_session(self, session_state: MutableMapping[str, Any], persist_prefix: str = "persist_") -> bool:
+        """Drop the persisted keys of an idle session from session state (never writes).
+        
+        Used to free memory of idle sessions: without the loaded marker the
+        next ``sync_session`` reloads the data from storage. The values as
+        loaded are kept with the released marker: of the values that are
+        back in session state by then (widget values sent with the
+        interaction that woke the session), only the ones that differ from
+        them are applied over the stored data.
+        
+        Called from other sessions' threads, so nothing is saved here: a
+        session with unsaved edits is left as it is (its own next rerun saves
+        them), and values older than the stored version are simply dropped.
+        
+        Args:
+            session_state: Session state of the (idle) session
+            persist_prefix: Prefix of persisted keys
+            
+        Returns:
+            True if the session's process data was dropped
+        """
+        process_name = self.loaded_process(session_state)
+        if process_name is None or self.has_unsaved_changes(session_state, persist_prefix):
+            return False
+        # 目印を先に消す: 途中で再実行が始まっても部分的な状態を保存せず、読み込み直す
+        del session_state[LOADED_MARKER_KEY]
+        # 解放時の値を残しておき、起こした操作で実際に変わったキーを見分ける
+        session_state[RELEASED_MARKER_KEY] = (self._qualify(process_name), session_state.get(BASE_KEY, {}))
+        session_state.pop(BASE_KEY, None)
+        for key in self.persisted_keys(session_state, persist_prefix):
+            del session_state[key]
+        if self.undo_store is not None and UNDO_KEY in session_state:
+            # 履歴は変更のたびに保存済みなので、次の undo で読み込み直す
+            del session_state[UNDO_KEY]
+        logger.debug("released session data of %r", process_name)
+        return True
+    
+    def undo_history(self, session_state: MutableMapping[str, Any], process_name: str) -> Optional[UndoHistory]:
+        """Undo history of ``process_name`` for this session (None when undo is disabled).
+        
+        Only the history of one process is held per session; switching to
+        another process loads that process's history from the undo store (or
+        starts an empty one).
+        """
+        if self.undo_max_bytes is None:
+            return None
+        entry: Optional[Tuple[str, UndoHistory]] = session_state.get(UNDO_KEY)
+        if entry is not None and entry[0] == self._qualify(process_name):
+            return entry[1]
+        history = None
+        if self.undo_store is not None:
+            history = self.undo_store.load(process_name, max_bytes=self.undo_max_bytes)
+        if history is None:
+            history = UndoHistory(max_bytes=self.undo_max_bytes)
+        session_state[UNDO_KEY] = (self._qualify(process_name), history)
+        return history
+    
+    def undo(self, session_state: MutableMapping[str, Any], process_name: str, persist_prefix: str = "persist_") -> List[str]:
+        """Restore the values of the keys changed by the latest edit.
+        
+        Unsaved values in session state are saved (and recorded) first, so
+        an edit sent together with the undo request is the one taken back.
+        
+        Args:
+            session_state: Streamlit session state object
+            process_name: Process to undo an edit of
+            persist_prefix: Prefix of persisted keys
+            
+        Returns:
+            The restored keys (empty if there was nothing to undo)
+        """
+        return self._replay(session_state, process_name, persist_prefix, redo=False)
+    
+    def redo(self, session_state: MutableMapping[str, Any], process_name: str, persist_prefix: str = "persist_") -> List[str]:
+        """Apply the latest undone edit again (see ``undo``).
+        
+        Returns:
+            The restored keys (empty if there was nothing to redo)
+        """
+        return self._replay(session_state, process_name, persist_prefix, redo=True)
+    
+    def _replay(
+        self,
+        session_state: MutableMapping[str, Any],
+        process_name: str,
+        persist_prefix: str,
+        redo: bool,
+    ) -> List[str]:
+        self.save_session(session_state, process_name, persist_prefix)
+        history = self.undo_history(session_state, process_name)
+        if history is None or self.loaded_process(session_state) != process_name:
+            return []
+        values = history.redo() if redo else history.undo()
+        if values is None:
+            return []
+        self._save_history(process_name, history)
+        updates = {key: copy.deepcopy(value) for key, value in values.items() if value is not MISSING}
+        removed = [key for key, value in values.items() if value is MISSING]
+        for key in removed:
+            if key in session_state:
+                del session_state[key]
+        session_state.update(updates)
+        self._write(session_state, process_name, updates, removed, persist_prefix)
+        logger.debug("%s keys %s of process %r", "redid" if redo else "undid", sorted(values), process_name)
+        return list(values)
+    
+    def _record_edit(
+        self,
+        session_state: MutableMapping[str, Any],
+        process_name: str,
+        stored: Mapping[str, Any],
+        updates: Mapping[str, Any],
+        removed: Iterable[str] = (),
+    ) -> None:
+        history = self.undo_history(session_state, process_name)
+        if history is None:
+            return
+        # 既定値で埋めただけのキーは編集として記録しない
+        before = self.keys.apply_defaults(stored) if self.keys is not None else stored
+        changes = [
+            KeyChange(key, before.get(key, MISSING), value) for key, value in updates.items()
+            if key not in before or not values_equal(before[key], value)
+        ]
+        changes.extend(KeyChange(key, before[key], MISSING) for key in removed if key in before)
+        if history.record(changes):
+            self._save_history(process_name, history)
+    
+    def _save_history(self, process_name: str, history: UndoHistory) -> None:
+        if self.undo_store is not None:
+            self.undo_store.save(process_name, history)
+    
+    def _resume_released(
+        self,
+        session_state: MutableMapping[str, Any],
+        process_name: str,
+        persist_prefix: str = "persist_",
+    ) -> None:
+        # 解放されたセッションの最初の操作 (フラグメントのみの再実行を含む) で読み込み直してから保存する
+        released = session_state.get(RELEASED_MARKER_KEY)
+        if released is not None and released[0] == self._qualify(process_name) and self.loaded_process(session_state) is None:
+            self._load_into_session(session_state, process_name, persist_prefix)
+    
+    def _load_into_session(
+        self,
+        session_state: MutableMapping[str, Any],
+        process_name: str,
+        persist_prefix: str,
+    ) -> None:
+        released = session_state.get(RELEASED_MARKER_KEY)
+        if released is not None:
+            del session_state[RELEASED_MARKER_KEY]
+        stored = self.load_process_data(process_name)
+        # session_state の値はその場で変更されうるので、比較用の元の値 (BASE_KEY) とは別のオブジェクトにする
+        # (キャッシュの値は共有されているので、どちらにしても複製が必要)
+        data = copy.deepcopy(stored)
+        if released is not None and released[0] == self._qualify(process_name):
+            # 解放後の最初の操作で送られてくるウィジェットの値には、触っていない古い値も含まれる。
+            # 解放時の値から変わったキーだけを編集として重ね、それ以外は最新の保存データを使う
+            released_base = released[1]
+            data.update({
+                key: session_state[key] for key in self.persisted_keys(session_state, persist_prefix)
+                if key not in released_base or not values_equal(released_base[key], session_state[key])
+            })
+        if self.keys is not None:
+            # 保存データにないキーは宣言の既定値で埋める
+            data = self.keys.apply_defaults(data)
+        # 前のプロセスの値が新しいプロセスへ混ざらないよう、保存対象キーを入れ替える
+        for key in self.persisted_keys(session_state, persist_prefix):
+            if key not in data:
+                del session_state[key]
+        for key, value in data.items():
+            session_state[key] = value
+        session_state[BASE_KEY] = stored
+        self._mark_loaded(session_state, process_name)
+        logger.debug("loaded %d keys of %r into session state", len(data), process_name)
+    
     def get_storage(self) -> SimpleStorage:
         """Get the underlying storage instance.
         
@@ -60,9 +536,56 @@ class StreamlitSessionManager:
         Returns:
             List of process names
         """
-        process_list = self.storage.list_processes()
-        # 逆順にソートして表示
-        return sorted(process_list, reverse=True)
+        seq = self.storage.last_seq
+        if self._process_list is None or seq == 0 or seq != self._process_list_seq:
+            # 別のインスタンス (新規作成ページ等) の書き込みを取り込み、リスナーにも通知する
+            self.storage.reload_if_changed()
+            # 逆順にソートして表示
+            self._process_list = sorted(self.storage.list_processes(), reverse=True)
+            self._process_list_seq = seq
+        return list(self._process_list)
+    
+    def search_processes(self, query: str = "", limit: int = 50) -> list[str]:
+        """Search processes by name.
+        
+        Args:
+            query: Substring of the process name (empty for the most recent processes)
+            limit: Maximum number of results
+            
+        Returns:
+            Matching process names, most recently updated first
+        """
+        return self.storage.search_processes(query, limit)
+    
+    def list_archived_processes(self) -> list[str]:
+        """List archived processes (newest name first).
+        
+        Returns:
+            List of archived process names
+        """
+        return sorted(self.storage.list_archived_processes(), reverse=True)
+    
+    def get_archived_info(self, process_name: str) -> Optional[Dict[str, Any]]:
+        """Get metadata about an archived process.
+        
+        Args:
+            process_name: Name of the archived process
+            
+        Returns:
+            Dictionary with created / last_updated / archived_at or None
+        """
+        return self.storage.get_archived_info(process_name)
+    
+    def restore_process(self, process_name: str) -> bool:
+        """Move an archived process back into the hot store.
+        
+        Args:
+            process_name: Name of the archived process
+            
+        Returns:
+            True if the process was restored
+        """
+        return self.storage.restore_process(process_name)
     
     def process_exists(self, process_name: str) -> bool:
         """Check if a process exists.
@@ -95,29 +618,40 @@ class StreamlitSessionManager:
         Returns:
             True if deletion was successful, False otherwise
         """
+        if self.undo_store is not None:
+            self.undo_store.delete(process_name)
         return self.storage.delete_process(process_name)
 
 
-def load_process_into_session_state(storage: SimpleStorage, process_name: str, session_state: dict) -> None:
+def load_process_into_session_state(
+    storage: SimpleStorage,
+    process_name: str,
+    session_state: dict,
+    keys: Optional[KeyRegistry] = None,
+) -> None:
     """Load process data into Streamlit session state.
     
     Args:
         storage: Storage instance
         process_name: Name of the process to load
         session_state: Streamlit session state object
+        keys: Declared persisted keys; missing keys are set to their defaults
     """
     process_data = storage.load_process(process_name)
+    if process_data and keys is not None:
+        process_data = keys.apply_defaults(process_data)
     if process_data:
         for key, value in process_data.items():
             session_state[key] = value
-            print(f"\ton session_state, set {key}:{value}")
+        logger.debug("loaded %d keys of %r into session state", len(process_data), process_name)
 
 
 def save_session_state_to_process(
     storage: SimpleStorage, 
     process_name: str, 
     session_state: dict,
-    persist_prefix: str = "persist_"
+    persist_prefix: str = "persist_",
+    keys: Optional[KeyRegistry] = None,
 ) -> None:
     """Save Streamlit session state to process storage with prefix filtering.
     
@@ -126,7 +660,13 @@ def save_session_state_to_process(
         process_name: Name of the process to save to
         session_state: Streamlit session state object
         persist_prefix: Prefix to filter keys for persistence
+        keys: Declared persisted keys; when given, only these keys are merged
+            into the stored data and ``persist_prefix`` is ignored
     """
+    if keys is not None:
+        # 宣言していないキーや型の合わない値の保存データは残す
+        storage.update_process(process_name, keys.collect(session_state, defaults=False))
+        return
     # Convert session state to regular dict for type compatibility
     session_data = {str(k): v for k, v in session_state.items()}
     storage.save_process_with_prefix_filter(process_name, session_data, persist_prefix)
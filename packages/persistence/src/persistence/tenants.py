@@ -0,0 +1,380 @@
+"""Per-tenant namespaces with isolated storage and resource quotas.
+
+Each tenant gets its own ``SimpleStorage`` directory (``tenants/<name>``
+under the base path), so its ``processes.json``, change feed, archive,
+sidecars and lock are separate from every other tenant's: one tenant's
+large saves never serialize behind another's, and names never collide.
+
+``TenantStorage`` wraps a tenant's storage and enforces its
+``TenantQuota`` on writes:
+
+- ``max_processes``: creating a new process beyond it is rejected
+- ``max_bytes``: saves are rejected while the stored payloads (JSON plus
+  array sidecars, archived processes included) are at or above it. The
+  check happens before the write, so one save may overshoot by its own size
+- ``saves_per_second`` / ``save_burst``: a token bucket; a save waits up to
+  ``max_wait`` seconds for a token, then is rejected
+
+Deletes are never limited, so a tenant over its quota can always free
+space. ``TenantUsage`` reports the usage and counters of each tenant.
+"""
+import json
+import re
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from .change_feed import DELETE, RESTORE, SAVE
+from .codecs import sidecar_refs
+from .compact import CompactRecord
+from .models import ProcessData
+from .simple_storage import SimpleStorage, sidecar_dir_name
+from .streamlit_helpers import StreamlitSessionManager
+
+# テナント名はディレクトリ名になるので、区切り文字や ".." を含まない名前に限る
+TENANT_NAME = re.compile(r"^[\w-]+$")
+
+
+def validate_tenant(tenant: str) -> str:
+    """Return ``tenant`` if it is a valid tenant name.
+
+    Raises:
+        ValueError: If the name is empty or contains anything but letters, digits, ``_`` and ``-``
+    """
+    if not isinstance(tenant, str) or not TENANT_NAME.match(tenant):
+        raise ValueError(f"invalid tenant name {tenant!r} (letters, digits, '_' and '-' only)")
+    return tenant
+
+
+@dataclass(frozen=True)
+class TenantQuota:
+    """Resource limits of one tenant (None means unlimited)."""
+    max_processes: Optional[int] = None
+    max_bytes: Optional[int] = None
+    saves_per_second: Optional[float] = None
+    save_burst: int = 10
+    max_wait: float = 1.0
+
+
+class QuotaExceededError(RuntimeError):
+    """A write was rejected because it would exceed the tenant's quota."""
+
+    def __init__(self, tenant: str, quota: str, limit: Any, usage: Any) -> None:
+        super().__init__(f"tenant '{tenant}' exceeded its {quota} quota ({usage} of {limit})")
+        self.tenant = tenant
+        self.quota = quota
+        self.limit = limit
+        self.usage = usage
+
+
+class SaveRateLimitedError(QuotaExceededError):
+    """A save was rejected by the tenant's save rate limit."""
+
+    def __init__(self, tenant: str, limit: float, retry_after: float) -> None:
+        RuntimeError.__init__(
+            self, f"tenant '{tenant}' exceeded its save rate of {limit:g}/s (retry in {retry_after:.2f}s)"
+        )
+        self.tenant = tenant
+        self.quota = "saves_per_second"
+        self.limit = limit
+        self.usage = None
+        self.retry_after = retry_after
+
+
+@dataclass
+class TenantUsage:
+    """Usage and counters of one tenant."""
+    tenant: str
+    quota: TenantQuota = field(default_factory=TenantQuota)
+    processes: int = 0
+    bytes: int = 0
+    saves: int = 0
+    rejected: int = 0
+    throttled: int = 0
+    throttled_seconds: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Plain dict (e.g. for a table or a metrics export)."""
+        return {
+            "tenant": self.tenant,
+            "processes": self.processes,
+            "max_processes": self.quota.max_processes,
+            "bytes": self.bytes,
+            "max_bytes": self.quota.max_bytes,
+            "saves": self.saves,
+            "rejected": self.rejected,
+            "throttled": self.throttled,
+            "throttled_seconds": round(self.throttled_seconds, 3),
+        }
+
+
+class _TokenBucket:
+    """Token bucket that hands out reservations (tokens may go negative)."""
+
+    def __init__(self, rate: float, burst: int, clock: Callable[[], float]) -> None:
+        self.rate = rate
+        self.burst = max(burst, 1)
+        self._clock = clock
+        self._tokens = float(self.burst)
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self, count: int = 1) -> float:
+        """Take ``count`` tokens and return how long to wait before using them."""
+        with self._lock:
+            now = self._clock()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= count
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def cancel(self, count: int = 1) -> None:
+        """Give back tokens of a reservation that was not used."""
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + count)
+
+
+class TenantStorage:
+    """A tenant's storage with its quota enforced on writes.
+
+    Reads and any method not listed here are forwarded to the wrapped storage.
+    """
+
+    def __init__(
+        self,
+        tenant: str,
+        backend: SimpleStorage,
+        quota: Optional[TenantQuota] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Initialize the wrapper and measure the tenant's current usage.
+
+        Args:
+            tenant: Tenant name
+            backend: The tenant's own storage (``SimpleStorage`` or ``PartitionedStorage``)
+            quota: Limits to enforce (unlimited when None)
+            clock: Monotonic clock for the save rate limit
+            sleep: Used to wait for a save token
+        """
+        self.tenant = validate_tenant(tenant)
+        self.backend = backend
+        self._usage = TenantUsage(tenant)
+        self._sleep = sleep
+        self._clock = clock
+        # プロセスごとの保存サイズ (アーカイブ済みも含む)
+        self._sizes: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._bucket: Optional[_TokenBucket] = None
+        self.quota = quota or TenantQuota()
+        for name, record in list(backend.data.items()):
+            self._set_size(name, record)
+        for name, record in backend.archive.records():
+            self._set_size(name, record)
+        backend.add_listener(self)
+
+    @property
+    def quota(self) -> TenantQuota:
+        return self._quota
+
+    @quota.setter
+    def quota(self, quota: TenantQuota) -> None:
+        self._quota = quota
+        self._usage.quota = quota
+        self._bucket = (
+            _TokenBucket(quota.saves_per_second, quota.save_burst, self._clock)
+            if quota.saves_per_second else None
+        )
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.backend, name)
+
+    def _record_size(self, process_name: str, record: Any) -> int:
+        session = record.session_data if isinstance(record, CompactRecord) else record.get("session_data")
+        if isinstance(session, bytes):
+            size = len(session)
+            session = record["session_data"] if b"ndarray" in session else None
+        else:
+            size = len(json.dumps(session or {}, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))
+        sidecar_path = getattr(self.backend, "sidecar_path", None)
+        if session and sidecar_path is not None:
+            directory = Path(sidecar_path) / sidecar_dir_name(process_name)
+            for name in sidecar_refs(session):
+                try:
+                    size += (directory / name).stat().st_size
+                except OSError:
+                    pass
+        return size
+
+    def _set_size(self, process_name: str, record: Optional[Dict[str, Any]]) -> None:
+        size = self._record_size(process_name, record) if record is not None else 0
+        with self._lock:
+            self._bytes += size - self._sizes.get(process_name, 0)
+            self._sizes[process_name] = size
+
+    def on_change(self, operation: str, process_name: str, record: Optional[Dict[str, Any]]) -> None:
+        """Keep the usage up to date (``StorageListener``)."""
+        # アーカイブ済みのプロセスも容量に数えるので、archive ではサイズを変えない
+        if operation in (SAVE, RESTORE) and record is not None:
+            self._set_size(process_name, record)
+        elif operation == DELETE:
+            with self._lock:
+                self._bytes -= self._sizes.pop(process_name, 0)
+
+    def usage(self) -> TenantUsage:
+        """Snapshot of the tenant's usage and counters."""
+        with self._lock:
+            return replace(self._usage, processes=len(self._sizes), bytes=self._bytes)
+
+    def _admit(self, process_names: List[str]) -> None:
+        # 上限の確認 → 保存トークンの取得 (待てない場合は拒否)
+        quota = self._quota
+        with self._lock:
+            if quota.max_processes is not None:
+                new = len({name for name in process_names if name not in self._sizes})
+                if new and len(self._sizes) + new > quota.max_processes:
+                    self._usage.rejected += 1
+                    raise QuotaExceededError(self.tenant, "max_processes", quota.max_processes, len(self._sizes))
+            if quota.max_bytes is not None and self._bytes >= quota.max_bytes:
+                self._usage.rejected += 1
+                raise QuotaExceededError(self.tenant, "max_bytes", quota.max_bytes, self._bytes)
+        bucket = self._bucket
+        if bucket is None:
+            return
+        count = len(process_names)
+        wait = bucket.reserve(count)
+        if wait > quota.max_wait:
+            bucket.cancel(count)
+            with self._lock:
+                self._usage.rejected += 1
+            raise SaveRateLimitedError(self.tenant, bucket.rate, wait)
+        if wait > 0:
+            with self._lock:
+                self._usage.throttled += 1
+                self._usage.throttled_seconds += wait
+            self._sleep(wait)
+
+    def _saved(self, count: int = 1) -> None:
+        with self._lock:
+            self._usage.saves += count
+
+    def save_process(self, process_name: str, session_data: ProcessData) -> None:
+        """Save a process (see ``SimpleStorage.save_process``).
+
+        Raises:
+            QuotaExceededError: If the save would exceed the tenant's quota
+        """
+        self._admit([process_name])
+        self.backend.save_process(process_name, session_data)
+        self._saved()
+
+    def save_process_with_prefix_filter(
+        self,
+        process_name: str,
+        session_data: ProcessData,
+        persist_prefix: str = "persist_",
+    ) -> None:
+        """Save the keys with ``persist_prefix`` (see ``save_process``)."""
+        self._admit([process_name])
+        self.backend.save_process_with_prefix_filter(process_name, session_data, persist_prefix)
+        self._saved()
+
+    def update_process(self, process_name: str, updates: ProcessData) -> None:
+        """Update keys of a process (see ``save_process``)."""
+        self._admit([process_name])
+        self.backend.update_process(process_name, updates)
+        self._saved()
+
+    def import_processes(self, records: Dict[str, Dict[str, Any]]) -> None:
+        """Import several processes; each one counts as a save for the rate limit."""
+        if not records:
+            return
+        self._admit(list(records))
+        self.backend.import_processes(records)
+        self._saved(len(records))
+
+
+class TenantRegistry:
+    """Isolated storages, quotas and session managers of all tenants under one path."""
+
+    def __init__(
+        self,
+        base_path: Path,
+        quota: Optional[TenantQuota] = None,
+        quotas: Optional[Dict[str, TenantQuota]] = None,
+        storage_factory: Optional[Callable[[Path], Any]] = None,
+        **storage_kwargs: Any,
+    ) -> None:
+        """Initialize the registry (storages are opened on first use).
+
+        Args:
+            base_path: Data directory; tenants live in ``base_path/tenants/<name>``
+            quota: Default quota of every tenant
+            quotas: Quotas of individual tenants (override ``quota``)
+            storage_factory: Builds a tenant's storage from its directory
+                (defaults to ``SimpleStorage(path, **storage_kwargs)``)
+            **storage_kwargs: Passed to ``SimpleStorage`` by the default factory
+        """
+        self.path = Path(base_path) / "tenants"
+        self.default_quota = quota or TenantQuota()
+        self.quotas: Dict[str, TenantQuota] = dict(quotas or {})
+        self._factory = storage_factory or (lambda path: SimpleStorage(path, **storage_kwargs))
+        self._storages: Dict[str, TenantStorage] = {}
+        self._managers: Dict[str, StreamlitSessionManager] = {}
+        self._lock = threading.Lock()
+
+    def quota_for(self, tenant: str) -> TenantQuota:
+        return self.quotas.get(tenant, self.default_quota)
+
+    def set_quota(self, tenant: str, quota: TenantQuota) -> None:
+        """Change a tenant's quota (applies to an already open storage immediately)."""
+        validate_tenant(tenant)
+        with self._lock:
+            self.quotas[tenant] = quota
+            storage = self._storages.get(tenant)
+        if storage is not None:
+            storage.quota = quota
+
+    def tenants(self) -> List[str]:
+        """Names of the tenants that have a directory or an open storage."""
+        names = set(self._storages)
+        if self.path.exists():
+            names.update(path.name for path in self.path.iterdir() if path.is_dir() and TENANT_NAME.match(path.name))
+        return sorted(names)
+
+    def storage(self, tenant: str) -> TenantStorage:
+        """The tenant's storage, opened (and its directory created) on first use.
+
+        Raises:
+            ValueError: If the tenant name is invalid
+        """
+        validate_tenant(tenant)
+        with self._lock:
+            storage = self._storages.get(tenant)
+            if storage is None:
+                storage = TenantStorage(tenant, self._factory(self.path / tenant), self.quota_for(tenant))
+                self._storages[tenant] = storage
+            return storage
+
+    def manager(self, tenant: str, **manager_kwargs: Any) -> StreamlitSessionManager:
+        """A session manager for the tenant (created once, ``manager_kwargs`` apply then).
+
+        Args:
+            tenant: Tenant name
+            **manager_kwargs: Passed to ``StreamlitSessionManager`` (e.g. ``keys``)
+        """
+        storage = self.storage(tenant)
+        with self._lock:
+            manager = self._managers.get(tenant)
+            if manager is None:
+                manager = StreamlitSessionManager(storage.base_path, storage=storage, namespace=tenant, **manager_kwargs)
+                self._managers[tenant] = manager
+            return manager
+
+    def usage(self, tenant: Optional[str] = None) -> Dict[str, TenantUsage]:
+        """Usage of one tenant or of all tenants (opening their storages if needed)."""
+        names = [tenant] if tenant is not None else self.tenants()
+        return {name: self.storage(name).usage() for name in names}
@@ -0,0 +1,242 @@
+"""Per-process undo/redo of persisted key edits.
+
+Instead of snapshotting the whole session on every rerun, each save records
+only the keys it changed, as ``(key, old, new)`` deltas. ``UndoHistory`` keeps
+these steps in a ring buffer bounded by both a number of steps and an
+estimated byte size, dropping the oldest steps first. ``UndoStore`` can keep
+a history next to the stored processes so it survives a closed tab; as a
+storage listener it drops the history of deleted processes::
+
+    manager = StreamlitSessionManager(path, undo_max_bytes=256 * 1024, undo_store=UndoStore(path / "undo"))
+    manager.undo(st.session_state, process_name)
+"""
+import copy
+import hashlib
+import json
+import logging
+import os
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .change_feed import DELETE
+from .codecs import CodecRegistry, estimate_size
+
+logger = logging.getLogger(__name__)
+
+
+class _Missing:
+    """Marks a key that did not exist before (or after) an edit."""
+
+    def __repr__(self) -> str:
+        return "MISSING"
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "_Missing":
+        return self
+
+
+MISSING: Any = _Missing()
+
+
+class KeyChange(NamedTuple):
+    """Old and new value of one key changed by a save (``MISSING`` if absent)."""
+    key: str
+    old: Any
+    new: Any
+
+
+class _Step(NamedTuple):
+    changes: Tuple[KeyChange, ...]
+    size: int
+
+
+def _step(changes: Iterable[KeyChange]) -> _Step:
+    changes = tuple(changes)
+    return _Step(changes, sum(
+        estimate_size(change.key) + estimate_size(change.old) + estimate_size(change.new) for change in changes
+    ))
+
+
+class UndoHistory:
+    """Ring buffer of edit steps for one process."""
+
+    def __init__(self, max_bytes: int = 256 * 1024, max_steps: int = 100) -> None:
+        """Create an empty history.
+
+        Args:
+            max_bytes: Cap on the estimated size of all undo and redo steps
+            max_steps: Maximum number of undo steps kept
+        """
+        self.max_bytes = max_bytes
+        self.max_steps = max_steps
+        self._undo: Deque[_Step] = deque(maxlen=max_steps)
+        self._redo: List[_Step] = []
+        self._size = 0
+
+    @property
+    def can_undo(self) -> bool:
+        return bool(self._undo)
+
+    @property
+    def can_redo(self) -> bool:
+        return bool(self._redo)
+
+    @property
+    def size(self) -> int:
+        """Estimated size of the recorded values in bytes."""
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._undo)
+
+    def clear(self) -> None:
+        self._undo.clear()
+        self._redo.clear()
+        self._size = 0
+
+    def record(self, changes: Iterable[KeyChange]) -> bool:
+        """Record one edit step and forget the redo steps.
+
+        Values are copied, so later in-place changes of session values do not
+        alter the history. A step larger than ``max_bytes`` cannot be undone
+        and clears the history.
+
+        Args:
+            changes: Keys changed by the edit
+
+        Returns:
+            True if the step was recorded
+        """
+        step = _step(copy.deepcopy(list(changes)))
+        if not step.changes:
+            return False
+        self._redo.clear()
+        if step.size > self.max_bytes:
+            logger.debug("edit of %d bytes exceeds the undo limit; history cleared", step.size)
+            self.clear()
+            return False
+        # max_steps に達していれば deque(maxlen) が最古のステップを捨てる
+        self._undo.append(step)
+        self._size = sum(item.size for item in self._undo)
+        self._trim()
+        return True
+
+    def undo(self) -> Optional[Dict[str, Any]]:
+        """Take back the latest step.
+
+        Returns:
+            Values to restore (``MISSING`` means delete the key), or None if there is nothing to undo
+        """
+        if not self._undo:
+            return None
+        step = self._undo.pop()
+        self._redo.append(step)
+        return {change.key: change.old for change in reversed(step.changes)}
+
+    def redo(self) -> Optional[Dict[str, Any]]:
+        """Apply the latest undone step again.
+
+        Returns:
+            Values to restore (``MISSING`` means delete the key), or None if there is nothing to redo
+        """
+        if not self._redo:
+            return None
+        step = self._redo.pop()
+        self._undo.append(step)
+        return {change.key: change.new for change in step.changes}
+
+    def _trim(self) -> None:
+        # 上限を超えたら古い undo ステップから捨てる (直近のステップは残す)
+        while self._size > self.max_bytes and len(self._undo) > 1:
+            self._size -= self._undo.popleft().size
+
+    def to_dict(self, codecs: CodecRegistry) -> Dict[str, Any]:
+        """Encode the history into JSON-compatible data.
+
+        Raises:
+            TypeError: If a value needs a sidecar file (arrays) or has no codec
+        """
+        def encode(steps: Iterable[_Step]) -> List[Any]:
+            return [
+                [[change.key, *(
+                    None if value is MISSING else [codecs.encode(value)] for value in (change.old, change.new)
+                )] for change in step.changes]
+                for step in steps
+            ]
+        return {"undo": encode(self._undo), "redo": encode(self._redo)}
+
+    @classmethod
+    def from_dict(
+        cls,
+        data: Dict[str, Any],
+        codecs: CodecRegistry,
+        max_bytes: int = 256 * 1024,
+        max_steps: int = 100,
+    ) -> "UndoHistory":
+        """Decode data produced by ``to_dict``."""
+        def decode(steps: Iterable[Any]) -> List[_Step]:
+            return [
+                _step(KeyChange(key, *(
+                    MISSING if value is None else codecs.decode(value[0]) for value in (old, new)
+                )) for key, old, new in changes)
+                for changes in steps
+            ]
+        history = cls(max_bytes=max_bytes, max_steps=max_steps)
+        history._undo.extend(decode(data.get("undo", ())))
+        history._redo = decode(data.get("redo", ()))
+        history._size = sum(step.size for step in (*history._undo, *history._redo))
+        history._trim()
+        return history
+
+
+class UndoStore:
+    """Directory of per-process undo histories (one JSON file per process)."""
+
+    def __init__(self, path: Path, codecs: Optional[CodecRegistry] = None) -> None:
+        """Open a history directory.
+
+        Args:
+            path: Directory for the history files (created lazily)
+            codecs: Codecs for values JSON cannot represent (arrays are not supported)
+        """
+        self.path = Path(path)
+        self.codecs = codecs or CodecRegistry.default()
+
+    def _file(self, process_name: str) -> Path:
+        # プロセス名はファイル名に使えない文字を含みうるのでハッシュを使う
+        return self.path / f"{hashlib.sha1(process_name.encode('utf-8')).hexdigest()}.json"
+
+    def load(self, process_name: str, max_bytes: int = 256 * 1024, max_steps: int = 100) -> Optional[UndoHistory]:
+        """Load the history of a process, or None if there is none."""
+        try:
+            data = json.loads(self._file(process_name).read_bytes())
+        except FileNotFoundError:
+            return None
+        return UndoHistory.from_dict(data, self.codecs, max_bytes=max_bytes, max_steps=max_steps)
+
+    def save(self, process_name: str, history: UndoHistory) -> bool:
+        """Write the history of a process.
+
+        Returns:
+            False if the history holds values that cannot be stored (nothing is written)
+        """
+        try:
+            data = history.to_dict(self.codecs)
+        except TypeError as error:
+            logger.warning("undo history of %r not saved: %s", process_name, error)
+            return False
+        data["process"] = process_name
+        self.path.mkdir(parents=True, exist_ok=True)
+        target = self._file(process_name)
+        tmp_path = target.with_name(target.name + ".tmp")
+        tmp_path.write_bytes(json.dumps(data, ensure_ascii=False).encode("utf-8"))
+        os.replace(tmp_path, target)
+        return True
+
+    def delete(self, process_name: str) -> None:
+        self._file(process_name).unlink(missing_ok=True)
+
+    def on_change(self, operation: str, process_name: str, record: Optional[Dict[str, Any]]) -> None:
+        """StorageListener hook: a deleted process leaves no history for a new one with the same name."""
+        if operation == DELETE:
+            self.delete(process_name)
@@ -0,0 +1,76 @@
+import pytest
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from persistence import AggregateView, MigrationRegistry, SimpleStorage
+
+
+class TestAggregateView:
+    """Test cases for incrementally maintained aggregates."""
+
+    @pytest.fixture
+    def storage(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            storage = SimpleStorage(Path(temp_dir))
+            storage.save_process("a", {"persist_ステータス": "実行中", "persist_進捗率": 40, "persist_task1": True})
+            storage.save_process("b", {"persist_ステータス": "完了", "persist_進捗率": 100, "persist_task1": True})
+            storage.save_process("c", {"persist_ステータス": "実行中", "persist_進捗率": 5, "persist_task1": False})
+            yield storage
+
+    def test_initial_aggregates(self, storage):
+        view = AggregateView(storage)
+        summary = view.summary()
+
+        assert summary.total == 3
+        assert summary.status_counts == {"実行中": 2, "完了": 1}
+        assert dict(summary.histogram) == {**{f"{i}-{i + 10}": 0 for i in range(0, 100, 10)},
+                                           "0-10": 1, "40-50": 1, "90-100": 1}
+        assert summary.numeric_means["persist_進捗率"] == pytest.approx(145 / 3)
+        assert summary.flag_rates["persist_task1"] == pytest.approx(2 / 3)
+        assert summary.flag_rates["persist_task2"] is None
+
+    def test_incremental_updates_match_rebuild(self, storage):
+        view = AggregateView(storage)
+        storage.save_process("a", {"persist_ステータス": "完了", "persist_進捗率": 100, "persist_task1": True})
+        storage.save_process("d", {"persist_ステータス": "保留", "persist_進捗率": "n/a"})
+        storage.delete_process("b")
+
+        assert view.status_counts() == {"完了": 1, "実行中": 1, "保留": 1}
+        assert view.mean("persist_進捗率") == pytest.approx(105 / 2)
+        assert view.flag_rate("persist_task1") == pytest.approx(1 / 2)
+        # Columns stay aligned with names after swap-removal
+        progress = dict(zip(view.names(), view.column("persist_進捗率")))
+        assert progress["a"] == 100 and progress["c"] == 5
+        assert view.summary() == AggregateView(storage).summary()
+
+    def test_archived_processes_are_counted(self, storage):
+        storage.archive_idle(timedelta(days=1), now=datetime.now() + timedelta(days=2))
+        assert storage.list_processes() == []
+
+        view = AggregateView(storage)
+        assert len(view) == 3
+        assert view.status_counts() == {"実行中": 2, "完了": 1}
+
+        storage.restore_process("a")
+        storage.delete_process("b")
+        assert view.status_counts() == {"実行中": 2}
+
+    def test_outdated_payloads_are_migrated(self, storage):
+        storage.save_process("old", {"persist_状態": "完了", "persist_進捗率": 100})
+        storage.data["old"]["last_updated"] = (datetime.now() - timedelta(days=30)).isoformat()
+        storage.archive_idle(timedelta(days=7))
+        storage.save_process("hot", {"persist_状態": "保留"})
+        migrations = MigrationRegistry()
+
+        @migrations.register(1)
+        def rename_status(data):
+            if "persist_状態" in data:
+                data["persist_ステータス"] = data.pop("persist_状態")
+            return data
+
+        reopened = SimpleStorage(storage.base_path, migrations=migrations)
+        view = AggregateView(reopened)
+        assert view.status_counts() == {"実行中": 2, "完了": 2, "保留": 1}
+        reopened.restore_process("old")
+        assert view.status_counts() == {"実行中": 2, "完了": 2, "保留": 1}
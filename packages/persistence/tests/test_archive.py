@@ -0,0 +1,69 @@
+import pytest
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from persistence import SimpleStorage
+
+
+class TestArchiveTiering:
+    """Test cases for hot/cold tiering of idle processes."""
+
+    @pytest.fixture
+    def temp_dir(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    @pytest.fixture
+    def storage(self, temp_dir):
+        storage = SimpleStorage(temp_dir)
+        storage.save_process("old", {"persist_x": "old"})
+        storage.save_process("new", {"persist_x": "new"})
+        # Backdate one process
+        storage.data["old"]["last_updated"] = (datetime.now() - timedelta(days=30)).isoformat()
+        storage._save_data()
+        return storage
+
+    def test_idle_processes_move_to_archive(self, storage, temp_dir):
+        archived = storage.archive_idle(timedelta(days=7))
+
+        assert archived == ["old"]
+        assert storage.list_processes() == ["new"]
+        assert storage.list_archived_processes() == ["old"]
+        assert storage.process_exists("old") is True
+        assert "old" not in (temp_dir / "processes.json").read_text(encoding="utf-8")
+        assert list((temp_dir / "archive").glob("segment-*.json.gz"))
+
+    def test_load_rehydrates_transparently(self, storage):
+        storage.archive_idle(timedelta(days=7))
+        created = storage.get_archived_info("old")["created"]
+
+        assert storage.load_process("old") == {"persist_x": "old"}
+        assert "old" in storage.list_processes()
+        assert storage.list_archived_processes() == []
+        assert storage.get_process_info("old")["created"] == created
+        # Restored processes are not archived again right away
+        assert storage.archive_idle(timedelta(days=7)) == []
+
+    def test_explicit_restore_and_delete(self, storage, temp_dir):
+        storage.archive_idle(timedelta(days=7))
+        assert storage.restore_process("missing") is False
+        assert storage.restore_process("old") is True
+        assert not list((temp_dir / "archive").glob("segment-*.json.gz"))
+
+        storage.archive_idle(timedelta(days=7), now=datetime.now() + timedelta(days=60))
+        assert storage.delete_process("old") is True
+        assert storage.process_exists("old") is False
+
+    def test_save_supersedes_archived_copy(self, storage):
+        storage.archive_idle(timedelta(days=7))
+        storage.save_process("old", {"persist_x": "edited"})
+        assert storage.list_archived_processes() == []
+        assert storage.load_process("old") == {"persist_x": "edited"}
+
+    def test_archive_on_startup_and_change_feed(self, storage, temp_dir):
+        seq = storage.last_seq
+        reopened = SimpleStorage(temp_dir, archive_after=timedelta(days=7))
+        assert reopened.list_processes() == ["new"]
+        assert [(c.process_name, c.operation) for c in reopened.changes_since(seq)] == [("old", "archive")]
+        assert SimpleStorage(temp_dir).load_process("old") == {"persist_x": "old"}
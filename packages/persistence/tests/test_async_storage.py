@@ -0,0 +1,124 @@
+import asyncio
+import pytest
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+
+from persistence import AsyncSimpleStorage, ExecutorAsyncStorage, MigrationRegistry, SimpleStorage
+
+
+class SlowStorage:
+    """Synchronous backend whose loads block like slow file I/O."""
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self.data = {}
+        self.threads = set()
+
+    def save_process(self, process_name, session_data):
+        self.data[process_name] = dict(session_data)
+
+    def load_process(self, process_name):
+        self.threads.add(threading.get_ident())
+        time.sleep(self.delay)
+        return self.data.get(process_name)
+
+    def list_processes(self):
+        return list(self.data)
+
+    def delete_process(self, process_name):
+        return self.data.pop(process_name, None) is not None
+
+    def process_exists(self, process_name):
+        return process_name in self.data
+
+    def count(self):
+        return len(self.data)
+
+
+class TestExecutorAsyncStorage:
+    """Test cases for the executor-backed async adapter."""
+
+    def test_gathered_loads_overlap(self):
+        backend = SlowStorage(delay=0.1)
+        for i in range(8):
+            backend.save_process(f"p{i}", {"i": i})
+
+        async def main():
+            async with ExecutorAsyncStorage(backend, max_workers=8) as storage:
+                start = time.perf_counter()
+                results = await storage.load_processes([f"p{i}" for i in range(8)])
+                return results, time.perf_counter() - start
+
+        results, elapsed = asyncio.run(main())
+        assert results["p3"] == {"i": 3}
+        # Sequential loads would take 0.8s
+        assert elapsed < 0.4
+        assert threading.get_ident() not in backend.threads
+
+    def test_interface_and_forwarded_methods(self):
+        backend = SlowStorage(delay=0)
+
+        async def main():
+            storage = ExecutorAsyncStorage(backend, max_workers=2)
+            await storage.save_process("p1", {"a": 1})
+            assert await storage.process_exists("p1")
+            assert await storage.list_processes() == ["p1"]
+            # Extension methods become coroutines, attributes are passed through
+            assert await storage.count() == 1
+            assert storage.delay == 0
+            assert await storage.delete_process("p1")
+            storage.close()
+
+        asyncio.run(main())
+
+
+class TestAsyncSimpleStorage:
+    """Test cases for the native async SimpleStorage front end."""
+
+    @pytest.fixture
+    def temp_dir(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    def test_round_trip(self, temp_dir):
+        async def main():
+            storage = await AsyncSimpleStorage.open(temp_dir)
+            try:
+                await storage.save_process("p1", {"persist_name": "tanaka"})
+                await storage.save_process("p2", {"persist_array": np.arange(5)})
+                await storage.update_process("p1", {"persist_progress": 10})
+                loaded = await storage.load_processes(["p1", "p2", "missing"])
+                assert await storage.list_processes() == ["p1", "p2"]
+                assert (await storage.get_process_info("p1"))["session_data"]["persist_progress"] == 10
+                return loaded
+            finally:
+                storage.close()
+
+        loaded = asyncio.run(main())
+        assert loaded["p1"] == {"persist_name": "tanaka", "persist_progress": 10}
+        np.testing.assert_array_equal(loaded["p2"]["persist_array"], np.arange(5))
+        assert loaded["missing"] is None
+        # Written through to disk
+        assert SimpleStorage(temp_dir).load_process("p1") == loaded["p1"]
+
+    def test_fast_path_applies_migrations(self, temp_dir):
+        SimpleStorage(temp_dir).save_process("old", {"persist_担当者": "田中"})
+        migrations = MigrationRegistry()
+
+        @migrations.register(1)
+        def rename_assignee(data):
+            data["persist_担当者名"] = data.pop("persist_担当者")
+            return data
+
+        async def main():
+            storage = await AsyncSimpleStorage.open(temp_dir, migrations=migrations)
+            try:
+                return await storage.load_process("old")
+            finally:
+                storage.close()
+
+        assert asyncio.run(main()) == {"persist_担当者名": "田中"}
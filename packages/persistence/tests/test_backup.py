@@ -0,0 +1,138 @@
+import gzip
+import json
+import pytest
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from persistence import BackupStore, SimpleStorage
+
+
+class TestBackupStore:
+    """Test cases for online incremental backups."""
+
+    @pytest.fixture
+    def temp_dir(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    @pytest.fixture
+    def storage(self, temp_dir):
+        storage = SimpleStorage(temp_dir / "data")
+        storage.save_process("p1", {"persist_name": "tanaka", "persist_進捗率": 10})
+        storage.save_process("p2", {"persist_name": "suzuki", "persist_array": np.arange(5)})
+        return storage
+
+    def test_full_then_incremental_restore(self, storage, temp_dir):
+        backups = BackupStore(temp_dir / "backups")
+        full = backups.backup(storage)
+        assert full["kind"] == "full" and full["changed"] == 2
+
+        storage.update_process("p1", {"persist_name": "sato"})
+        storage.save_process("p3", {"persist_name": "kato"})
+        storage.delete_process("p2")
+        incremental = backups.backup(storage)
+        assert incremental["kind"] == "incremental"
+        assert incremental["parent"] == full["id"]
+        assert incremental["changed"] == 3
+        # Nothing changed since the last backup
+        assert backups.backup(storage) is None
+
+        report = backups.restore(temp_dir / "restored")
+        assert report.ok and report.verified == 2
+        restored = SimpleStorage(temp_dir / "restored")
+        assert sorted(restored.list_processes()) == ["p1", "p3"]
+        assert restored.load_process("p1")["persist_name"] == "sato"
+        assert restored.get_process_info("p1")["created"] == storage.get_process_info("p1")["created"]
+        # New changes are numbered after the restored position
+        assert restored.last_seq == storage.last_seq
+
+        # An older backup can still be restored
+        report = backups.restore(temp_dir / "older", backup_id=full["id"])
+        assert report.ok and report.verified == 2
+        older = SimpleStorage(temp_dir / "older")
+        np.testing.assert_array_equal(older.load_process("p2")["persist_array"], np.arange(5))
+
+    def test_array_files_are_shared_between_backups(self, storage, temp_dir):
+        backups = BackupStore(temp_dir / "backups")
+        backups.backup(storage)
+        storage.update_process("p1", {"persist_進捗率": 20})
+        backups.backup(storage)
+        storage.save_process("p2", {"persist_name": "suzuki", "persist_array": np.ones(3)})
+        backups.backup(storage)
+        assert len(list((temp_dir / "backups" / "sidecars").glob("*/*.npy"))) == 2
+
+        older = backups.backups()[1]["id"]
+        backups.restore(temp_dir / "older", backup_id=older)
+        np.testing.assert_array_equal(SimpleStorage(temp_dir / "older").load_process("p2")["persist_array"], np.arange(5))
+
+    def test_archived_processes_are_backed_up(self, storage, temp_dir):
+        backups = BackupStore(temp_dir / "backups")
+        backups.backup(storage)
+        storage.data["p1"]["last_updated"] = (datetime.now() - timedelta(days=30)).isoformat()
+        storage.archive_idle(timedelta(days=7))
+        backups.backup(storage)
+
+        assert backups.restore(temp_dir / "restored").ok
+        restored = SimpleStorage(temp_dir / "restored")
+        assert restored.list_processes() == ["p2"]
+        assert restored.list_archived_processes() == ["p1"]
+        assert restored.load_process("p1")["persist_name"] == "tanaka"
+
+        # A full backup includes the archive as well
+        full = backups.backup(storage, full=True)
+        assert full["kind"] == "full" and full["changed"] == 2
+
+    def test_verify_detects_corruption(self, storage, temp_dir):
+        backups = BackupStore(temp_dir / "backups")
+        entry = backups.backup(storage)
+        assert backups.verify().ok
+
+        path = temp_dir / "backups" / entry["file"]
+        payload = json.loads(gzip.decompress(path.read_bytes()))
+        payload["hot"]["p1"]["session_data"]["persist_進捗率"] = 99
+        path.write_bytes(gzip.compress(json.dumps(payload).encode("utf-8")))
+        next(iter((temp_dir / "backups" / "sidecars").glob("*/*.npy"))).unlink()
+
+        report = backups.verify()
+        assert not report.ok
+        assert report.mismatched == ["p1"]
+        assert list(report.errors) == ["p2"]
+
+    def test_restore_refuses_existing_storage(self, storage, temp_dir):
+        backups = BackupStore(temp_dir / "backups")
+        backups.backup(storage)
+        with pytest.raises(FileExistsError):
+            backups.restore(temp_dir / "data")
+        with pytest.raises(ValueError):
+            BackupStore(temp_dir / "empty").restore(temp_dir / "restored")
+
+    def test_backup_while_writing(self, storage, temp_dir):
+        backups = BackupStore(temp_dir / "backups")
+        stop = threading.Event()
+
+        def write():
+            i = 0
+            while not stop.is_set():
+                storage.save_process(f"w{i % 5}", {"persist_i": i, "persist_array": np.full(3, i)})
+                i += 1
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            for _ in range(5):
+                backups.backup(storage)
+        finally:
+            stop.set()
+            writer.join()
+        assert backups.verify().ok
+        report = backups.restore(temp_dir / "restored")
+        assert report.ok
+        restored = SimpleStorage(temp_dir / "restored")
+        for name in restored.list_processes():
+            if name.startswith("w"):
+                data = restored.load_process(name)
+                np.testing.assert_array_equal(data["persist_array"], np.full(3, data["persist_i"]))
@@ -0,0 +1,140 @@
+import pytest
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from persistence import CachedStorage, SimpleStorage
+
+
+class CountingStorage(SimpleStorage):
+    """SimpleStorage that counts backend reads."""
+
+    def __init__(self, base_path):
+        super().__init__(base_path)
+        self.loads = 0
+
+        self.during_load = None
+
+    def load_process(self, process_name):
+        self.loads += 1
+        value = super().load_process(process_name)
+        if self.during_load is not None:
+            # Another thread writes after this read, before the value is cached
+            self.during_load()
+        return value
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestCachedStorage:
+    """Test cases for the LRU/TTL caching wrapper."""
+
+    @pytest.fixture
+    def backend(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield CountingStorage(Path(temp_dir))
+
+    def test_hits_and_misses(self, backend):
+        cache = CachedStorage(backend)
+        cache.save_process("p1", {"persist_a": 1})
+
+        assert cache.load_process("p1") == {"persist_a": 1}
+        assert cache.load_process("p1") == {"persist_a": 1}
+        assert backend.loads == 1
+        assert cache.stats.hits == 1
+        assert cache.stats.misses == 1
+        assert cache.load_process("missing") is None
+
+    def test_write_through_invalidates(self, backend):
+        cache = CachedStorage(backend)
+        cache.save_process("p1", {"persist_a": 1})
+        cache.load_process("p1")
+        cache.get_process_info("p1")
+
+        cache.save_process("p1", {"persist_a": 2})
+        assert "p1" not in cache
+        assert cache.load_process("p1") == {"persist_a": 2}
+        assert cache.get_process_info("p1")["session_data"] == {"persist_a": 2}
+
+        assert cache.delete_process("p1") is True
+        assert cache.load_process("p1") is None
+
+    def test_byte_budget_evicts_lru(self, backend):
+        for i in range(3):
+            backend.save_process(f"p{i}", {"persist_v": "x" * 100})
+        cache = CachedStorage(backend, max_bytes=800)
+
+        cache.load_process("p0")
+        cache.load_process("p1")
+        cache.load_process("p0")  # p0 becomes most recently used
+        cache.load_process("p2")  # evicts p1
+
+        assert "p0" in cache and "p2" in cache
+        assert "p1" not in cache
+        assert cache.stats.evictions == 1
+        assert cache.current_bytes <= 800
+
+    def test_arrays_count_their_buffers(self, backend):
+        backend.save_process("a", {"persist_array": np.zeros(7500)})
+        backend.save_process("b", {"persist_array": np.ones(7500)})
+        cache = CachedStorage(backend, max_bytes=100_000)
+
+        cache.load_process("a")
+        assert cache.current_bytes >= 60_000
+        cache.load_process("b")
+        assert "a" not in cache and "b" in cache
+        assert cache.stats.evictions == 1
+        assert cache.current_bytes <= 100_000
+
+    def test_ttl_expiry(self, backend):
+        clock = FakeClock()
+        cache = CachedStorage(backend, ttl=10, clock=clock)
+        backend.save_process("p1", {"persist_a": 1})
+        cache.load_process("p1")
+
+        # A write that bypasses the cache is picked up after the TTL
+        backend.save_process("p1", {"persist_a": 2})
+        assert cache.load_process("p1") == {"persist_a": 1}
+        clock.now = 11
+        assert cache.load_process("p1") == {"persist_a": 2}
+        assert cache.stats.expirations == 1
+
+    def test_value_read_before_a_concurrent_write_is_not_cached(self, backend):
+        cache = CachedStorage(backend)
+        cache.save_process("p1", {"persist_a": 1})
+
+        def concurrent_write():
+            backend.during_load = None
+            cache.save_process("p1", {"persist_a": 2})
+
+        backend.during_load = concurrent_write
+        assert cache.load_process("p1") == {"persist_a": 1}
+        assert "p1" not in cache
+        assert cache.load_process("p1") == {"persist_a": 2}
+
+    def test_process_exists_respects_ttl(self, backend):
+        clock = FakeClock()
+        cache = CachedStorage(backend, ttl=10, clock=clock)
+        backend.save_process("p1", {})
+        cache.load_process("p1")
+
+        # Deleted by another writer: cached entries only vouch for it until they expire
+        backend.delete_process("p1")
+        assert cache.process_exists("p1") is True
+        clock.now = 11
+        assert "p1" not in cache
+        assert cache.process_exists("p1") is False
+
+    def test_forwards_other_methods(self, backend):
+        cache = CachedStorage(backend)
+        cache.save_process("p1", {})
+        assert cache.list_processes() == ["p1"]
+        assert cache.process_exists("p1") is True
+        assert cache.data_file == backend.data_file
@@ -0,0 +1,99 @@
+import pytest
+import tempfile
+from pathlib import Path
+
+from persistence import CachedStorage, ChangeFeed, ChangeFeedGap, SimpleStorage
+from persistence.change_feed import DELETE, SAVE
+
+
+class TestChangeFeed:
+    """Test cases for the sequence-numbered change feed."""
+
+    @pytest.fixture
+    def temp_dir(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    def test_sequence_numbers_and_changes_since(self, temp_dir):
+        storage = SimpleStorage(temp_dir)
+        storage.save_process("a", {"persist_x": 1})
+        storage.save_process("b", {"persist_x": 2})
+        seq = storage.last_seq
+        storage.save_process("a", {"persist_x": 3})
+        storage.delete_process("b")
+
+        assert seq == 2
+        changes = storage.changes_since(seq)
+        assert [(c.process_name, c.operation) for c in changes] == [("a", SAVE), ("b", DELETE)]
+        assert storage.get_process_info("a")["seq"] == 3
+        assert storage.changes_since(storage.last_seq) == []
+
+    def test_latest_operation_per_process(self, temp_dir):
+        feed = ChangeFeed(temp_dir / "changes.log")
+        feed.append(SAVE, "a")
+        feed.append(SAVE, "a")
+        feed.append(DELETE, "a")
+        changes = feed.changes_since(0)
+        assert len(changes) == 1
+        assert changes[0].operation == DELETE and changes[0].seq == 3
+
+    def test_survives_restart(self, temp_dir):
+        storage = SimpleStorage(temp_dir)
+        storage.save_process("a", {})
+        storage.save_process("b", {})
+
+        reopened = SimpleStorage(temp_dir)
+        assert reopened.last_seq == 2
+        reopened.save_process("c", {})
+        assert reopened.last_seq == 3
+        assert [c.process_name for c in reopened.changes_since(1)] == ["b", "c"]
+
+    def test_compaction_bounds_the_log(self, temp_dir):
+        feed = ChangeFeed(temp_dir / "changes.log", max_entries=10)
+        for i in range(100):
+            feed.append(SAVE, f"p{i % 3}")
+        assert feed.last_seq == 100
+        lines = (temp_dir / "changes.log").read_text(encoding="utf-8").splitlines()
+        assert len(lines) <= 11
+        # Superseded events are dropped without creating a gap
+        assert {c.process_name for c in feed.changes_since(0)} == {"p0", "p1", "p2"}
+
+        for i in range(20):
+            feed.append(SAVE, f"q{i}")
+        with pytest.raises(ChangeFeedGap) as exc_info:
+            feed.changes_since(0)
+        assert exc_info.value.last_seq == feed.last_seq
+
+        # Compaction state survives a restart
+        reopened = ChangeFeed(temp_dir / "changes.log", max_entries=10)
+        assert reopened.last_seq == feed.last_seq
+
+    def test_two_writers_share_the_feed(self, temp_dir):
+        writer = SimpleStorage(temp_dir)
+        reader = SimpleStorage(temp_dir)
+        writer.save_process("a", {"persist_x": 1})
+
+        assert reader.load_process("a") is None
+        changes = reader.reload_if_changed()
+        assert [c.process_name for c in changes] == ["a"]
+        assert reader.load_process("a") == {"persist_x": 1}
+        assert reader.reload_if_changed() == []
+
+    def test_cache_sync_invalidates_only_changed(self, temp_dir):
+        storage = SimpleStorage(temp_dir)
+        storage.save_process("a", {"persist_x": 1})
+        storage.save_process("b", {"persist_x": 1})
+        cache = CachedStorage(storage)
+        cache.load_process("a")
+        cache.load_process("b")
+
+        storage.save_process("a", {"persist_x": 2})  # bypasses the cache
+        assert cache.sync_changes() == ["a"]
+        assert "a" not in cache and "b" in cache
+        assert cache.load_process("a") == {"persist_x": 2}
+
+    def test_tracking_can_be_disabled(self, temp_dir):
+        storage = SimpleStorage(temp_dir, track_changes=False)
+        storage.save_process("a", {})
+        assert storage.last_seq == 0
+        assert not (temp_dir / "changes.log").exists()
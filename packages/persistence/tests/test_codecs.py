@@ -0,0 +1,125 @@
+import pytest
+import tempfile
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+
+from persistence import CodecRegistry, SimpleStorage, StreamlitSessionManager
+from persistence.codecs import values_equal
+
+
+class TestCodecs:
+    """Test cases for typed value codecs and binary sidecars."""
+
+    @pytest.fixture
+    def temp_storage(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield SimpleStorage(Path(temp_dir))
+
+    @pytest.mark.parametrize("value", [
+        datetime(2025, 1, 31, 10, 30, 15, 123456),
+        datetime(2025, 1, 31, 10, 30, tzinfo=timezone.utc),
+        date(2025, 2, 1),
+        Decimal("1234.5600"),
+        b"\x00\xffbinary",
+        {"nested": [date(2025, 1, 1), {"__codec__": "not a tag"}]},
+    ])
+    def test_small_values_round_trip(self, temp_storage, value):
+        temp_storage.save_process("p", {"persist_value": value})
+        loaded = SimpleStorage(temp_storage.base_path).load_process("p")["persist_value"]
+        assert loaded == value
+        assert type(loaded) is type(value)
+
+    def test_prefix_filter_keeps_typed_values(self, temp_storage):
+        temp_storage.save_process_with_prefix_filter("p", {
+            "persist_at": datetime(2025, 1, 1, 9, 0),
+            "persist_price": Decimal("9.99"),
+            "persist_unsupported": object(),
+            "other": 1,
+        })
+        assert temp_storage.load_process("p") == {
+            "persist_at": datetime(2025, 1, 1, 9, 0),
+            "persist_price": Decimal("9.99"),
+        }
+
+    def test_numpy_arrays_use_memory_mapped_sidecars(self, temp_storage):
+        np = pytest.importorskip("numpy")
+        array = np.arange(12, dtype=np.float32).reshape(3, 4)
+        temp_storage.save_process("p", {"persist_array": array, "persist_scalar": np.int64(7)})
+
+        loaded = SimpleStorage(temp_storage.base_path).load_process("p")
+        assert isinstance(loaded["persist_array"], np.memmap)
+        assert loaded["persist_array"].dtype == np.float32
+        np.testing.assert_array_equal(loaded["persist_array"], array)
+        assert loaded["persist_scalar"] == 7 and loaded["persist_scalar"].dtype == np.int64
+
+        # Copy-on-write: editing the loaded array does not touch the file
+        loaded["persist_array"][0, 0] = 100
+        np.testing.assert_array_equal(temp_storage.load_process("p")["persist_array"], array)
+
+    def test_sidecars_are_replaced_and_deleted(self, temp_storage):
+        np = pytest.importorskip("numpy")
+        temp_storage.save_process("p", {"persist_array": np.zeros(4)})
+        temp_storage.save_process("p", {"persist_array": np.ones(4)})
+        files = list(temp_storage.sidecar_path.rglob("*.npy"))
+        assert len(files) == 1
+
+        temp_storage.delete_process("p")
+        assert list(temp_storage.sidecar_path.rglob("*.npy")) == []
+
+    def test_dataframe_round_trip(self, temp_storage):
+        pd = pytest.importorskip("pandas")
+        df = pd.DataFrame(
+            {
+                "count": [1, 2, 3],
+                "ratio": [0.5, float("nan"), 1.0],
+                "label": ["a", "b", "c"],
+                "when": pd.to_datetime(["2025-01-01", "2025-01-02", "2025-01-03"]),
+                "misc": pd.Series([{"x": 1}, [1, 2], None], dtype=object, index=["r1", "r2", "r3"]),
+            },
+            index=pd.Index(["r1", "r2", "r3"], name="row"),
+        )
+        temp_storage.save_process("p", {"persist_df": df, "persist_empty": pd.DataFrame()})
+
+        loaded = SimpleStorage(temp_storage.base_path).load_process("p")
+        pd.testing.assert_frame_equal(loaded["persist_df"], df)
+        assert loaded["persist_empty"].empty
+
+    def test_values_equal_handles_arrays(self):
+        np = pytest.importorskip("numpy")
+        assert values_equal({"a": np.array([1.0, np.nan])}, {"a": np.array([1.0, np.nan])})
+        assert not values_equal({"a": np.array([1, 2])}, {"a": np.array([1, 3])})
+        assert not values_equal(np.array([1, 2]), [1, 2])
+        assert values_equal((1, 2), [1, 2])
+
+    def test_unchanged_arrays_are_not_saved_again(self):
+        np = pytest.importorskip("numpy")
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manager = StreamlitSessionManager(Path(temp_dir))
+            manager.storage.save_process("p", {"persist_array": np.arange(5)})
+            session = {}
+            manager.sync_session(session, "p")
+            seq = manager.storage.last_seq
+            assert manager.save_session(session, "p") is False
+            assert manager.storage.last_seq == seq
+
+    def test_custom_codec(self):
+        class ComplexCodec:
+            tag = "complex"
+
+            def can_encode(self, value):
+                return isinstance(value, complex)
+
+            def encode(self, value, registry, sidecars):
+                return [value.real, value.imag]
+
+            def decode(self, payload, registry, sidecars):
+                return complex(*payload)
+
+        registry = CodecRegistry.default()
+        registry.register(ComplexCodec())
+        assert registry.decode(registry.encode({"z": 1 + 2j})) == {"z": 1 + 2j}
+        with pytest.raises(ValueError):
+            registry.register(ComplexCodec())
+        with pytest.raises(TypeError):
+            registry.encode(object())
@@ -0,0 +1,88 @@
+import json
+import pytest
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from persistence import SimpleStorage
+from persistence.compact import INLINE_PAYLOAD_LIMIT, CompactRecord, dump_records, pack_time, unpack_time
+
+
+class TestCompactRecord:
+    """Test cases for the compact in-memory record."""
+
+    def test_behaves_like_the_dict_it_replaces(self):
+        record = {
+            "session_data": {"persist_name": "田中", "persist_tags": ["a", "b"]},
+            "last_updated": "2025-01-06T09:30:00.123456",
+            "created": "2025-01-01T00:00:00",
+            "seq": 7,
+            "archived_note": "x",
+        }
+        compact = CompactRecord(record)
+        assert compact == record
+        assert compact.to_dict() == record
+        assert list(compact) == ["session_data", "last_updated", "created", "seq", "archived_note"]
+        assert compact.get("restored_at") is None
+        assert json.loads(compact.to_json()) == record
+
+        compact["last_updated"] = "2025-02-01T00:00:00"
+        del compact["archived_note"]
+        assert compact["last_updated"] == "2025-02-01T00:00:00"
+        assert "archived_note" not in compact and len(compact) == 4
+        with pytest.raises(KeyError):
+            compact["restored_at"]
+
+    def test_timestamps_round_trip_exactly(self):
+        for value in ("2025-01-06T09:30:00", "2025-01-06T09:30:00.000001", "1969-12-31T23:59:59.999999"):
+            packed = pack_time(value)
+            assert isinstance(packed, int) and unpack_time(packed) == value
+        # Strings that would not come back identical are kept as they are
+        for value in ("2025-01-06", "2025-01-06T09:30:00+09:00", "2025-01-06 09:30:00", "yesterday"):
+            assert pack_time(value) == value
+        assert CompactRecord({"created": "2025-01-06 09:30:00"})["created"] == "2025-01-06 09:30:00"
+
+    def test_small_payloads_stay_encoded(self):
+        small = CompactRecord({"session_data": {"persist_x": 1}})
+        assert isinstance(small.session_data, bytes)
+        first = small["session_data"]
+        first["persist_x"] = 2
+        assert small["session_data"] == {"persist_x": 1}
+
+        large = CompactRecord({"session_data": {"persist_text": "x" * INLINE_PAYLOAD_LIMIT}})
+        assert isinstance(large.session_data, dict)
+        assert large["session_data"]["persist_text"] == "x" * INLINE_PAYLOAD_LIMIT
+
+    def test_dump_records_is_valid_json(self):
+        records = {
+            "週次 1": CompactRecord({"session_data": {"persist_x": [1, 2]}, "seq": 1}),
+            "plain": {"session_data": {}, "created": "2025-01-01T00:00:00"},
+        }
+        assert json.loads(dump_records(records)) == {name: dict(record) for name, record in records.items()}
+        assert dump_records({}) == b"{}"
+
+
+class TestCompactStorage:
+    """Test cases for SimpleStorage with compact records."""
+
+    @pytest.fixture
+    def temp_path(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    def test_layouts_read_each_others_files(self, temp_path):
+        storage = SimpleStorage(temp_path, compact=False)
+        storage.save_process("p1", {"persist_name": "tanaka", "persist_due": datetime(2025, 1, 6)})
+        storage.save_process("p2", {"persist_text": "長い説明" * 1000})
+        info = storage.get_process_info("p1")
+
+        compact = SimpleStorage(temp_path)
+        assert isinstance(compact.data["p1"], CompactRecord)
+        assert compact.get_process_info("p1") == info
+        assert compact.load_process("p1") == {"persist_name": "tanaka", "persist_due": datetime(2025, 1, 6)}
+        compact.update_process("p2", {"persist_name": "sato"})
+
+        reopened = SimpleStorage(temp_path, compact=False)
+        assert reopened.load_process("p2")["persist_name"] == "sato"
+        assert reopened.load_process("p2")["persist_text"] == "長い説明" * 1000
+        assert reopened.get_process_info("p1") == info
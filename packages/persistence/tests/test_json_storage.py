@@ -0,0 +1,56 @@
+import pytest
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+from persistence import AuditEntry, JsonStorage, ProcessState, ProcessStatus
+
+
+class TestJsonStorage:
+    """Test cases for JsonStorage and the typed process models."""
+
+    @pytest.fixture
+    def storage(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield JsonStorage(Path(temp_dir))
+
+    def make_process(self, process_id="p1", status=ProcessStatus.RUNNING):
+        return ProcessState(
+            process_id=process_id,
+            week_number=3,
+            year=2025,
+            status=status,
+            started_at=datetime(2025, 1, 13, 9, 30),
+            data={"担当者名": "田中"},
+            audit_trail=[AuditEntry(datetime(2025, 1, 13, 9, 0), "create", {})],
+        )
+
+    def test_model_round_trip(self):
+        process = self.make_process()
+        data = process.to_dict()
+        assert data["status"] == "running"
+        assert data["audit_trail"] == [["2025-01-13T09:00:00", "create", {}]]
+        assert ProcessState.from_dict(data) == process
+        assert not hasattr(process, "__dict__")
+
+    def test_save_load_and_list_by_status(self, storage):
+        storage.save_process(self.make_process("p1"))
+        storage.save_process(self.make_process("p2", ProcessStatus.FAILED))
+
+        loaded = storage.load_process("p1")
+        assert loaded.status is ProcessStatus.RUNNING
+        assert loaded.started_at == datetime(2025, 1, 13, 9, 30)
+        assert loaded.data == {"担当者名": "田中"}
+        # Saving appends an audit entry
+        assert [entry.action for entry in loaded.audit_trail] == ["create", "save_process"]
+        assert isinstance(loaded.audit_trail[1], AuditEntry)
+
+        assert storage.list_processes_by_status("failed") == ["p2"]
+        assert storage.load_process("missing") is None
+
+    def test_delete_keeps_backup(self, storage):
+        storage.save_process(self.make_process())
+        assert storage.delete_process("p1") is True
+        assert storage.list_processes() == []
+        assert len(list((storage.base_path / "deleted").glob("p1_*.json"))) == 1
+        assert storage.delete_process("p1") is False
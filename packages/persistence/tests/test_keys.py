@@ -0,0 +1,116 @@
+import pytest
+import tempfile
+from pathlib import Path
+from typing import List, Literal, Optional
+
+from persistence import KeyRegistry, StreamlitSessionManager
+
+
+def make_registry() -> KeyRegistry:
+    keys = KeyRegistry()
+
+    @keys.schema
+    class Schema:
+        persist_name: str = ""
+        persist_progress: int = 0
+        persist_status: Literal["open", "done"] = "open"
+        persist_done: bool = False
+        persist_tags: List[str] = []
+        persist_ratio: Optional[float] = None
+
+    return keys
+
+
+class TestKeyRegistry:
+    """Test cases for declared persisted keys."""
+
+    def test_validators(self):
+        keys = make_registry()
+        assert keys.validate("persist_progress", 3)
+        assert not keys.validate("persist_progress", True)
+        assert not keys.validate("persist_progress", "3")
+        assert keys.validate("persist_status", "done")
+        assert not keys.validate("persist_status", "closed")
+        assert keys.validate("persist_done", False)
+        assert not keys.validate("persist_done", 0)
+        assert keys.validate("persist_tags", ["a"])
+        assert keys.validate("persist_ratio", None)
+        assert keys.validate("persist_ratio", 1)
+        assert not keys.validate("persist_undeclared", "x")
+
+    def test_declare_conflicts_and_invalid_defaults(self):
+        keys = make_registry()
+        # Re-running a page declares the same keys again
+        keys.declare("persist_name", str, "")
+        with pytest.raises(ValueError):
+            keys.declare("persist_name", str, "someone")
+        with pytest.raises(ValueError):
+            keys.declare("persist_count", int, "zero")
+
+    def test_collect_reads_only_declared_keys(self):
+        keys = make_registry()
+        session = {
+            "persist_name": "tanaka",
+            "persist_progress": "not a number",
+            "persist_other": 1,
+            "widget": 2,
+        }
+        data = keys.collect(session)
+        assert data == {
+            "persist_name": "tanaka",
+            "persist_status": "open",
+            "persist_done": False,
+            "persist_tags": [],
+            "persist_ratio": None,
+        }
+        # Mutable defaults are copied
+        data["persist_tags"].append("x")
+        assert keys.defaults()["persist_tags"] == []
+        assert keys.collect(session, defaults=False) == {"persist_name": "tanaka"}
+
+
+class TestManagerWithKeys:
+    """Test cases for StreamlitSessionManager with a key registry."""
+
+    @pytest.fixture
+    def manager(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manager = StreamlitSessionManager(Path(temp_dir), keys=make_registry())
+            manager.storage.save_process("p1", {"persist_name": "tanaka", "persist_legacy": 1})
+            yield manager
+
+    def test_load_applies_defaults_and_save_writes_declared_keys(self, manager):
+        session = {"persist_unrelated": "x"}
+        manager.sync_session(session, "p1")
+        assert session["persist_name"] == "tanaka"
+        assert session["persist_progress"] == 0
+        assert session["persist_status"] == "open"
+        # Undeclared keys are left alone
+        assert session["persist_unrelated"] == "x"
+
+        session["persist_progress"] = 40
+        assert manager.save_session(session, "p1") is True
+        stored = manager.storage.load_process("p1")
+        assert stored["persist_progress"] == 40
+        assert "persist_unrelated" not in stored
+        # Stored keys the registry does not declare are kept
+        assert stored["persist_legacy"] == 1
+
+    def test_save_keeps_stored_values_that_fail_validation(self, manager):
+        manager.storage.save_process("p1", {"persist_name": "tanaka", "persist_progress": 10, "persist_tasks": ["a"]})
+        session = {}
+        manager.sync_session(session, "p1")
+        session["persist_progress"] = "40%"
+        session["persist_name"] = "sato"
+        assert manager.save_session(session, "p1") is True
+        stored = manager.storage.load_process("p1")
+        assert (stored["persist_name"], stored["persist_progress"], stored["persist_tasks"]) == ("sato", 10, ["a"])
+
+    def test_save_keys_skips_invalid_values(self, manager):
+        session = {}
+        manager.sync_session(session, "p1")
+        session["persist_progress"] = "40%"
+        session["persist_done"] = True
+        written = manager.save_keys(session, "p1", ["persist_progress", "persist_done", "persist_unrelated"])
+        assert written == ["persist_done"]
+        assert "persist_progress" not in manager.storage.load_process("p1")
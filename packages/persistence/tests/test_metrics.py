@@ -0,0 +1,83 @@
+import pytest
+import tempfile
+from pathlib import Path
+
+from persistence import (
+    SimpleStorage,
+    StreamlitSessionManager,
+    InMemorySink,
+    InstrumentedStorage,
+    PrometheusFileSink,
+    create_sink,
+)
+from persistence.metrics import (
+    BYTES_READ_TOTAL,
+    BYTES_WRITTEN_TOTAL,
+    ERRORS_TOTAL,
+    OPERATIONS_TOTAL,
+)
+
+
+class TestMetrics:
+    """Test cases for storage instrumentation."""
+
+    @pytest.fixture
+    def temp_dir(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    def test_operations_are_counted_and_timed(self, temp_dir):
+        sink = InMemorySink()
+        storage = InstrumentedStorage(SimpleStorage(temp_dir, metrics=sink), sink)
+
+        storage.save_process("p1", {"persist_a": 1})
+        storage.load_process("p1")
+        storage.load_process("p1")
+
+        assert sink.counter(OPERATIONS_TOTAL, {"operation": "save_process"}) == 1
+        assert sink.counter(OPERATIONS_TOTAL, {"operation": "load_process"}) == 2
+        histograms = {h["labels"]["operation"]: h for h in sink.snapshot()["histograms"]}
+        assert histograms["load_process"]["count"] == 2
+
+    def test_bytes_read_and_written(self, temp_dir):
+        sink = InMemorySink()
+        storage = SimpleStorage(temp_dir, metrics=sink)
+        storage.save_process("p1", {"persist_a": "x" * 100})
+        written = sink.counter(BYTES_WRITTEN_TOTAL)
+        assert written == (temp_dir / "processes.json").stat().st_size
+
+        SimpleStorage(temp_dir, metrics=sink)
+        assert sink.counter(BYTES_READ_TOTAL) == written
+
+    def test_errors_are_counted(self, temp_dir):
+        sink = InMemorySink()
+        storage = InstrumentedStorage(SimpleStorage(temp_dir), sink)
+        with pytest.raises(ValueError):
+            storage.save_process("bad", {"persist_f": lambda x: x})
+        assert sink.counter(ERRORS_TOTAL, {"operation": "save_process"}) == 1
+
+    def test_prometheus_dump(self, temp_dir):
+        out = temp_dir / "metrics.prom"
+        sink = PrometheusFileSink(out, flush_interval=3600)
+        storage = InstrumentedStorage(SimpleStorage(temp_dir), sink)
+        storage.save_process("p1", {})
+        sink.flush()
+
+        text = out.read_text(encoding="utf-8")
+        assert 'persistence_operations_total{operation="save_process"} 1' in text
+        assert 'persistence_operation_seconds_bucket{operation="save_process",le="+Inf"} 1' in text
+
+    def test_manager_without_metrics_is_not_wrapped(self, temp_dir):
+        manager = StreamlitSessionManager(temp_dir)
+        assert isinstance(manager.get_storage(), SimpleStorage)
+
+        instrumented = StreamlitSessionManager(temp_dir, metrics=InMemorySink())
+        assert isinstance(instrumented.get_storage(), InstrumentedStorage)
+
+    def test_create_sink(self, temp_dir):
+        assert create_sink(None) is None
+        assert create_sink("off") is None
+        assert isinstance(create_sink("memory"), InMemorySink)
+        assert isinstance(create_sink(f"prometheus:{temp_dir / 'm.prom'}"), PrometheusFileSink)
+        with pytest.raises(ValueError):
+            create_sink("statsd")
@@ -0,0 +1,98 @@
+import json
+import pytest
+import tempfile
+from pathlib import Path
+
+from persistence import MigrationRegistry, PartitionedStorage, SchemaUpgrader, SimpleStorage
+
+
+def make_migrations() -> MigrationRegistry:
+    migrations = MigrationRegistry()
+
+    @migrations.register(1)
+    def rename_assignee(data):
+        data["persist_担当者名"] = data.pop("persist_担当者", "")
+        return data
+
+    @migrations.register(2)
+    def task_list_to_dict(data):
+        tasks = data.pop("persist_タスクリスト", [])
+        data["persist_タスク"] = {task["名前"]: task["完了"] for task in tasks}
+        return data
+
+    return migrations
+
+
+OLD_DATA = {
+    "persist_担当者": "田中",
+    "persist_タスクリスト": [{"名前": "データ取得", "完了": True}],
+}
+NEW_DATA = {
+    "persist_担当者名": "田中",
+    "persist_タスク": {"データ取得": True},
+}
+
+
+class TestMigrations:
+    """Test cases for versioned payloads and lazy migration."""
+
+    @pytest.fixture
+    def temp_dir(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            # Written by code without migrations (version 0)
+            SimpleStorage(Path(temp_dir)).save_process("old", OLD_DATA)
+            yield Path(temp_dir)
+
+    def stored_record(self, temp_dir, name):
+        return json.loads((temp_dir / "processes.json").read_text(encoding="utf-8"))[name]
+
+    def test_registry(self):
+        migrations = make_migrations()
+        assert migrations.current_version == 2
+        assert migrations.upgrade(OLD_DATA, 0) == NEW_DATA
+        assert migrations.upgrade(NEW_DATA, 2) == NEW_DATA
+        with pytest.raises(ValueError):
+            migrations.upgrade(NEW_DATA, 3)
+        with pytest.raises(ValueError):
+            migrations.register(2)
+
+    def test_upgraded_on_read_and_written_back_on_save(self, temp_dir):
+        storage = SimpleStorage(temp_dir, migrations=make_migrations())
+        assert storage.load_process("old") == NEW_DATA
+        # Nothing is rewritten by reading
+        assert self.stored_record(temp_dir, "old")["session_data"] == OLD_DATA
+        assert storage.outdated_processes() == ["old"]
+
+        storage.update_process("old", {"persist_進捗率": 10})
+        record = self.stored_record(temp_dir, "old")
+        assert record["schema_version"] == 2
+        assert record["session_data"] == {**NEW_DATA, "persist_進捗率": 10}
+        assert storage.outdated_processes() == []
+
+    def test_background_upgrade_in_batches(self, temp_dir):
+        storage = SimpleStorage(temp_dir)
+        for i in range(4):
+            storage.save_process(f"p{i}", OLD_DATA)
+        last_updated = storage.get_process_info("p0")["last_updated"]
+
+        storage = SimpleStorage(temp_dir, migrations=make_migrations())
+        upgrader = SchemaUpgrader(storage, batch_size=2, pause=0)
+        assert len(upgrader.run_once()) == 2
+        assert upgrader.run() == 3
+        assert storage.outdated_processes() == []
+        assert self.stored_record(temp_dir, "p0")["session_data"] == NEW_DATA
+        # Timestamps are kept so retention and archiving are not reset
+        assert storage.get_process_info("p0")["last_updated"] == last_updated
+
+    def test_partitioned_upgrade(self, temp_dir):
+        paths = [temp_dir / "a", temp_dir / "b"]
+        legacy = PartitionedStorage.from_paths(paths)
+        for i in range(6):
+            legacy.save_process(f"p{i}", OLD_DATA)
+        legacy.close()
+
+        storage = PartitionedStorage.from_paths(paths, migrations=make_migrations())
+        assert len(storage.outdated_processes()) == 6
+        assert sorted(storage.upgrade_processes(storage.outdated_processes())) == [f"p{i}" for i in range(6)]
+        assert storage.load_process("p3") == NEW_DATA
+        storage.close()
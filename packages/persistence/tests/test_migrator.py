@@ -0,0 +1,84 @@
+import pytest
+from datetime import timedelta
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from persistence import PartitionedStorage, SimpleStorage, StorageMigrator
+from persistence.migrator import checksum
+
+
+class FailingTarget:
+    """Target that fails after accepting ``limit`` processes."""
+
+    def __init__(self, backend, limit):
+        self.backend = backend
+        self.limit = limit
+
+    def save_process(self, process_name, session_data):
+        if len(self.backend.list_processes()) >= self.limit:
+            raise OSError("disk full")
+        self.backend.save_process(process_name, session_data)
+
+    def load_process(self, process_name):
+        return self.backend.load_process(process_name)
+
+
+class TestStorageMigrator:
+    """Test cases for copying processes between storages."""
+
+    @pytest.fixture
+    def temp_dir(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    @pytest.fixture
+    def source(self, temp_dir):
+        storage = SimpleStorage(temp_dir / "source")
+        for i in range(25):
+            storage.save_process(f"p{i:02d}", {"persist_i": i, "persist_array": np.arange(i)})
+        return storage
+
+    def test_checksum_ignores_key_order_and_format(self):
+        assert checksum({"a": 1, "b": [1, 2]}) == checksum({"b": (1, 2), "a": 1})
+        assert checksum({"a": np.arange(3)}) != checksum({"a": np.arange(4)})
+
+    def test_copies_into_partitions_and_verifies(self, temp_dir, source):
+        created = source.get_process_info("p03")["created"]
+        source.archive_idle(older_than=timedelta(0))
+        source.save_process("p00", {"persist_i": 0})
+
+        target = PartitionedStorage.from_paths([temp_dir / "a", temp_dir / "b", temp_dir / "c"])
+        report = StorageMigrator(source, target, workers=4, batch_size=7).run()
+
+        assert report.ok
+        assert len(report.copied) == 25
+        assert report.verified == 25
+        np.testing.assert_array_equal(target.load_process("p10")["persist_array"], np.arange(10))
+        # Timestamps of archived processes are preserved too
+        assert target.get_process_info("p03")["created"] == created
+        target.close()
+
+    def test_resumes_from_checkpoint(self, temp_dir, source):
+        checkpoint = temp_dir / "checkpoint.json"
+        target = SimpleStorage(temp_dir / "target")
+
+        report = StorageMigrator(source, FailingTarget(target, limit=10), batch_size=5, checkpoint_path=checkpoint).run()
+        assert not report.ok
+        assert len(report.copied) == 10
+
+        report = StorageMigrator(source, target, batch_size=5, checkpoint_path=checkpoint).run()
+        assert report.ok
+        assert report.skipped == 10
+        assert len(report.copied) == 15
+        assert report.verified == 25
+
+    def test_detects_mismatch(self, temp_dir, source):
+        target = SimpleStorage(temp_dir / "target")
+        migrator = StorageMigrator(source, target)
+        migrator.run(verify=False)
+        target.save_process("p05", {"persist_i": -1})
+        report = migrator.run()
+        assert report.skipped == 25
+        assert report.mismatched == ["p05"]
@@ -0,0 +1,76 @@
+import pytest
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from persistence import NameIndex, SimpleStorage
+
+
+class TestNameIndex:
+    """Test cases for the process name index."""
+
+    @pytest.fixture
+    def index(self):
+        index = NameIndex()
+        index.rebuild({
+            "2025年1月_週次レポート": {"last_updated": "2025-01-31T10:00:00"},
+            "2025年2月_週次レポート": {"last_updated": "2025-02-28T10:00:00"},
+            "2025年2月_月次集計": {"last_updated": "2025-02-01T10:00:00"},
+            "Alpha Project": {"last_updated": "2024-12-01T10:00:00"},
+        })
+        return index
+
+    def test_prefix(self, index):
+        assert index.prefix("2025年2月") == ["2025年2月_月次集計", "2025年2月_週次レポート"]
+        assert index.prefix("alpha") == ["Alpha Project"]
+        assert index.prefix("2025", limit=1) == ["2025年1月_週次レポート"]
+        assert index.prefix("zzz") == []
+
+    def test_substring_recent_first(self, index):
+        assert index.search("週次") == ["2025年2月_週次レポート", "2025年1月_週次レポート"]
+        assert index.search("PROJ") == ["Alpha Project"]
+        assert index.search("月") == ["2025年2月_週次レポート", "2025年2月_月次集計", "2025年1月_週次レポート"]
+        assert index.search("存在しない") == []
+
+    def test_empty_query_and_limit(self, index):
+        assert index.search("", limit=2) == ["2025年2月_週次レポート", "2025年2月_月次集計"]
+
+    def test_add_and_remove(self, index):
+        index.add("2025年3月_週次レポート", "2025-03-31T10:00:00")
+        assert index.search("週次", limit=1) == ["2025年3月_週次レポート"]
+        index.remove("2025年1月_週次レポート")
+        assert "2025年1月_週次レポート" not in index
+        assert index.search("1月") == []
+        assert len(index) == 4
+
+    def test_names_differing_only_in_case(self, index):
+        index.add("alpha project", "2025-03-01T10:00:00")
+        assert len(index) == 5
+        assert "alpha project" in index and "ALPHA PROJECT" not in index
+        assert index.prefix("ALPHA") == ["Alpha Project", "alpha project"]
+        assert index.search("project") == ["alpha project", "Alpha Project"]
+
+        index.remove("Alpha Project")
+        assert index.search("project") == ["alpha project"]
+        index.remove("ALPHA PROJECT")
+        assert index.prefix("alpha") == ["alpha project"]
+        index.remove("alpha project")
+        assert index.search("project") == [] and index.prefix("alpha") == []
+
+    def test_storage_keeps_index_in_sync(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            storage = SimpleStorage(Path(temp_dir))
+            storage.save_process("レポートA", {})
+            storage.save_process("レポートB", {})
+            storage.save_process("メモ", {})
+            assert storage.search_processes("レポート") == ["レポートB", "レポートA"]
+
+            storage.save_process("レポートA", {"persist_x": 1})
+            assert storage.search_processes("レポート")[0] == "レポートA"
+
+            storage.delete_process("レポートB")
+            storage.archive_idle(timedelta(0))
+            assert storage.search_processes("") == []
+            storage.load_process("メモ")
+            assert storage.search_processes("") == ["メモ"]
+            assert SimpleStorage(Path(temp_dir)).search_processes("メ") == ["メモ"]
@@ -0,0 +1,145 @@
+import pytest
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from persistence import AggregateView, HashRing, PartitionedStorage, SimpleStorage, StreamlitSessionManager
+
+
+class TestPartitionedStorage:
+    """Test cases for hash-partitioned storage."""
+
+    @pytest.fixture
+    def temp_dir(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    @pytest.fixture
+    def storage(self, temp_dir):
+        storage = PartitionedStorage.from_paths([temp_dir / f"part-{i}" for i in range(3)])
+        yield storage
+        storage.close()
+
+    def test_processes_are_spread_and_found(self, storage, temp_dir):
+        names = [f"process-{i}" for i in range(60)]
+        for i, name in enumerate(names):
+            storage.save_process(name, {"persist_n": i})
+
+        counts = [len(p.list_processes()) for p in storage.partitions.values()]
+        assert sum(counts) == 60 and all(count > 0 for count in counts)
+        assert sorted(storage.list_processes()) == sorted(names)
+        assert storage.load_process("process-7") == {"persist_n": 7}
+        assert storage.process_exists("process-7")
+        assert set(storage.get_process_infos()) == set(names)
+
+        # Reopening with the same partition ids finds everything again
+        reopened = PartitionedStorage.from_paths([temp_dir / f"part-{i}" for i in range(3)])
+        assert reopened.load_process("process-59") == {"persist_n": 59}
+        reopened.close()
+
+        assert storage.delete_process("process-7") is True
+        assert not storage.process_exists("process-7")
+
+    def test_search_merges_most_recent_first(self, storage):
+        for i in range(10):
+            storage.save_process(f"report-{i}", {})
+        assert storage.search_processes("report", limit=3) == ["report-9", "report-8", "report-7"]
+
+    def test_add_partition_moves_only_affected_processes(self, storage, temp_dir):
+        names = [f"process-{i}" for i in range(200)]
+        for name in names:
+            storage.save_process(name, {"persist_name": name})
+        created = {name: storage.get_process_info(name)["created"] for name in names}
+        before = {name: storage.partition_for(name) for name in names}
+
+        moved = storage.add_partition("part-3", SimpleStorage(temp_dir / "part-3"))
+
+        after = {name: storage.partition_for(name) for name in names}
+        assert sorted(moved) == sorted(name for name in names if before[name] != after[name])
+        assert all(after[name] == "part-3" for name in moved)
+        assert 0 < len(moved) < len(names) / 2
+        assert sorted(storage.partitions["part-3"].list_processes()) == sorted(moved)
+        for name in names:
+            assert storage.load_process(name) == {"persist_name": name}
+            assert storage.get_process_info(name)["created"] == created[name]
+
+    def test_reopening_with_other_partitions_is_refused(self, storage, temp_dir):
+        for i in range(30):
+            storage.save_process(f"p{i}", {"persist_n": i})
+        paths = [temp_dir / f"part-{i}" for i in range(4)]
+        with pytest.raises(ValueError, match="add_partition"):
+            PartitionedStorage.from_paths(paths)
+        with pytest.raises(ValueError, match="add_partition"):
+            PartitionedStorage.from_paths(paths[:2])
+        assert not paths[3].exists()
+
+        moved = storage.add_partition("part-3", SimpleStorage(paths[3]))
+        assert moved
+        with pytest.raises(ValueError):
+            PartitionedStorage.from_paths(paths[:3])
+        reopened = PartitionedStorage.from_paths(paths)
+        assert all(reopened.load_process(f"p{i}") == {"persist_n": i} for i in range(30))
+        reopened.close()
+
+    def test_data_without_ring_file_is_checked_for_misplaced_names(self, storage, temp_dir):
+        for i in range(30):
+            storage.save_process(f"p{i}", {"persist_n": i})
+        for i in range(3):
+            (temp_dir / f"part-{i}" / "ring.json").unlink()
+
+        with pytest.raises(ValueError, match="not own"):
+            PartitionedStorage.from_paths([temp_dir / f"part-{i}" for i in range(4)])
+        reopened = PartitionedStorage.from_paths([temp_dir / f"part-{i}" for i in range(3)])
+        assert (temp_dir / "part-0" / "ring.json").exists()
+        reopened.close()
+
+    def test_interrupted_add_partition_is_finished_on_open(self, storage, temp_dir):
+        for i in range(60):
+            storage.save_process(f"p{i}", {"persist_n": i})
+        new = SimpleStorage(temp_dir / "part-3")
+        original = new.import_processes
+
+        def crash(records):
+            original(records)
+            raise OSError("disk full")
+
+        new.import_processes = crash
+        with pytest.raises(OSError):
+            storage.add_partition("part-3", new)
+
+        reopened = PartitionedStorage.from_paths([temp_dir / f"part-{i}" for i in range(4)])
+        assert all(reopened.load_process(f"p{i}") == {"persist_n": i} for i in range(60))
+        assert sum(len(p.list_processes()) for p in reopened.partitions.values()) == 60
+        assert "rebalancing" not in (temp_dir / "part-0" / "ring.json").read_text(encoding="utf-8")
+        reopened.close()
+
+    def test_listeners_and_archive_span_partitions(self, storage, temp_dir):
+        for i in range(20):
+            storage.save_process(f"p{i}", {"persist_ステータス": "完了" if i % 2 else "実行中"})
+        view = AggregateView(storage)
+        storage.archive_idle(timedelta(days=1), now=datetime.now() + timedelta(days=2))
+        assert len(storage.list_archived_processes()) == 20
+
+        storage.add_partition("part-3", SimpleStorage(temp_dir / "part-3"))
+        storage.save_process("new", {"persist_ステータス": "保留"})
+        assert view.status_counts() == {"実行中": 10, "完了": 10, "保留": 1}
+        assert view.summary() == AggregateView(storage).summary()
+
+    def test_manager_on_partitions(self, storage):
+        manager = StreamlitSessionManager(Path("unused"), storage=storage)
+        storage.save_process("p1", {"persist_name": "tanaka"})
+        session = {}
+        manager.sync_session(session, "p1")
+        session["persist_name"] = "sato"
+        assert manager.save_session(session, "p1") is True
+        assert manager.list_processes() == ["p1"]
+        assert storage.load_process("p1") == {"persist_name": "sato"}
+
+    def test_hash_ring(self):
+        ring = HashRing(["a", "b"], replicas=16)
+        keys = [f"k{i}" for i in range(100)]
+        owners = {key: ring.node_for(key) for key in keys}
+        ring.add("c")
+        assert all(ring.node_for(key) in (owners[key], "c") for key in keys)
+        with pytest.raises(ValueError):
+            ring.add("a")
@@ -0,0 +1,113 @@
+import pytest
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from persistence import CachedStorage, Prefetcher, SimpleStorage, StreamlitSessionManager
+
+
+class SlowStorage(SimpleStorage):
+    """SimpleStorage whose reads block until ``release`` is set."""
+
+    def __init__(self, base_path):
+        super().__init__(base_path)
+        self.release = threading.Event()
+        self.release.set()
+        self.loads = 0
+
+    def load_process(self, process_name):
+        self.release.wait()
+        self.loads += 1
+        return super().load_process(process_name)
+
+
+class TestPrefetcher:
+    """Test cases for background prefetch into CachedStorage."""
+
+    @pytest.fixture
+    def backend(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            backend = SlowStorage(Path(temp_dir))
+            for i in range(6):
+                backend.save_process(f"p{i}", {"persist_v": i, "persist_text": "x" * 100})
+            yield backend
+
+    def test_candidates_are_neighbours_then_recent(self, backend):
+        prefetcher = Prefetcher(CachedStorage(backend), neighbours=2, recent=2)
+        ordered = ["p0", "p1", "p2", "p3", "p4", "p5"]
+        assert prefetcher.candidates("p2", ordered, ["p5", "p1", "p4"]) == ["p1", "p3", "p0", "p4", "p5"]
+        assert prefetcher.candidates("p0", ordered) == ["p1", "p2"]
+        assert prefetcher.candidates("other", ordered, ["p3"]) == ["p3"]
+
+    def test_switch_is_a_cache_hit(self, backend):
+        cache = CachedStorage(backend)
+        prefetcher = Prefetcher(cache, neighbours=1)
+        prefetcher.hint("p2", ["p0", "p1", "p2", "p3"])
+        assert prefetcher.run_pending() == 2
+        assert "p1" in cache and "p3" in cache
+        assert cache.stats.misses == 0
+
+        loads = backend.loads
+        assert cache.load_process("p3")["persist_v"] == 3
+        assert cache.get_process_info("p3")["seq"] == backend.get_process_info("p3")["seq"]
+        assert backend.loads == loads
+        assert cache.stats.prefetch_hits == 2
+        # Entries that were used no longer count against the prefetch budget
+        assert 0 < cache.prefetched_bytes < cache.current_bytes
+
+    def test_budget_drops_oldest_unused_prefetches(self, backend):
+        cache = CachedStorage(backend)
+        prefetcher = Prefetcher(cache, max_bytes=6000, neighbours=5)
+        prefetcher.hint("p0", ["p0", "p1", "p2", "p3", "p4", "p5"])
+        prefetcher.run_pending()
+        assert cache.prefetched_bytes <= 6000
+        assert "p5" in cache and "p1" not in cache
+        assert cache.stats.prefetches == 5
+
+        # Too large for the budget at all
+        assert cache.prefetch("p0", max_bytes=10) is False
+
+    def test_write_during_prefetch_discards_the_value(self, backend):
+        cache = CachedStorage(backend)
+        backend.release.clear()
+        result = []
+        thread = threading.Thread(target=lambda: result.append(cache.prefetch("p1", 10_000)))
+        thread.start()
+        cache.save_process("p1", {"persist_v": 100})
+        backend.release.set()
+        thread.join()
+        assert result == [False]
+        assert cache.load_process("p1") == {"persist_v": 100}
+
+    def test_hint_never_waits_for_the_backend(self, backend):
+        cache = CachedStorage(backend)
+        prefetcher = Prefetcher(cache, neighbours=1)
+        prefetcher.start()
+        try:
+            backend.release.clear()
+            start = time.monotonic()
+            prefetcher.hint("p1", ["p0", "p1", "p2"])
+            prefetcher.hint("p4", ["p3", "p4", "p5"])
+            assert time.monotonic() - start < 0.5
+            backend.release.set()
+            deadline = time.monotonic() + 5
+            while prefetcher.stats.loaded < 4 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert all(name in cache for name in ("p0", "p2", "p3", "p5"))
+        finally:
+            backend.release.set()
+            prefetcher.stop(timeout=5)
+
+    def test_manager_copies_cached_payloads(self, backend):
+        backend.save_process("p1", {"persist_tags": ["a"]})
+        cache = CachedStorage(backend)
+        manager = StreamlitSessionManager(Path(backend.base_path), storage=cache)
+        session = {}
+        manager.sync_session(session, "p1")
+        session["persist_tags"].append("b")
+        assert cache.load_process("p1") == {"persist_tags": ["a"]}
+
+        session["persist_tags"] = ["c"]
+        manager.save_keys(session, "p1", ["persist_tags"])
+        assert cache.load_process("p1") == {"persist_tags": ["c"]}
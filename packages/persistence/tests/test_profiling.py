@@ -0,0 +1,38 @@
+import pstats
+import pytest
+import tempfile
+from pathlib import Path
+
+from persistence import RerunProfiler, SimpleStorage
+
+
+class TestRerunProfiler:
+    """Test cases for per-rerun profiling."""
+
+    @pytest.fixture
+    def temp_dir(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    def test_writes_pstats_and_summary(self, temp_dir):
+        storage = SimpleStorage(temp_dir / "data")
+        with RerunProfiler(temp_dir / "logs", "ワークスペース page", top_n=5) as profiler:
+            storage.save_process("p1", {"persist_a": 1})
+
+        assert profiler.stats_path is not None and profiler.stats_path.exists()
+        assert "save_process" in profiler.summary
+        summaries = list((temp_dir / "logs").glob("profile_ワークスペース_page_*.txt"))
+        assert len(summaries) == 1
+        # The dump must be loadable by pstats
+        pstats.Stats(str(profiler.stats_path))
+
+    def test_trace_memory(self, temp_dir):
+        with RerunProfiler(temp_dir, "mem", trace_memory=True) as profiler:
+            _ = [bytearray(1024) for _ in range(100)]
+        assert "tracemalloc peak" in profiler.summary
+
+    def test_reports_written_when_block_raises(self, temp_dir):
+        with pytest.raises(RuntimeError):
+            with RerunProfiler(temp_dir, "boom") as profiler:
+                raise RuntimeError("stop")
+        assert profiler.summary is not None
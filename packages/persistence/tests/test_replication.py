@@ -0,0 +1,151 @@
+import pytest
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from persistence import (
+    AggregateView,
+    ReadOnlyStorage,
+    ReadOnlyStorageError,
+    SimpleStorage,
+    SnapshotPublisher,
+    StaleReplicaError,
+    StorageMigrator,
+)
+
+
+class TestReplication:
+    """Test cases for snapshot shipping to read-only replicas."""
+
+    @pytest.fixture
+    def temp_dir(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    @pytest.fixture
+    def storage(self, temp_dir):
+        storage = SimpleStorage(temp_dir / "primary")
+        storage.save_process("p1", {"persist_name": "tanaka", "persist_進捗率": 10})
+        storage.save_process("p2", {"persist_name": "suzuki", "persist_array": np.arange(5)})
+        return storage
+
+    def test_snapshot_then_increments(self, storage, temp_dir):
+        publisher = SnapshotPublisher(storage, temp_dir / "replica")
+        assert publisher.publish() == 2
+        replica = ReadOnlyStorage(temp_dir / "replica", check_interval=0)
+        assert sorted(replica.list_processes()) == ["p1", "p2"]
+        np.testing.assert_array_equal(replica.load_process("p2")["persist_array"], np.arange(5))
+
+        storage.update_process("p1", {"persist_name": "sato"})
+        storage.save_process("p3", {"persist_name": "kato"})
+        storage.delete_process("p2")
+        # Not visible until published
+        assert replica.load_process("p1")["persist_name"] == "tanaka"
+
+        assert publisher.publish() == 3
+        assert replica.load_process("p1")["persist_name"] == "sato"
+        assert sorted(replica.list_processes()) == ["p1", "p3"]
+        assert replica.process_exists("p2") is False
+        assert replica.search_processes("p3") == ["p3"]
+        assert replica.last_seq == storage.last_seq
+        assert len(list((temp_dir / "replica").glob("increment-*.json.gz"))) == 1
+
+        # Nothing changed: only the manifest is rewritten
+        assert publisher.publish() == 0
+
+    def test_new_snapshot_replaces_increments_and_prunes(self, storage, temp_dir):
+        publisher = SnapshotPublisher(storage, temp_dir / "replica", snapshot_every=2)
+        publisher.publish()
+        for i in range(6):
+            storage.update_process("p1", {"persist_進捗率": i})
+            publisher.publish()
+        replica_files = {path.name for path in (temp_dir / "replica").glob("*.json.gz")}
+        # Current generation plus the previous one
+        assert len([name for name in replica_files if name.startswith("snapshot-")]) == 2
+        assert len(replica_files) <= 5
+
+        replica = ReadOnlyStorage(temp_dir / "replica")
+        assert replica.load_process("p1")["persist_進捗率"] == 5
+
+        # A reader that was on an older snapshot picks up the new one
+        storage.save_process("p2", {"persist_array": np.zeros(3)})
+        for _ in range(3):
+            storage.update_process("p1", {"persist_name": "sato"})
+            publisher.publish()
+        replica.refresh()
+        assert replica.load_process("p1")["persist_name"] == "sato"
+        np.testing.assert_array_equal(replica.load_process("p2")["persist_array"], np.zeros(3))
+        sidecars = temp_dir / "replica" / "sidecars"
+        assert len(list(sidecars.glob("*/*.npy"))) == 2
+
+        # The array file p2 no longer references is removed one full snapshot later
+        for i in range(3):
+            storage.update_process("p1", {"persist_進捗率": i})
+            publisher.publish()
+        assert len(list(sidecars.glob("*/*.npy"))) == 1
+
+    def test_listeners_and_aggregates_follow_the_replica(self, storage, temp_dir):
+        publisher = SnapshotPublisher(storage, temp_dir / "replica")
+        publisher.publish()
+        replica = ReadOnlyStorage(temp_dir / "replica", check_interval=0)
+        view = AggregateView(replica)
+        assert view.summary().total == 2
+
+        storage.save_process("p3", {"persist_進捗率": 50})
+        publisher.publish()
+        replica.refresh()
+        assert view.summary().total == 3
+
+    def test_archived_processes_are_readable(self, storage, temp_dir):
+        storage.data["p1"]["last_updated"] = (datetime.now() - timedelta(days=30)).isoformat()
+        storage.archive_idle(timedelta(days=7))
+        SnapshotPublisher(storage, temp_dir / "replica").publish()
+
+        replica = ReadOnlyStorage(temp_dir / "replica")
+        assert replica.list_processes() == ["p2"]
+        assert replica.list_archived_processes() == ["p1"]
+        assert replica.load_process("p1")["persist_name"] == "tanaka"
+
+    def test_archived_sidecars_are_shipped_and_kept(self, storage, temp_dir):
+        publisher = SnapshotPublisher(storage, temp_dir / "replica", snapshot_every=1)
+        publisher.publish()
+        storage.save_process("old", {"persist_array": np.arange(3)})
+        storage.data["old"]["last_updated"] = (datetime.now() - timedelta(days=30)).isoformat()
+        storage.archive_idle(timedelta(days=7))
+        assert storage.list_archived_processes() == ["old"]
+        # 全体スナップショットを何度か挟んでも、アーカイブ済みプロセスの配列は残る
+        for i in range(4):
+            storage.save_process("p1", {"persist_進捗率": i})
+            publisher.publish()
+
+        replica = ReadOnlyStorage(temp_dir / "replica")
+        np.testing.assert_array_equal(replica.load_process("old")["persist_array"], np.arange(3))
+
+    def test_writes_are_rejected(self, storage, temp_dir):
+        SnapshotPublisher(storage, temp_dir / "replica").publish()
+        replica = ReadOnlyStorage(temp_dir / "replica")
+        with pytest.raises(ReadOnlyStorageError):
+            replica.save_process("p1", {})
+        with pytest.raises(ReadOnlyStorageError):
+            replica.delete_process("p1")
+        assert replica.load_process("p1")["persist_name"] == "tanaka"
+
+    def test_max_staleness(self, storage, temp_dir):
+        publisher = SnapshotPublisher(storage, temp_dir / "replica")
+        publisher.publish()
+        replica = ReadOnlyStorage(temp_dir / "replica", check_interval=0, max_staleness=60)
+        assert replica.load_process("p1") is not None
+
+        replica._published_at = datetime.now() - timedelta(seconds=61)
+        replica.check_interval = 3600
+        with pytest.raises(StaleReplicaError):
+            replica.load_process("p1")
+
+    def test_replica_can_be_migrated_from(self, storage, temp_dir):
+        SnapshotPublisher(storage, temp_dir / "replica").publish()
+        target = SimpleStorage(temp_dir / "report")
+        report = StorageMigrator(ReadOnlyStorage(temp_dir / "replica"), target).run()
+        assert report.ok and sorted(report.copied) == ["p1", "p2"]
+        assert target.get_process_info("p1")["created"] == storage.get_process_info("p1")["created"]
@@ -0,0 +1,88 @@
+import pytest
+import tempfile
+import json
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from persistence import RetentionEngine, RetentionRule, SimpleStorage
+
+
+def backdate(storage, process_name, days):
+    storage.data[process_name]["last_updated"] = (datetime.now() - timedelta(days=days)).isoformat()
+
+
+class TestRetention:
+    """Test cases for retention rules and the expiry index."""
+
+    @pytest.fixture
+    def storage(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            storage = SimpleStorage(Path(temp_dir))
+            storage.save_process("idle", {"persist_ステータス": "実行中"})
+            storage.save_process("done", {"persist_ステータス": "完了"})
+            storage.save_process("fresh", {"persist_ステータス": "完了"})
+            backdate(storage, "idle", 100)
+            backdate(storage, "done", 10)
+            yield storage
+
+    @pytest.fixture
+    def rules(self):
+        return [
+            RetentionRule(max_age=timedelta(days=90)),
+            RetentionRule(max_age=timedelta(days=7), statuses=frozenset({"完了"})),
+        ]
+
+    def test_dry_run_reports_without_deleting(self, storage, rules):
+        engine = RetentionEngine(storage, rules)
+        report = engine.sweep(dry_run=True)
+
+        assert [item.process_name for item in report.expired] == ["idle", "done"]
+        assert report.deleted == []
+        assert "Would delete 2 processes" in report.format()
+        assert len(storage.list_processes()) == 3
+
+    def test_sweep_deletes_only_expired(self, storage, rules):
+        engine = RetentionEngine(storage, rules)
+        report = engine.sweep()
+
+        assert sorted(report.deleted) == ["done", "idle"]
+        assert storage.list_processes() == ["fresh"]
+        assert engine.sweep().deleted == []
+
+    def test_index_follows_saves(self, storage, rules):
+        engine = RetentionEngine(storage, rules)
+        # Reopening a completed process removes it from the status rule index
+        storage.save_process("done", {"persist_ステータス": "実行中"})
+        storage.delete_process("idle")
+        assert engine.expired() == []
+
+        storage.save_process("fresh", {"persist_ステータス": "完了"})
+        later = datetime.now() + timedelta(days=8)
+        assert [item.process_name for item in engine.expired(later)] == ["fresh"]
+        assert engine.next_expiry() is not None
+
+    def test_archived_processes_expire(self, storage):
+        storage.archive_idle(timedelta(days=30))
+        assert storage.list_archived_processes() == ["idle"]
+
+        engine = RetentionEngine(storage, [RetentionRule(max_age=timedelta(days=90))])
+        assert engine.sweep().deleted == ["idle"]
+        assert storage.process_exists("idle") is False
+
+    def test_status_rules_match_archived_processes_after_restart(self, storage, rules):
+        storage.archive_idle(timedelta(days=5))
+        assert sorted(storage.list_archived_processes()) == ["done", "idle"]
+        assert storage.get_archived_info("done")["fields"] == {"persist_ステータス": "完了"}
+
+        reopened = SimpleStorage(storage.base_path)
+        engine = RetentionEngine(reopened, [rules[1]])
+        assert [item.process_name for item in engine.expired()] == ["done"]
+
+        # Index entries written before fields existed are read from the segments
+        index_file = storage.base_path / "archive" / "index.json"
+        index = json.loads(index_file.read_text(encoding="utf-8"))
+        for entry in index.values():
+            del entry["fields"]
+        index_file.write_text(json.dumps(index), encoding="utf-8")
+        engine = RetentionEngine(SimpleStorage(storage.base_path), [rules[1]])
+        assert engine.sweep().deleted == ["done"]
@@ -0,0 +1,123 @@
+import os
+import pytest
+import tempfile
+import threading
+from datetime import datetime
+from decimal import Decimal
+from pathlib import Path
+
+from persistence import (
+    ChangeFeedGap,
+    RemoteStorage,
+    SimpleStorage,
+    StorageServer,
+    StreamlitSessionManager,
+    parse_address,
+)
+
+
+class TestStorageServer:
+    """Test cases for the storage server and the pooled client (same process)."""
+
+    @pytest.fixture
+    def server(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            storage = SimpleStorage(Path(temp_dir))
+            with StorageServer(storage) as server:
+                yield server
+
+    @pytest.fixture
+    def client(self, server):
+        client = RemoteStorage(server.address, pool_size=2)
+        yield client
+        client.close()
+
+    def test_storage_interface(self, client):
+        client.save_process("p1", {"persist_at": datetime(2025, 1, 1, 9, 0), "persist_price": Decimal("1.50")})
+        assert client.load_process("p1") == {"persist_at": datetime(2025, 1, 1, 9, 0), "persist_price": Decimal("1.50")}
+        assert client.list_processes() == ["p1"]
+        assert client.process_exists("p1") is True
+        assert client.get_process_info("p1")["seq"] == client.last_seq
+        assert client.search_processes("p") == ["p1"]
+        assert client.load_process("missing") is None
+
+        client.update_process("p1", {"persist_memo": "x"})
+        assert client.load_process("p1")["persist_memo"] == "x"
+        assert client.delete_process("p1") is True
+        assert client.delete_process("p1") is False
+
+    def test_clients_share_one_store(self, server, client):
+        other = RemoteStorage(server.address)
+        client.save_process("p1", {"persist_name": "tanaka"})
+        assert other.load_process("p1") == {"persist_name": "tanaka"}
+        assert [event.process_name for event in other.changes_since(0)] == ["p1"]
+        other.close()
+
+    def test_errors_are_raised_on_the_client(self, server, client):
+        with pytest.raises(ValueError):
+            client.save_process("p1", {"persist_bad": object()})
+        server.backend.change_feed.append("save", "x")
+        server.backend.change_feed.compact()
+        with pytest.raises(ChangeFeedGap):
+            client.changes_since(-1)
+
+    def test_batch_is_one_round_trip(self, client):
+        with client.batch() as batch:
+            batch.save_process("a", {"persist_n": 1})
+            batch.save_process("b", {"persist_n": 2})
+            batch.load_process("a")
+            batch.process_exists("c")
+        assert batch.results == [None, None, {"persist_n": 1}, False]
+
+        batch = client.batch()
+        batch.load_process("a")
+        batch.delete_process("missing")
+        assert batch.execute() == [{"persist_n": 1}, False]
+
+    def test_pool_handles_concurrent_callers(self, client):
+        errors = []
+
+        def worker(i):
+            try:
+                for j in range(20):
+                    client.save_process(f"p{i}", {"persist_n": j})
+                    assert client.load_process(f"p{i}") == {"persist_n": j}
+            except Exception as exc:  # pragma: no cover - reported below
+                errors.append(exc)
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert errors == []
+        assert sorted(client.list_processes()) == [f"p{i}" for i in range(6)]
+        assert len(client._idle) <= 2
+
+    def test_reconnects_after_server_restart(self, server, client):
+        client.save_process("p1", {"persist_n": 1})
+        address = server.address
+        server.stop()
+        with StorageServer(server.backend, address):
+            assert client.load_process("p1") == {"persist_n": 1}
+
+    @pytest.mark.skipif(not hasattr(os, "fork"), reason="Unix sockets only")
+    def test_unix_socket_and_manager(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            storage = SimpleStorage(Path(temp_dir) / "data")
+            address = parse_address(f"unix:{temp_dir}/storage.sock")
+            with StorageServer(storage, address):
+                manager = StreamlitSessionManager(Path(temp_dir) / "unused", storage=RemoteStorage(address))
+                manager.storage.save_process("p1", {"persist_name": "tanaka"})
+                session = {}
+                assert manager.sync_session(session, "p1") is True
+                session["persist_name"] = "sato"
+                assert manager.save_session(session, "p1") is True
+                assert storage.load_process("p1") == {"persist_name": "sato"}
+                assert manager.list_processes() == ["p1"]
+
+    def test_parse_address(self):
+        assert parse_address("127.0.0.1:8765") == ("127.0.0.1", 8765)
+        assert parse_address("unix:/tmp/s.sock") == "/tmp/s.sock"
+        with pytest.raises(ValueError):
+            parse_address("localhost")
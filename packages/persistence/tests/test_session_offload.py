@@ -0,0 +1,131 @@
+import pytest
+import tempfile
+from pathlib import Path
+
+import numpy as np
+
+from persistence import SessionOffloader, StreamlitSessionManager
+from persistence.streamlit_helpers import LOADED_MARKER_KEY
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestSessionOffloader:
+    """Test cases for releasing idle sessions' persisted values."""
+
+    @pytest.fixture
+    def manager(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manager = StreamlitSessionManager(Path(temp_dir))
+            manager.storage.save_process("p1", {"persist_name": "tanaka"})
+            manager.storage.save_process("p2", {"persist_array": np.zeros(1000)})
+            yield manager
+
+    def test_idle_session_is_released_and_reloaded(self, manager):
+        clock = FakeClock()
+        offloader = SessionOffloader(manager, idle_after=60, check_interval=0, clock=clock)
+        session = {"other_widget": 1}
+        manager.sync_session(session, "p1")
+        offloader.touch("s1", session)
+
+        clock.now = 61
+        assert offloader.sweep() == ["s1"]
+        assert "persist_name" not in session
+        assert LOADED_MARKER_KEY not in session
+        assert session["other_widget"] == 1
+        assert len(offloader) == 0
+
+        # Next interaction reloads transparently
+        assert manager.sync_session(session, "p1") is True
+        assert session["persist_name"] == "tanaka"
+
+    def test_sweep_never_writes(self, manager):
+        clock = FakeClock()
+        offloader = SessionOffloader(manager, idle_after=60, check_interval=0, clock=clock)
+        idle, active = {}, {}
+        manager.sync_session(idle, "p1")
+        offloader.touch("idle", idle)
+        manager.sync_session(active, "p1")
+
+        # Another tab saves while the first one is idle; its sweep drops the stale values
+        clock.now = 61
+        active["persist_name"] = "sato"
+        manager.save_session(active, "p1")
+        offloader.touch("active", active)
+        assert offloader.released_total == 1
+        assert manager.storage.load_process("p1") == {"persist_name": "sato"}
+        assert manager.sync_session(idle, "p1") is True
+        assert idle["persist_name"] == "sato"
+
+        # Unsaved edits keep a session resident until its own rerun saves them
+        seq = manager.storage.last_seq
+        idle["persist_name"] = "suzuki"
+        offloader.touch("idle", idle)
+        clock.now = 200
+        assert offloader.sweep() == ["active"]
+        assert manager.storage.last_seq == seq
+        assert idle["persist_name"] == "suzuki" and len(offloader) == 1
+        manager.save_session(idle, "p1")
+        assert offloader.sweep() == ["idle"]
+
+    def test_closed_sessions_are_forgotten(self, manager):
+        open_sessions = {"s1", "s2"}
+        offloader = SessionOffloader(manager, idle_after=float("inf"), check_interval=0, is_active=open_sessions.__contains__)
+        sessions = {"s1": {}, "s2": {}}
+        for session_id, session in sessions.items():
+            manager.sync_session(session, "p1")
+            offloader.touch(session_id, session)
+        open_sessions.discard("s1")
+        assert offloader.sweep() == []
+        assert len(offloader) == 1
+        assert sessions["s1"]["persist_name"] == "tanaka"
+
+    def test_values_sent_with_the_waking_interaction_win(self, manager):
+        session = {}
+        manager.sync_session(session, "p1")
+        manager.release_session(session)
+
+        # The widget value arrives before the page reloads the process
+        session["persist_name"] = "suzuki"
+        assert manager.save_session(session, "p1") is True
+        assert manager.storage.load_process("p1") == {"persist_name": "suzuki"}
+        assert manager.sync_session(session, "p1") is False
+
+    def test_waking_session_keeps_other_sessions_saves(self, manager):
+        manager.storage.save_process("p1", {"persist_x": 1, "persist_y": "a"})
+        released, other = {}, {}
+        manager.sync_session(released, "p1")
+        manager.sync_session(other, "p1")
+        assert manager.release_session(released) is True
+
+        other["persist_x"] = 2
+        assert manager.save_session(other, "p1") is True
+
+        # Waking sends every widget value back: persist_x unchanged (stale), persist_y edited
+        released.update({"persist_x": 1, "persist_y": "b"})
+        manager.sync_session(released, "p1")
+        assert released["persist_x"] == 2
+        assert manager.save_session(released, "p1") is True
+        assert manager.storage.load_process("p1") == {"persist_x": 2, "persist_y": "b"}
+
+    def test_size_cap_releases_least_recently_active(self, manager):
+        clock = FakeClock()
+        offloader = SessionOffloader(manager, idle_after=3600, max_resident_bytes=9000, check_interval=0, clock=clock)
+        sessions = {}
+        for session_id in ("s1", "s2", "s3"):
+            sessions[session_id] = {}
+            manager.sync_session(sessions[session_id], "p2")
+            offloader.touch(session_id, sessions[session_id])
+            clock.now += 1
+        # Each session holds an 8000 byte array: only the most recent one stays
+        assert offloader.resident_bytes == 8000
+        assert "persist_array" not in sessions["s1"]
+        assert "persist_array" not in sessions["s2"]
+        assert "persist_array" in sessions["s3"]
+        assert offloader.released_total == 2
@@ -0,0 +1,110 @@
+import pytest
+import tempfile
+from pathlib import Path
+
+from persistence import StreamlitSessionManager
+from persistence.streamlit_helpers import BASE_KEY, LOADED_MARKER_KEY
+
+
+class TestSessionSync:
+    """Test cases for loading process data once per selection."""
+
+    @pytest.fixture
+    def manager(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            manager = StreamlitSessionManager(Path(temp_dir))
+            manager.storage.save_process("p1", {"persist_name": "tanaka"})
+            manager.storage.save_process("p2", {"persist_memo": "two"})
+            yield manager
+
+    def test_loads_only_when_selection_or_version_changes(self, manager):
+        session = {}
+        assert manager.sync_session(session, "p1") is True
+        assert session["persist_name"] == "tanaka"
+
+        # User edits are not overwritten by later reruns
+        session["persist_name"] = "sato"
+        assert manager.sync_session(session, "p1") is False
+        assert session["persist_name"] == "sato"
+
+        # Another writer changed the stored version
+        manager.storage.save_process("p1", {"persist_name": "suzuki"})
+        assert manager.sync_session(session, "p1") is True
+        assert session["persist_name"] == "suzuki"
+
+    def test_save_skips_unchanged_and_foreign_data(self, manager):
+        session = {}
+        manager.sync_session(session, "p1")
+        seq = manager.storage.last_seq
+
+        assert manager.save_session(session, "p1") is False
+        # Session holds p1's data, so it must never be written into p2
+        assert manager.save_session(session, "p2") is False
+        assert manager.storage.last_seq == seq
+
+        session["persist_name"] = "sato"
+        assert manager.save_session(session, "p1") is True
+        assert manager.storage.load_process("p1") == {"persist_name": "sato"}
+        # Our own save does not trigger a reload
+        assert manager.sync_session(session, "p1") is False
+
+    def test_stale_session_does_not_overwrite_newer_saves(self, manager):
+        # Two tabs on the same process, each rerun saves first and syncs after (as the pages do)
+        manager.storage.save_process("p1", {"persist_a": 1, "persist_b": 1})
+        tab_a, tab_b = {}, {}
+        manager.sync_session(tab_a, "p1")
+        manager.sync_session(tab_b, "p1")
+
+        tab_b["persist_b"] = 2
+        assert manager.save_session(tab_b, "p1") is True
+
+        # A reruns without edits: nothing is written, then it picks up B's save
+        assert manager.save_session(tab_a, "p1") is False
+        assert manager.sync_session(tab_a, "p1") is True
+        assert tab_a["persist_b"] == 2
+
+        # Concurrent edits of different keys are merged
+        tab_a["persist_a"] = 3
+        tab_b["persist_b"] = 4
+        assert manager.save_keys(tab_b, "p1", ["persist_a", "persist_b"]) == ["persist_b"]
+        assert manager.save_session(tab_a, "p1") is True
+        assert manager.storage.load_process("p1") == {"persist_a": 3, "persist_b": 4}
+        # A's marker stays stale so its next sync loads the merged data
+        assert manager.sync_session(tab_a, "p1") is True
+        assert (tab_a["persist_a"], tab_a["persist_b"]) == (3, 4)
+
+    def test_switch_saves_previous_then_loads_next(self, manager):
+        session = {"other_widget": 1}
+        manager.sync_session(session, "p1")
+        session["persist_name"] = "sato"
+
+        manager.switch_process(session, "p2")
+
+        assert manager.storage.load_process("p1") == {"persist_name": "sato"}
+        assert session == {
+            "other_widget": 1,
+            "persist_memo": "two",
+            BASE_KEY: {"persist_memo": "two"},
+            LOADED_MARKER_KEY: ("p2", manager.get_process_version("p2")),
+        }
+        assert manager.loaded_process(session) == "p2"
+
+    def test_save_keys_merges_only_given_keys(self, manager):
+        session = {}
+        manager.sync_session(session, "p1")
+        session["persist_name"] = "sato"
+        session["persist_task1"] = True
+
+        # Only the fragment's keys are written; the other edit stays unsaved
+        assert manager.save_keys(session, "p1", ["persist_task1"]) == ["persist_task1"]
+        assert manager.storage.load_process("p1") == {"persist_name": "tanaka", "persist_task1": True}
+
+        # Unchanged keys are not written again and the session is not reloaded
+        seq = manager.storage.last_seq
+        assert manager.save_keys(session, "p1", ["persist_task1"]) == []
+        assert manager.storage.last_seq == seq
+        assert manager.sync_session(session, "p1") is False
+        assert session["persist_name"] == "sato"
+
+        # Session holding another process is never written
+        assert manager.save_keys(session, "p2", ["persist_task1"]) == []
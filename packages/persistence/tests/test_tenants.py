@@ -0,0 +1,126 @@
+import pytest
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from persistence import (
+    QuotaExceededError,
+    SaveRateLimitedError,
+    SimpleStorage,
+    TenantQuota,
+    TenantRegistry,
+    TenantStorage,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+        self.slept = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept.append(seconds)
+        self.now += seconds
+
+
+class TestTenants:
+    """Test cases for per-tenant storage and quotas."""
+
+    @pytest.fixture
+    def temp_path(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    def test_tenants_are_isolated(self, temp_path):
+        registry = TenantRegistry(temp_path)
+        registry.storage("acme").save_process("weekly", {"persist_owner": "acme"})
+        registry.storage("globex").save_process("weekly", {"persist_owner": "globex"})
+
+        assert registry.storage("acme").load_process("weekly") == {"persist_owner": "acme"}
+        assert registry.storage("globex").load_process("weekly") == {"persist_owner": "globex"}
+        assert registry.storage("acme").backend is not registry.storage("globex").backend
+        assert (temp_path / "tenants" / "acme" / "processes.json").exists()
+        assert registry.tenants() == ["acme", "globex"]
+        for name in ("", "../x", "a/b", "a b"):
+            with pytest.raises(ValueError):
+                registry.storage(name)
+
+    def test_max_processes_only_limits_new_processes(self, temp_path):
+        storage = TenantStorage("acme", SimpleStorage(temp_path), TenantQuota(max_processes=2))
+        storage.save_process("p1", {"persist_v": 1})
+        storage.save_process("p2", {"persist_v": 2})
+        with pytest.raises(QuotaExceededError) as raised:
+            storage.save_process("p3", {"persist_v": 3})
+        assert raised.value.quota == "max_processes"
+        storage.update_process("p1", {"persist_v": 10})
+        assert not storage.process_exists("p3")
+
+        # Archived processes still count; deleting frees a slot
+        storage.archive_idle(older_than=timedelta(0), now=datetime.now() + timedelta(days=1))
+        with pytest.raises(QuotaExceededError):
+            storage.import_processes({"p3": {"session_data": {}}, "p4": {"session_data": {}}})
+        assert storage.delete_process("p2")
+        storage.save_process("p3", {"persist_v": 3})
+        usage = storage.usage()
+        assert (usage.processes, usage.saves, usage.rejected) == (2, 4, 2)
+
+    def test_max_bytes_counts_stored_payloads(self, temp_path):
+        storage = TenantStorage("acme", SimpleStorage(temp_path), TenantQuota(max_bytes=1000))
+        storage.save_process("small", {"persist_text": "x" * 100})
+        assert 100 < storage.usage().bytes < 200
+        storage.save_process("large", {"persist_text": "長" * 400})
+        with pytest.raises(QuotaExceededError) as raised:
+            storage.save_process("small", {"persist_text": "y"})
+        assert raised.value.quota == "max_bytes"
+
+        storage.delete_process("large")
+        storage.save_process("small", {"persist_text": "y"})
+        assert storage.usage().bytes < 50
+        # Usage is measured again when the storage is reopened
+        assert TenantStorage("acme", SimpleStorage(temp_path)).usage().bytes == storage.usage().bytes
+
+    def test_save_rate_waits_then_rejects(self, temp_path):
+        clock = FakeClock()
+        quota = TenantQuota(saves_per_second=2, save_burst=2, max_wait=0.5)
+        storage = TenantStorage("acme", SimpleStorage(temp_path), quota, clock=clock, sleep=clock.sleep)
+        storage.save_process("p", {"persist_v": 1})
+        storage.save_process("p", {"persist_v": 2})
+        assert clock.slept == []
+        storage.save_process("p", {"persist_v": 3})
+        assert clock.slept == [0.5]
+        # Each imported record takes a token: two would need a 1s wait
+        with pytest.raises(SaveRateLimitedError) as raised:
+            storage.import_processes({"q1": {"session_data": {}}, "q2": {"session_data": {}}})
+        assert raised.value.retry_after == pytest.approx(1.0)
+        assert storage.list_processes() == ["p"]
+
+        clock.now += 1
+        storage.save_process("p", {"persist_v": 4})
+        usage = storage.usage()
+        assert (usage.saves, usage.rejected, usage.throttled) == (4, 1, 1)
+
+    def test_managers_keep_tenants_apart_in_one_session(self, temp_path):
+        registry = TenantRegistry(temp_path)
+        registry.storage("acme").save_process("weekly", {"persist_owner": "acme"})
+        registry.storage("globex").save_process("weekly", {"persist_owner": "globex"})
+        registry.set_quota("globex", TenantQuota(max_bytes=10))
+        acme = registry.manager("acme", undo_max_bytes=10_000)
+        globex = registry.manager("globex", undo_max_bytes=10_000)
+        assert registry.manager("acme") is acme
+
+        session = {}
+        acme.sync_session(session, "weekly")
+        assert globex.loaded_process(session) is None
+        assert globex.sync_session(session, "weekly")
+        assert session["persist_owner"] == "globex"
+
+        # A rejected save leaves neither stored data nor an undo step behind
+        session["persist_owner"] = "changed"
+        with pytest.raises(QuotaExceededError):
+            globex.save_session(session, "weekly")
+        assert registry.storage("globex").load_process("weekly") == {"persist_owner": "globex"}
+        assert not globex.undo_history(session, "weekly").can_undo
+        assert registry.usage()["globex"].rejected == 1
@@ -0,0 +1,187 @@
+import pytest
+import tempfile
+from datetime import date
+from pathlib import Path
+
+from persistence import KeyRegistry, StreamlitSessionManager, UndoHistory, UndoStore
+from persistence.codecs import CodecRegistry
+from persistence.undo import MISSING, KeyChange
+
+
+def make_registry() -> KeyRegistry:
+    keys = KeyRegistry()
+
+    @keys.schema
+    class Schema:
+        persist_name: str = ""
+        persist_progress: int = 0
+
+    return keys
+
+
+class TestUndoHistory:
+    """Test cases for the undo ring buffer."""
+
+    def test_undo_redo_and_new_edit_drops_redo(self):
+        history = UndoHistory()
+        history.record([KeyChange("a", 1, 2)])
+        history.record([KeyChange("a", 2, 3), KeyChange("b", MISSING, "x")])
+
+        assert history.undo() == {"a": 2, "b": MISSING}
+        assert history.undo() == {"a": 1}
+        assert history.undo() is None
+        assert history.redo() == {"a": 2}
+        assert history.can_redo
+
+        history.record([KeyChange("a", 2, 5)])
+        assert not history.can_redo
+        assert history.undo() == {"a": 2}
+
+    def test_byte_and_step_limits_drop_oldest_steps(self):
+        history = UndoHistory(max_bytes=10_000, max_steps=3)
+        for i in range(5):
+            history.record([KeyChange("a", i, i + 1)])
+        assert len(history) == 3
+        assert history.undo() == {"a": 4}
+
+        history = UndoHistory(max_bytes=5_000)
+        for i in range(10):
+            history.record([KeyChange("text", "x" * 1000, "y" * 1000)])
+        assert history.size <= 5_000
+        assert 1 <= len(history) < 10
+
+        # A single step over the limit clears the history
+        history.record([KeyChange("text", "x", "z" * 10_000)])
+        assert len(history) == 0 and history.size == 0
+
+    def test_recorded_values_are_copies(self):
+        history = UndoHistory()
+        value = ["a"]
+        history.record([KeyChange("tags", [], value)])
+        value.append("b")
+        history.undo()
+        assert history.redo() == {"tags": ["a"]}
+
+    def test_store_round_trip(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            store = UndoStore(Path(temp_dir))
+            history = UndoHistory()
+            history.record([KeyChange("due", MISSING, date(2025, 1, 6)), KeyChange("note", None, "x")])
+            history.record([KeyChange("note", "x", "y")])
+            history.undo()
+            assert store.save("週次 1", history)
+
+            loaded = store.load("週次 1")
+            assert loaded is not None and len(loaded) == 1 and loaded.can_redo
+            assert loaded.redo() == {"note": "y"}
+            loaded.undo()
+            assert loaded.undo() == {"note": None, "due": MISSING}
+            assert store.load("other") is None
+
+            store.delete("週次 1")
+            assert store.load("週次 1") is None
+
+    def test_to_dict_rejects_values_without_codec(self):
+        history = UndoHistory()
+        history.record([KeyChange("obj", None, object())])
+        with pytest.raises(TypeError):
+            history.to_dict(CodecRegistry.default())
+
+
+class TestSessionUndo:
+    """Test cases for undo/redo through the session manager."""
+
+    @pytest.fixture
+    def temp_path(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield Path(temp_dir)
+
+    def test_saves_are_recorded_and_undone(self, temp_path):
+        manager = StreamlitSessionManager(temp_path, keys=make_registry(), undo_max_bytes=64 * 1024)
+        manager.storage.save_process("p1", {"persist_name": "tanaka"})
+        session = {}
+        manager.sync_session(session, "p1")
+        # Filling in defaults is not an edit
+        assert manager.save_session(session, "p1") is True
+        assert not manager.undo_history(session, "p1").can_undo
+
+        session["persist_name"] = ""
+        manager.save_session(session, "p1")
+        session["persist_progress"] = 40
+        manager.save_keys(session, "p1", ["persist_progress"])
+
+        assert manager.undo(session, "p1") == ["persist_progress"]
+        assert session["persist_progress"] == 0
+        assert manager.undo(session, "p1") == ["persist_name"]
+        assert session["persist_name"] == "tanaka"
+        assert manager.storage.load_process("p1")["persist_name"] == "tanaka"
+        assert manager.undo(session, "p1") == []
+
+        assert manager.redo(session, "p1") == ["persist_name"]
+        assert session["persist_name"] == ""
+        # Restored values are already stored: the next save is a no-op
+        assert manager.save_session(session, "p1") is False
+
+    def test_unsaved_edit_is_the_one_undone(self, temp_path):
+        manager = StreamlitSessionManager(temp_path, undo_max_bytes=64 * 1024)
+        manager.storage.save_process("p1", {"persist_name": "tanaka"})
+        session = {}
+        manager.sync_session(session, "p1")
+        session["persist_name"] = "sato"
+        session["persist_new"] = 1
+
+        assert sorted(manager.undo(session, "p1")) == ["persist_name", "persist_new"]
+        assert session["persist_name"] == "tanaka"
+        assert "persist_new" not in session
+        assert manager.storage.load_process("p1") == {"persist_name": "tanaka"}
+
+    def test_history_is_persisted_per_process(self, temp_path):
+        store = UndoStore(temp_path / "undo")
+        manager = StreamlitSessionManager(temp_path, undo_max_bytes=64 * 1024, undo_store=store)
+        manager.storage.save_process("p1", {"persist_name": "tanaka"})
+        manager.storage.save_process("p2", {"persist_name": "suzuki"})
+        session = {}
+        manager.sync_session(session, "p1")
+        session["persist_name"] = "sato"
+        manager.save_session(session, "p1")
+        manager.switch_process(session, "p2")
+        assert not manager.undo_history(session, "p2").can_undo
+
+        # A new session (e.g. another tab) can undo the edit
+        other = {}
+        manager.sync_session(other, "p1")
+        assert manager.undo(other, "p1") == ["persist_name"]
+        assert manager.storage.load_process("p1") == {"persist_name": "tanaka"}
+
+        manager.delete_process("p1")
+        assert store.load("p1") is None
+
+    def test_recreated_process_has_nothing_to_undo(self, temp_path):
+        store = UndoStore(temp_path / "undo")
+        manager = StreamlitSessionManager(temp_path, undo_max_bytes=64 * 1024, undo_store=store)
+        for name in ("p1", "p2"):
+            manager.storage.save_process(name, {"persist_name": "tanaka"})
+        session = {}
+        manager.sync_session(session, "p1")
+        session["persist_name"] = "sato"
+        manager.save_session(session, "p1")
+        manager.switch_process(session, "p2")
+
+        # Deleted by someone else (e.g. a retention sweep), then created again
+        assert manager.storage.delete_process("p1")
+        assert store.load("p1") is None
+        manager.storage.save_process("p1", {"persist_name": "suzuki"})
+        other = {}
+        manager.sync_session(other, "p1")
+        assert not manager.undo_history(other, "p1").can_undo
+        assert manager.undo(other, "p1") == []
+
+    def test_disabled_by_default(self, temp_path):
+        manager = StreamlitSessionManager(temp_path)
+        manager.storage.save_process("p1", {"persist_name": "tanaka"})
+        session = {}
+        manager.sync_session(session, "p1")
+        session["persist_name"] = "sato"
+        manager.save_session(session, "p1")
+        assert manager.undo_history(session, "p1") is None
+        assert manager.undo(session, "p1") == []
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+パーティション追加スクリプト
+PERSISTENCE_PARTITIONS で分割したデータディレクトリに partition-<n> を1つ追加し、
+新しいパーティションが担当するプロセスだけを移動します。アプリを止めてから実行し、
+終わったら PERSISTENCE_PARTITIONS を1つ増やして起動してください。
+
+    python scripts/add_partition.py 2                       # partition-0..1 に partition-2 を追加
+    python scripts/add_partition.py 2 --data /srv/processes
+
+途中で止まった場合は、増やした数で開き直したときに残りの移動が行われます。
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add packages to path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir / "packages" / "persistence" / "src"))
+
+from persistence import PartitionedStorage, SimpleStorage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="パーティションを1つ追加して再配置する")
+    parser.add_argument("current", type=int, help="現在のパーティション数 (PERSISTENCE_PARTITIONS)")
+    parser.add_argument("--data", type=Path, default=root_dir / "data" / "processes",
+                        help="データディレクトリ")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        storage = PartitionedStorage.from_paths([args.data / f"partition-{i}" for i in range(args.current)])
+    except ValueError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+    partition_id = f"partition-{args.current}"
+    try:
+        moved = storage.add_partition(partition_id, SimpleStorage(args.data / partition_id))
+    finally:
+        storage.close()
+    print(f"Added {partition_id}: moved {len(moved)} processes")
+    print(f"Set PERSISTENCE_PARTITIONS={args.current + 1} before starting the app")
+
+
+if __name__ == "__main__":
+    main()
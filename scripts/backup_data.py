@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+バックアップスクリプト
+アプリを止めずにデータディレクトリをバックアップします。初回は全体、以降は前回から変更された
+プロセスだけを保存します。復元先は空のディレクトリで、復元後に全プロセスのチェックサムを検証します。
+
+    python scripts/backup_data.py backup            # 増分 (初回は全体)
+    python scripts/backup_data.py backup --full     # 全体
+    python scripts/backup_data.py list
+    python scripts/backup_data.py verify [ID]
+    python scripts/backup_data.py restore 復元先 [--id ID]
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add packages to path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir / "packages" / "persistence" / "src"))
+
+from persistence import BackupStore, SimpleStorage
+
+
+def main():
+    parser = argparse.ArgumentParser(description="データディレクトリのオンライン増分バックアップ")
+    parser.add_argument("--data", type=Path, default=root_dir / "data" / "processes",
+                        help="データディレクトリ")
+    parser.add_argument("--backups", type=Path, default=root_dir / "data" / "backups",
+                        help="バックアップ先ディレクトリ")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backup_parser = commands.add_parser("backup", help="バックアップを取る")
+    backup_parser.add_argument("--full", action="store_true", help="前回があっても全体バックアップを取る")
+    commands.add_parser("list", help="バックアップの一覧")
+    verify_parser = commands.add_parser("verify", help="バックアップを検証する")
+    verify_parser.add_argument("id", nargs="?", help="バックアップID (省略時は最新)")
+    restore_parser = commands.add_parser("restore", help="空のディレクトリへ復元する")
+    restore_parser.add_argument("target", type=Path, help="復元先ディレクトリ")
+    restore_parser.add_argument("--id", help="バックアップID (省略時は最新)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    store = BackupStore(args.backups)
+
+    if args.command == "backup":
+        entry = store.backup(SimpleStorage(args.data), full=args.full)
+        if entry is None:
+            print("No changes since the last backup")
+        else:
+            print(f"Created {entry['kind']} backup {entry['id']} ({entry['changed']} processes)")
+    elif args.command == "list":
+        for entry in store.backups():
+            print(f"{entry['id']}  {entry['kind']:<11}  seq={entry['seq']:<8}  changed={entry['changed']}")
+    elif args.command == "verify":
+        report = store.verify(args.id)
+        print(report.format())
+        sys.exit(0 if report.ok else 1)
+    elif args.command == "restore":
+        report = store.restore(args.target, backup_id=args.id)
+        print(report.format())
+        sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
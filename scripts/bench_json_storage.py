@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+JsonStorage のスループット計測スクリプト
+N 件のプロセスを JsonStorage で保存・読み込みした時間に加えて、同じ処理を次の3段階に分けて計測し、
+モデル変換の時間をファイル I/O・JSON 処理それぞれと比べます。
+
+- ファイル I/O: エンコード済みのバイト列の書き込み / バイト列のままの読み込み
+- JSON: json.dumps + UTF-8 エンコード / json.loads
+- モデル変換: ProcessState.to_dict / from_dict
+
+読み込みは直前に書いたファイルなので OS のページキャッシュに載った状態の I/O です
+(ディスクから読む場合より I/O は小さく出ます)。
+"""
+
+import argparse
+import json
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add packages to path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir / "packages" / "persistence" / "src"))
+
+from persistence import AuditEntry, JsonStorage, ProcessState, ProcessStatus
+
+STATUSES = list(ProcessStatus)
+
+
+def make_process(i: int) -> ProcessState:
+    started_at = datetime(2025, 1, 1) + timedelta(hours=i)
+    return ProcessState(
+        process_id=f"process-{i:05d}",
+        week_number=i % 52 + 1,
+        year=2025,
+        status=STATUSES[i % len(STATUSES)],
+        started_at=started_at,
+        completed_at=started_at + timedelta(hours=3) if i % 3 == 0 else None,
+        data={"担当者名": f"担当{i}", "進捗率": i % 101, "説明": "説明" * 20},
+        audit_trail=[AuditEntry(started_at + timedelta(minutes=m), "update", {"step": m}) for m in range(5)],
+    )
+
+
+def timed(func) -> float:
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def report(label: str, count: int, total: float, phases: dict) -> None:
+    """段階ごとの時間と、モデル変換の I/O・JSON に対する比率を表示"""
+    print(f"{label}: {count / total:9.0f} processes/s through JsonStorage ({total * 1000:.1f} ms)")
+    phase_total = sum(phases.values())
+    for name, seconds in phases.items():
+        print(f"  {name:<12} {seconds * 1000:8.1f} ms  ({seconds / phase_total * 100:4.1f}% of the phases)")
+    conversion, io, parse = phases["conversion"], phases["file I/O"], phases["JSON"]
+    print(f"  conversion = {conversion / io:.2f}x file I/O, {conversion / parse:.2f}x JSON")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JsonStorage の保存・読み込み時間の内訳を計測")
+    parser.add_argument("--processes", type=int, default=10_000, help="プロセス数")
+    args = parser.parse_args()
+
+    processes = [make_process(i) for i in range(args.processes)]
+    with tempfile.TemporaryDirectory() as tmp:
+        storage = JsonStorage(Path(tmp))
+        paths = [Path(tmp) / f"{p.process_id}.json" for p in processes]
+
+        save_total = timed(lambda: [storage.save_process(p) for p in processes])
+        # 保存時に追加された監査エントリも含めた状態で、保存と同じ処理を段階ごとに計測
+        dicts: list = []
+        payloads: list = []
+        save_phases = {
+            "conversion": timed(lambda: dicts.extend(p.to_dict() for p in processes)),
+            "JSON": timed(lambda: payloads.extend(
+                json.dumps(d, indent=2, ensure_ascii=False).encode("utf-8") for d in dicts
+            )),
+            "file I/O": timed(lambda: [path.write_bytes(payload) for path, payload in zip(paths, payloads)]),
+        }
+
+        ids = [p.process_id for p in processes]
+        load_total = timed(lambda: [storage.load_process(process_id) for process_id in ids])
+        raw: list = []
+        parsed: list = []
+        load_phases = {
+            "file I/O": timed(lambda: raw.extend(path.read_bytes() for path in paths)),
+            "JSON": timed(lambda: parsed.extend(json.loads(data) for data in raw)),
+            "conversion": timed(lambda: [ProcessState.from_dict(data) for data in parsed]),
+        }
+
+    print(f"JsonStorage with {args.processes} processes")
+    report("save", args.processes, save_total, save_phases)
+    report("load", args.processes, load_total, load_phases)
+
+
+if __name__ == "__main__":
+    main()
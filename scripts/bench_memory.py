@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+SimpleStorage のメモリ使用量計測スクリプト
+N 件のプロセスを持つ processes.json を作り、従来のレイアウト (レコードごとの dict) と
+コンパクトなレイアウト (CompactRecord) で読み込んだときの保持メモリ・ピークメモリと、
+読み込み・load_process・保存の時間を比較します。
+"""
+
+import argparse
+import gc
+import json
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add packages to path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir / "packages" / "persistence" / "src"))
+
+from persistence import SimpleStorage
+
+LAYOUTS = (("dict", False), ("compact", True))
+
+
+def make_record(i: int) -> dict:
+    updated = datetime(2025, 1, 1) + timedelta(minutes=i * 7, microseconds=i)
+    return {
+        "session_data": {
+            "persist_担当者名": f"担当{i % 500}",
+            "persist_進捗率": i % 101,
+            "persist_status": ["draft", "review", "done"][i % 3],
+            "persist_due": {"__persist_type__": "date", "value": (updated.date() + timedelta(days=7)).isoformat()},
+            "persist_tags": ["週次", f"team-{i % 20}"],
+            "persist_note": "確認済み" if i % 4 == 0 else "",
+        },
+        "last_updated": updated.isoformat(),
+        "created": (updated - timedelta(days=3)).isoformat(),
+        "seq": i + 1,
+    }
+
+
+def measure_memory(path: Path, compact: bool):
+    gc.collect()
+    tracemalloc.start()
+    storage = SimpleStorage(path, track_changes=False, compact=compact)
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    # 名前検索インデックスの分 (レコードのレイアウトとは独立)
+    index = sum(
+        stat.size for stat in tracemalloc.take_snapshot().statistics("filename")
+        if stat.traceback[0].filename.endswith("name_index.py")
+    )
+    tracemalloc.stop()
+    del storage
+    return retained, peak, index
+
+
+def measure_time(path: Path, compact: bool, names: list):
+    start = time.perf_counter()
+    storage = SimpleStorage(path, track_changes=False, compact=compact)
+    load_all = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for name in names:
+        storage.load_process(name)
+    load_process = (time.perf_counter() - start) / len(names)
+
+    start = time.perf_counter()
+    storage.update_process(names[0], {"persist_進捗率": 100})
+    save = time.perf_counter() - start
+    return load_all, load_process, save
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SimpleStorage の従来レイアウトとコンパクトレイアウトのメモリ比較")
+    parser.add_argument("--processes", type=int, default=100_000, help="プロセス数")
+    parser.add_argument("--samples", type=int, default=1000, help="load_process の計測回数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp)
+        records = {f"2025年_週次レポート_{i:06d}": make_record(i) for i in range(args.processes)}
+        (path / "processes.json").write_text(json.dumps(records, ensure_ascii=False), encoding="utf-8")
+        names = random.Random(0).sample(list(records), min(args.samples, args.processes))
+        del records
+
+        print(f"SimpleStorage with {args.processes} processes")
+        results = {}
+        for label, compact in LAYOUTS:
+            retained, peak, index = measure_memory(path, compact)
+            load_all, load_process, save = measure_time(path, compact, names)
+            results[label] = retained - index
+            print(
+                f"{label:>8}: records {(retained - index) / args.processes:6.0f} B/process   "
+                f"name index {index / args.processes:6.0f} B/process   "
+                f"total {retained / 2**20:6.1f} MiB (peak {peak / 2**20:6.1f} MiB)   "
+                f"open {load_all * 1000:7.1f} ms   load_process {load_process * 1e6:5.1f} µs   save {save * 1000:6.1f} ms"
+            )
+        print(f"compact records use {results['compact'] / results['dict'] * 100:.0f}% of the memory of the dict layout")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+ワークスペースの再実行時間計測スクリプト
+Step.3 のチェックボックスを1回操作したときのコストを、
+ページ全体の再実行 (フラグメント化前の挙動) とフラグメントのみの再実行で比較します。
+
+AppTest はウィジェット操作でもページ全体を再実行するため、フラグメント側は
+ページと共通の workspace_steps.render_step_3 だけを呼ぶスクリプトを実行して計測します。
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add packages to path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir / "packages" / "persistence" / "src"))
+sys.path.insert(0, str(root_dir / "apps" / "main"))
+
+from persistence import SimpleStorage
+
+WORKSPACE_PAGE = next((root_dir / "apps" / "main" / "pages").glob("1_*.py"))
+PROCESS_NAME = "bench-000"
+
+# ワークスペースと同じ render_step_3 を、プロセスを開いた状態で単独で実行する (フラグメント部分だけの再実行に相当)
+STEP_3_FRAGMENT = f'''
+import streamlit as st
+from shared import manager
+from workspace_steps import render_step_3
+
+if st.session_state.get("selected_process") is None:
+    st.session_state["selected_process"] = "{PROCESS_NAME}"
+    manager.sync_session(st.session_state, "{PROCESS_NAME}")
+
+render_step_3()
+'''
+
+
+def seed(data_path: Path, processes: int) -> None:
+    """計測用のプロセスを作成 (最初のプロセスが Step.3 を開いた状態)"""
+    storage = SimpleStorage(data_path)
+    for i in range(processes):
+        storage.save_process(f"bench-{i:03d}", {
+            "persist_current_step": 3,
+            "persist_担当者名": f"担当{i}",
+            "persist_説明": "説明" * 50,
+        })
+    # 最初のプロセスを最新にしてセレクタの先頭に来るようにする
+    storage.update_process(PROCESS_NAME, {"persist_current_step": 3})
+
+
+def time_toggles(app, runs: int) -> list:
+    """persist_task1 を切り替えて再実行する時間を runs 回計測"""
+    app.run()
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    timings = []
+    for _ in range(runs):
+        checkbox = app.checkbox(key="persist_task1")
+        start = time.perf_counter()
+        checkbox.set_value(not checkbox.value).run()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def report(label: str, timings: list) -> None:
+    ms = sorted(t * 1000 for t in timings)
+    p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+    print(f"{label:<16} median {statistics.median(ms):7.2f} ms   p95 {p95:7.2f} ms   (n={len(ms)})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ワークスペースの再実行時間を計測")
+    parser.add_argument("--processes", type=int, default=200, help="作成するプロセス数")
+    parser.add_argument("--runs", type=int, default=30, help="計測回数")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        data_path = Path(tmp) / "processes"
+        seed(data_path, args.processes)
+        # shared.py はインポート時に保存先を決めるので、先に環境変数を設定する
+        os.environ["PERSISTENCE_DATA_PATH"] = str(data_path)
+        from streamlit.testing.v1 import AppTest
+
+        print(f"Workspace rerun with {args.processes} processes, toggling one checkbox")
+        report("full page", time_toggles(AppTest.from_file(str(WORKSPACE_PAGE), default_timeout=30), args.runs))
+        report("fragment only", time_toggles(AppTest.from_string(STEP_3_FRAGMENT, default_timeout=30), args.runs))
+
+
+if __name__ == "__main__":
+    main()
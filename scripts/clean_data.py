@@ -6,51 +6,42 @@
 
 import sys
 from pathlib import Path
-from datetime import datetime, timedelta
-import json
+from datetime import timedelta
 import argparse
 
 # Add packages to path
 root_dir = Path(__file__).parent.parent
 sys.path.insert(0, str(root_dir / "packages" / "persistence" / "src"))
 
-from persistence import JsonStorage, ProcessStatus
+from persistence import JsonStorage, ProcessStatus, RetentionEngine, RetentionRule, SimpleStorage
 
 
-def clean_old_processes(days_old: int = 30, dry_run: bool = False):
-    """指定日数以上前の完了済みプロセスを削除"""
+def clean_old_processes(days_old: int = 30, idle_days: int | None = None, dry_run: bool = False):
+    """保持ルールに従って期限切れのプロセスを削除
+
+    完了済みプロセスは最終更新から ``days_old`` 日、``idle_days`` を指定した場合は
+    ステータスに関係なく最終更新から ``idle_days`` 日で期限切れになる。
+    期限インデックスは起動のたびにメモリ上のメタデータとアーカイブの索引から作り直す
+    (アーカイブのセグメントは開かない)。削除するのは期限切れのものだけ。
+    """
     
     data_path = root_dir / "data" / "processes"
-    storage = JsonStorage(data_path)
+    storage = SimpleStorage(data_path)
     
-    cutoff_date = datetime.now() - timedelta(days=days_old)
+    rules = [RetentionRule(max_age=timedelta(days=days_old), statuses=frozenset({"完了"}))]
+    if idle_days is not None:
+        rules.append(RetentionRule(max_age=timedelta(days=idle_days)))
+    engine = RetentionEngine(storage, rules)
     
-    print(f"Cleaning processes older than {days_old} days (before {cutoff_date.date()})...")
+    print(f"Cleaning completed processes older than {days_old} days"
+          + (f" and processes idle for {idle_days} days" if idle_days is not None else "") + "...")
     
-    deleted_count = 0
-    kept_count = 0
-    
-    for process_id in storage.list_processes():
-        process = storage.load_process(process_id)
-        
-        if process:
-            # Check if process is old and completed
-            if (process.status == ProcessStatus.COMPLETED and 
-                process.completed_at and 
-                process.completed_at < cutoff_date):
-                
-                if dry_run:
-                    print(f"  Would delete: {process_id} (completed on {process.completed_at.date()})")
-                else:
-                    if storage.delete_process(process_id):
-                        print(f"  Deleted: {process_id}")
-                        deleted_count += 1
-            else:
-                kept_count += 1
-    
-    print(f"\nSummary:")
-    print(f"  Deleted: {deleted_count} processes")
-    print(f"  Kept: {kept_count} processes")
+    report = engine.sweep(dry_run=dry_run)
+    print(report.format())
+    
+    next_expiry = engine.next_expiry()
+    if next_expiry:
+        print(f"\nNext expiry: {next_expiry:%Y-%m-%d %H:%M}")
     
     if dry_run:
         print("\n(This was a dry run. Use --execute to actually delete files)")
@@ -58,7 +49,6 @@ def clean_old_processes(days_old: int = 30, dry_run: bool = False):
 
 def clean_failed_processes(dry_run: bool = False):
     """失敗したプロセスを削除"""
-    
     data_path = root_dir / "data" / "processes"
     storage = JsonStorage(data_path)
     
@@ -84,7 +74,6 @@ def clean_failed_processes(dry_run: bool = False):
 
 def show_statistics():
     """プロセスデータの統計を表示"""
-    
     data_path = root_dir / "data" / "processes"
     storage = JsonStorage(data_path)
     
@@ -123,7 +112,13 @@ def main():
         "--days",
         type=int,
         default=30,
-        help="Number of days to keep (for 'old' action)"
+        help="Days to keep completed processes after their last update (for 'old' action)"
+    )
+    parser.add_argument(
+        "--idle-days",
+        type=int,
+        default=None,
+        help="Also delete any process not updated for this many days (for 'old' action)"
     )
     parser.add_argument(
         "--execute",
@@ -134,7 +129,7 @@ def main():
     args = parser.parse_args()
     
     if args.action == "old":
-        clean_old_processes(args.days, dry_run=not args.execute)
+        clean_old_processes(args.days, idle_days=args.idle_days, dry_run=not args.execute)
     elif args.action == "failed":
         clean_failed_processes(dry_run=not args.execute)
     elif args.action == "stats":
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+ストレージ移行スクリプト
+あるストレージの全プロセスを別のストレージ (別レイアウト) へコピーします。
+中断しても --checkpoint の記録から再開でき、最後にチェックサムで検証します。
+
+ストレージの指定:
+    <path> / simple:<path>          SimpleStorage (processes.json)
+    partitioned:<path>,<path>,...   PartitionedStorage (ディレクトリ名がパーティション ID)
+    server:<host:port>              ストレージサーバー
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add packages to path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir / "packages" / "persistence" / "src"))
+
+from persistence import PartitionedStorage, RemoteStorage, SimpleStorage, StorageMigrator, parse_address
+
+
+def open_storage(spec: str):
+    """``kind:location`` 形式の指定からストレージを開く"""
+    kind, _, location = spec.partition(":")
+    if not location:
+        kind, location = "simple", spec
+    if kind == "simple":
+        return SimpleStorage(Path(location))
+    if kind == "partitioned":
+        return PartitionedStorage.from_paths([Path(path) for path in location.split(",")])
+    if kind == "server":
+        return RemoteStorage(parse_address(location))
+    raise ValueError(f"unknown storage kind '{kind}'")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ストレージ間でプロセスをコピー")
+    parser.add_argument("source", help="コピー元ストレージ")
+    parser.add_argument("target", help="コピー先ストレージ")
+    parser.add_argument("--workers", type=int, default=4, help="並列に読み込むスレッド数")
+    parser.add_argument("--batch-size", type=int, default=100, help="1回に書き込むプロセス数")
+    parser.add_argument("--checkpoint", type=Path,
+                        help="進捗を記録するファイル (既存なら続きから再開)")
+    parser.add_argument("--no-verify", action="store_true", help="最後のチェックサム検証を省略")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    migrator = StorageMigrator(
+        open_storage(args.source),
+        open_storage(args.target),
+        workers=args.workers,
+        batch_size=args.batch_size,
+        checkpoint_path=args.checkpoint,
+    )
+    report = migrator.run(
+        verify=not args.no_verify,
+        progress=lambda done, total: print(f"\r{done}/{total}", end="", flush=True),
+    )
+    print()
+    print(report.format())
+    sys.exit(0 if report.ok else 1)
+
+
+if __name__ == "__main__":
+    main()
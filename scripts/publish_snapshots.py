@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+レプリカ公開スクリプト
+データディレクトリのスナップショットと増分を一定間隔でレプリカディレクトリへ公開します。
+読み取り専用インスタンスは PERSISTENCE_READ_ONLY=1 と PERSISTENCE_REPLICA_PATH に同じディレクトリを指定します。
+
+アプリ自身が SimpleStorage を持つ場合は PERSISTENCE_REPLICA_PATH を設定するだけで公開されるため、
+このスクリプトはストレージサーバー側やアプリと別プロセスで公開したい場合に使います。
+"""
+
+import argparse
+import logging
+import sys
+from pathlib import Path
+
+# Add packages to path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir / "packages" / "persistence" / "src"))
+
+from persistence import SimpleStorage, SnapshotPublisher
+
+
+def main():
+    parser = argparse.ArgumentParser(description="読み取り専用レプリカへスナップショットを公開")
+    parser.add_argument("replica", type=Path, help="公開先ディレクトリ")
+    parser.add_argument("--data", type=Path, default=root_dir / "data" / "processes",
+                        help="データディレクトリ")
+    parser.add_argument("--interval", type=float, default=2.0, help="公開間隔 (秒)")
+    parser.add_argument("--snapshot-every", type=int, default=100,
+                        help="この数の増分ごとに全体スナップショットを書き直す")
+    parser.add_argument("--once", action="store_true", help="1回だけ公開して終了")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    publisher = SnapshotPublisher(
+        SimpleStorage(args.data),
+        args.replica,
+        interval=args.interval,
+        snapshot_every=args.snapshot_every,
+    )
+    if args.once:
+        count = publisher.publish()
+        print(f"Published {count} processes up to seq {publisher.seq} to {args.replica}")
+        return
+    print(f"Publishing {args.data} to {args.replica} every {args.interval}s")
+    try:
+        publisher.run_forever()
+    except KeyboardInterrupt:
+        print("\nStopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+ストレージサーバー起動スクリプト
+複数の Streamlit レプリカが1つのストアを共有できるよう、SimpleStorage をソケット経由で提供します。
+アプリ側は環境変数 PERSISTENCE_SERVER に同じアドレスを指定します。
+"""
+
+import argparse
+import logging
+import sys
+from datetime import timedelta
+from pathlib import Path
+
+# Add packages to path
+root_dir = Path(__file__).parent.parent
+sys.path.insert(0, str(root_dir / "packages" / "persistence" / "src"))
+
+from persistence import (
+    RetentionEngine,
+    RetentionRule,
+    RetentionSweeper,
+    SimpleStorage,
+    StorageServer,
+    parse_address,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ストレージサーバーを起動")
+    parser.add_argument("--listen", default="127.0.0.1:8765",
+                        help="待ち受けアドレス (host:port または unix:/path/to.sock)")
+    parser.add_argument("--data", type=Path, default=root_dir / "data" / "processes",
+                        help="データディレクトリ")
+    parser.add_argument("--archive-after-days", type=float,
+                        help="この日数更新のないプロセスをアーカイブへ移動")
+    parser.add_argument("--retention-completed-days", type=float,
+                        help="完了済みプロセスを最終更新からこの日数で自動削除")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    storage = SimpleStorage(
+        args.data,
+        archive_after=timedelta(days=args.archive_after_days) if args.archive_after_days else None,
+    )
+    if args.retention_completed_days:
+        engine = RetentionEngine(
+            storage,
+            [RetentionRule(max_age=timedelta(days=args.retention_completed_days), statuses=frozenset({"完了"}))],
+        )
+        RetentionSweeper(engine).start()
+
+    server = StorageServer(storage, parse_address(args.listen))
+    print(f"Serving {args.data} on {args.listen}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down")
+
+
+if __name__ == "__main__":
+    main()